@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Benchmark the import pipeline, the services and the HTTP endpoints on synthetic feeds.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --scales 1 10 100
+    python -m benchmarks.run_benchmarks --scales 1 --update-baseline
+
+For every scale a synthetic feed is generated (and reused on later runs), imported with
+setup_database.py and queried, through the default engine and then through every query engine.
+Results are compared with the stored baselines; a metric that is worse than its baseline by more
+than --tolerance is reported as a regression and the run exits with status 1.
+
+Timings depend on the host, so every run also times a fixed calibration workload. Baselines are
+scaled by the ratio of the two calibration times before they are compared, and a baseline stored
+without one is not compared at all.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import setup_database
+from benchmarks.synthetic_feed import MAX_LAT, MAX_LON, MIN_LAT, MIN_LON, generate_feed
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Metrics where a larger value is better; everything else is a duration
+HIGHER_IS_BETTER = {"throughput_rps"}
+# Duration changes smaller than this are timer noise, whatever their relative size
+MIN_DELTA_S = 0.001
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _summary(samples):
+    return {"median_s": statistics.median(samples), "p95_s": _percentile(samples, 0.95)}
+
+
+def calibrate(rounds=5):
+    """Seconds this host takes for a fixed mix of Python and SQLite work, the median of a few rounds."""
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (k TEXT, v INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", ((f"{i % 997:05d}", i) for i in range(50000)))
+        conn.execute("CREATE INDEX t_k ON t (k)")
+        for k in range(0, 997, 10):
+            conn.execute("SELECT v FROM t WHERE k = ? ORDER BY v", (f"{k:05d}",)).fetchall()
+        conn.close()
+        sorted((str(i * 7919 % 100003), i) for i in range(100000))
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def _random_coordinates(rng):
+    return f"{rng.uniform(MIN_LAT, MAX_LAT):.6f},{rng.uniform(MIN_LON, MAX_LON):.6f}"
+
+
+def _prepare(workdir, scale, seed):
+    gtfs_dir = os.path.join(workdir, "feed")
+    if not os.path.exists(os.path.join(gtfs_dir, "stop_times.txt")):
+        print(f"  Generating synthetic feed (scale {scale:g})...")
+        generate_feed(gtfs_dir, scale, seed)
+    return gtfs_dir
+
+
+def bench_import(workdir, gtfs_dir):
+    db_path = os.path.join(workdir, "trips.sqlite")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_database.main(db_path, gtfs_dir)
+    return {"import_s": time.perf_counter() - started}
+
+
+def bench_services(db_path, rng, queries):
+    from public_transport_api.services.departures_service import get_closest_departures
+    from public_transport_api.services.trips_service import get_trip_details
+
+    conn = sqlite3.connect(db_path)
+    trip_ids = [row[0] for row in conn.execute("SELECT trip_id FROM trips ORDER BY RANDOM() LIMIT ?", (queries,))]
+    conn.close()
+
+    departures = []
+    for _ in range(queries):
+        start_time = f"2025-04-02T{rng.randint(5, 21):02d}:{rng.randint(0, 59):02d}:00Z"
+        started = time.perf_counter()
+        get_closest_departures(_random_coordinates(rng), _random_coordinates(rng), start_time, 5)
+        departures.append(time.perf_counter() - started)
+
+    trips = []
+    for trip_id in trip_ids:
+        started = time.perf_counter()
+        get_trip_details(trip_id)
+        trips.append(time.perf_counter() - started)
+
+    return {
+        "closest_departures": _summary(departures),
+        "trip_details": _summary(trips) if trips else None,
+    }, trip_ids
+
+
+def bench_engines(db_path, rng, trip_ids, queries):
+    """The same service calls on every query engine, plus the time to set each engine up."""
+    from public_transport_api import query_engine, timetable_snapshot
+    from public_transport_api.services.departures_service import get_closest_departures
+    from public_transport_api.services.trips_service import get_trip_details
+
+    snapshot_path = os.path.splitext(db_path)[0] + ".timetable"
+    timetable_snapshot.export(db_path, snapshot_path)
+    calls = [(_random_coordinates(rng), _random_coordinates(rng),
+              f"2025-04-02T{rng.randint(5, 21):02d}:{rng.randint(0, 59):02d}:00Z") for _ in range(queries)]
+    factories = {
+        "sqlite": lambda: query_engine.SQLiteEngine(db_path),
+        "memory": lambda: query_engine.MemoryEngine(db_path),
+        "snapshot": lambda: query_engine.SnapshotEngine(timetable_snapshot.TimetableSnapshot(snapshot_path)),
+    }
+
+    results = {}
+    try:
+        for name, factory in factories.items():
+            started = time.perf_counter()
+            query_engine.configure(factory())
+            engine_results = results[name] = {"load_s": time.perf_counter() - started}
+
+            departures = []
+            for start, end, start_time in calls:
+                started = time.perf_counter()
+                get_closest_departures(start, end, start_time, 5)
+                departures.append(time.perf_counter() - started)
+            engine_results["closest_departures"] = _summary(departures)
+
+            trips = []
+            for trip_id in trip_ids:
+                started = time.perf_counter()
+                get_trip_details(trip_id)
+                trips.append(time.perf_counter() - started)
+            engine_results["trip_details"] = _summary(trips) if trips else None
+    finally:
+        query_engine.configure(None)
+    return results
+
+
+def _create_app():
+    from flask import Flask
+
+    from public_transport_api import compression, instrumentation
+    from public_transport_api.controllers.departures_controller import departures_bp
+    from public_transport_api.controllers.trips_controller import trips_bp
+
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+    compression.init_app(app)
+    app.register_blueprint(departures_bp)
+    app.register_blueprint(trips_bp)
+    return app
+
+
+def bench_throughput(rng, trip_ids, requests, concurrency):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, _create_app(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}/public_transport/city/wroclaw"
+
+    urls = []
+    for i in range(requests):
+        if trip_ids and i % 4 == 3:
+            urls.append(f"{base}/trip/{rng.choice(trip_ids)}")
+        else:
+            urls.append(f"{base}/closest_departures?start_coordinates={_random_coordinates(rng)}"
+                        f"&end_coordinates={_random_coordinates(rng)}&start_time=2025-04-02T08:00:00Z")
+
+    def fetch(url):
+        started = time.perf_counter()
+        with urllib.request.urlopen(url) as response:
+            response.read()
+        return time.perf_counter() - started
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+
+    return {"throughput_rps": requests / elapsed, "latency": _summary(latencies), "concurrency": concurrency}
+
+
+def bench_compression(rng, trip_ids, samples=20):
+    """Bytes on the wire and CPU per response for every available encoding, at the fast and cached levels."""
+    from public_transport_api import compression
+
+    client = _create_app().test_client()
+    base = "/public_transport/city/wroclaw"
+    payloads = {
+        "trip": [client.get(f"{base}/trip/{trip_id}").get_data() for trip_id in trip_ids[:samples]],
+        "departures": [
+            client.get(f"{base}/closest_departures?start_coordinates={_random_coordinates(rng)}"
+                       f"&end_coordinates={_random_coordinates(rng)}&start_time=2025-04-02T08:00:00Z"
+                       f"&limit=20").get_data()
+            for _ in range(samples)
+        ],
+    }
+
+    results = {}
+    for kind, bodies in payloads.items():
+        if not bodies:
+            continue
+        kind_results = results[kind] = {"identity_bytes": statistics.mean(len(body) for body in bodies)}
+        for encoding in compression.available_encodings():
+            for level, high in (("fast", False), ("cached", True)):
+                sizes, cpu = [], []
+                for body in bodies:
+                    started = time.process_time()
+                    sizes.append(len(compression.compress(body, encoding, high=high)))
+                    cpu.append(time.process_time() - started)
+                kind_results[f"{encoding}_{level}"] = {"bytes": statistics.mean(sizes), "cpu_s": statistics.mean(cpu)}
+    return results
+
+
+def run_scale(scale, args):
+    workdir = os.path.abspath(os.path.join(args.workdir, f"scale_{scale:g}"))
+    os.makedirs(workdir, exist_ok=True)
+    rng = random.Random(args.seed)
+    gtfs_dir = _prepare(workdir, scale, args.seed)
+
+    from public_transport_api import query_engine
+
+    db_path = os.path.join(workdir, "trips.sqlite")
+    results = {}
+    if not args.skip_import or not os.path.exists(db_path):
+        print("  Importing with setup_database...")
+        results.update(bench_import(workdir, gtfs_dir))
+
+    previous_db_path = query_engine.configure_database(db_path)
+    try:
+        print("  Timing services...")
+        services, trip_ids = bench_services(db_path, rng, args.queries)
+        results.update(services)
+        print("  Timing query engines...")
+        results["engines"] = bench_engines(db_path, rng, trip_ids, args.queries)
+        print(f"  Load test: {args.requests} requests, concurrency {args.concurrency}...")
+        results["endpoints"] = bench_throughput(rng, trip_ids, args.requests, args.concurrency)
+        print("  Measuring response compression...")
+        results["compression"] = bench_compression(rng, trip_ids)
+    finally:
+        query_engine.configure_database(previous_db_path)
+    return results
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and key not in ("concurrency", "calibration_s"):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baselines, tolerance):
+    """
+    Returns (metric, baseline, current, change) tuples for every regressed metric.
+
+    Baseline values are first scaled to this host by the ratio of the runs' calibration_s; scales
+    whose baseline or results have no calibration time are skipped.
+    """
+    regressions = []
+    for scale, scale_results in results.items():
+        baseline_results = baselines.get(scale, {})
+        if not baseline_results.get("calibration_s") or not scale_results.get("calibration_s"):
+            continue
+        speed = scale_results["calibration_s"] / baseline_results["calibration_s"]
+        baseline = _flatten(baseline_results)
+        for metric, current in _flatten(scale_results).items():
+            expected = baseline.get(metric)
+            if not expected:
+                continue
+            higher_is_better = metric.rsplit(".", 1)[-1] in HIGHER_IS_BETTER
+            expected = expected / speed if higher_is_better else expected * speed
+            change = (current - expected) / expected
+            if higher_is_better:
+                change = -change
+            elif abs(current - expected) < MIN_DELTA_S:
+                continue
+            if change > tolerance:
+                regressions.append((f"{scale}/{metric}", expected, current, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the public transport API on synthetic GTFS feeds.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0], help="Feed sizes relative to Wrocław")
+    parser.add_argument("--workdir", default="bench_data", help="Where feeds and databases are kept between runs")
+    parser.add_argument("--queries", type=int, default=50, help="Service calls per scale")
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests per scale for the load test")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent HTTP clients")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-import", action="store_true", help="Reuse an existing database when present")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Stored baseline results (JSON)")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--output", help="Write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    print("Calibrating...")
+    calibration_s = calibrate()
+    print(f"  {calibration_s:.4f} s")
+
+    results = {}
+    for scale in args.scales:
+        print(f"\nScale {scale:g}x")
+        results[f"{scale:g}x"] = {"calibration_s": calibration_s, **run_scale(scale, args)}
+
+    print("\nResults:")
+    for scale, scale_results in results.items():
+        for metric, value in sorted(_flatten(scale_results).items()):
+            print(f"  {scale:>5} {metric:<40} {value:12.4f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"\nBaseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to store one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baselines = json.load(f)
+    uncalibrated = [scale for scale in results if not baselines.get(scale, {}).get("calibration_s")]
+    if uncalibrated:
+        print(f"\nNo calibrated baseline for {', '.join(uncalibrated)}; run with --update-baseline to store one.")
+    regressions = compare(results, baselines, args.tolerance)
+    if not regressions:
+        print("\nNo regressions against the baseline.")
+        return 0
+    print("\nRegressions (baselines scaled to this host):")
+    for metric, expected, current, change in regressions:
+        print(f"  {metric}: {expected:.4f} -> {current:.4f} ({change:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
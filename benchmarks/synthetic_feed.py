@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic GTFS feed shaped like the Wrocław one, scaled by a factor.
+
+At scale 1 the feed has roughly the Wrocław row counts (stops, routes, variants, trips) plus a
+stop_times table of ~25 stops per trip. Columns match the real files, so the output can be fed
+straight into setup_database.py.
+"""
+
+import argparse
+import csv
+import os
+import random
+
+# Row counts of the OtwartyWroclaw feed the synthetic one is modelled on
+BASE_STOPS = 2401
+BASE_ROUTES = 128
+VARIANTS_PER_ROUTE = 9
+TRIPS_PER_VARIANT = 34
+STOPS_PER_TRIP = 25
+BRIGADES_PER_ROUTE = 12
+
+# Wrocław bounding box
+MIN_LAT, MAX_LAT = 51.04, 51.18
+MIN_LON, MAX_LON = 16.88, 17.16
+GRID_CELL = 0.01
+
+SERVICES = [
+    # service_id, monday..sunday
+    ("3", (0, 0, 0, 0, 0, 1, 0)),
+    ("4", (0, 0, 0, 0, 0, 0, 1)),
+    ("6", (1, 1, 1, 1, 0, 0, 0)),
+    ("8", (0, 0, 0, 0, 1, 0, 0)),
+]
+
+
+def _writer(gtfs_dir, filename, header):
+    f = open(os.path.join(gtfs_dir, filename), "w", encoding="utf-8", newline="")
+    writer = csv.writer(f)
+    writer.writerow(header)
+    return f, writer
+
+
+def _format_time(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class _StopGrid:
+    """Buckets stops into lat/lon cells for nearest-stop lookups while building variants."""
+
+    def __init__(self, stops):
+        self.cells = {}
+        for stop in stops:
+            self.cells.setdefault(self._cell(stop[3], stop[4]), []).append(stop)
+
+    @staticmethod
+    def _cell(lat, lon):
+        return int(lat / GRID_CELL), int(lon / GRID_CELL)
+
+    def nearest(self, lat, lon, exclude):
+        cx, cy = self._cell(lat, lon)
+        for radius in range(0, 50):
+            best, best_dist = None, float("inf")
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    if max(abs(dx), abs(dy)) != radius:
+                        continue
+                    for stop in self.cells.get((cx + dx, cy + dy), ()):
+                        if stop[0] in exclude:
+                            continue
+                        dist = (stop[3] - lat) ** 2 + (stop[4] - lon) ** 2
+                        if dist < best_dist:
+                            best, best_dist = stop, dist
+            if best is not None:
+                return best
+        return None
+
+
+def generate_feed(gtfs_dir, scale=1.0, seed=42):
+    """
+    Writes a synthetic feed into gtfs_dir and returns its row counts.
+
+    Stops and routes grow linearly with ``scale``; each route keeps the Wrocław mix of variants, trips
+    and stops per trip, so stop_times grows linearly as well.
+    """
+    rng = random.Random(seed)
+    os.makedirs(gtfs_dir, exist_ok=True)
+
+    n_stops = max(2, int(BASE_STOPS * scale))
+    n_routes = max(1, int(BASE_ROUTES * scale))
+    stops_per_trip = min(STOPS_PER_TRIP, n_stops)
+
+    with open(os.path.join(gtfs_dir, "agency.txt"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["agency_id", "agency_name", "agency_url", "agency_timezone", "agency_phone", "agency_lang"])
+        writer.writerow(["2", "Synthetic Autobusy", "http://example.invalid", "Europe/Warsaw", "", "pl"])
+
+    with open(os.path.join(gtfs_dir, "calendar.txt"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday",
+                         "sunday", "start_date", "end_date"])
+        for service_id, days in SERVICES:
+            writer.writerow([service_id, *days, "20250322", "20250406"])
+
+    with open(os.path.join(gtfs_dir, "calendar_dates.txt"), "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow(["service_id", "date", "exception_type"])
+
+    stops = []
+    with open(os.path.join(gtfs_dir, "stops.txt"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["stop_id", "stop_code", "stop_name", "stop_lat", "stop_lon"])
+        for i in range(n_stops):
+            stop = (str(i + 1), str(10000 + i), f"Stop {i + 1}",
+                    rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON))
+            stops.append(stop)
+            writer.writerow([stop[0], stop[1], stop[2], f"{stop[3]:.10f}", f"{stop[4]:.10f}"])
+    grid = _StopGrid(stops)
+
+    counts = {"stops": n_stops, "routes": n_routes, "variants": 0, "trips": 0, "stop_times": 0}
+    routes_f, routes_w = _writer(gtfs_dir, "routes.txt", ["route_id", "agency_id", "route_short_name",
+                                                          "route_long_name", "route_desc", "route_type",
+                                                          "route_type2_id", "valid_from", "valid_until"])
+    variants_f, variants_w = _writer(gtfs_dir, "variants.txt", ["variant_id", "is_main", "equiv_main_variant_id",
+                                                                "join_stop_id", "disjoin_stop_id"])
+    control_f, control_w = _writer(gtfs_dir, "control_stops.txt", ["variant_id", "stop_id"])
+    trips_f, trips_w = _writer(gtfs_dir, "trips.txt", ["route_id", "service_id", "trip_id", "trip_headsign",
+                                                       "direction_id", "shape_id", "brigade_id", "vehicle_id",
+                                                       "variant_id"])
+    stop_times_f, stop_times_w = _writer(gtfs_dir, "stop_times.txt", ["trip_id", "arrival_time", "departure_time",
+                                                                      "stop_id", "stop_sequence", "pickup_type",
+                                                                      "drop_off_type"])
+    try:
+        variant_id = 800000
+        trip_counter = 14600000
+        for r in range(n_routes):
+            route_id = f"R{r + 1}"
+            route_type = "0" if r % 4 == 0 else "3"
+            routes_w.writerow([route_id, "2", route_id, "", "", route_type, "30", "2025-03-22", "2999-01-01"])
+
+            # The main path of the line: nearest stops to evenly spaced points between two termini
+            lat0, lon0 = rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON)
+            lat1, lon1 = rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON)
+            path, used = [], set()
+            for k in range(stops_per_trip):
+                t = k / max(1, stops_per_trip - 1)
+                stop = grid.nearest(lat0 + (lat1 - lat0) * t, lon0 + (lon1 - lon0) * t, used)
+                if stop is None:
+                    break
+                used.add(stop[0])
+                path.append(stop)
+            hops = [rng.randint(60, 180) for _ in range(len(path))]
+
+            main_variants = {}
+            for v in range(VARIANTS_PER_ROUTE):
+                variant_id += 1
+                direction = v % 2
+                is_main = v < 2
+                sequence = path if direction == 0 else path[::-1]
+                if not is_main:
+                    # Short-turn variants serve a prefix of the main path
+                    sequence = sequence[:max(2, len(sequence) - rng.randint(1, max(1, len(sequence) // 2)))]
+                else:
+                    main_variants[direction] = variant_id
+                variants_w.writerow([variant_id, int(is_main), main_variants.get(direction, variant_id), "", ""])
+                control_w.writerow([variant_id, sequence[0][0]])
+                control_w.writerow([variant_id, sequence[-1][0]])
+                counts["variants"] += 1
+
+                headsign = sequence[-1][2].upper()
+                first_departure = rng.randint(4 * 3600 + 30 * 60, 6 * 3600)
+                headway = max(300, (23 * 3600 - first_departure) // TRIPS_PER_VARIANT)
+                for n in range(TRIPS_PER_VARIANT):
+                    service_id = SERVICES[n % len(SERVICES)][0]
+                    trip_counter += 1
+                    trip_id = f"{service_id}_{trip_counter}"
+                    brigade = (n % BRIGADES_PER_ROUTE) + 1
+                    trips_w.writerow([route_id, service_id, trip_id, headsign, direction, variant_id,
+                                      brigade, (n % 15) + 1, variant_id])
+                    counts["trips"] += 1
+
+                    clock = first_departure + n * headway
+                    for seq, stop in enumerate(sequence):
+                        arrival = clock
+                        departure = clock + (30 if 0 < seq < len(sequence) - 1 else 0)
+                        stop_times_w.writerow([trip_id, _format_time(arrival), _format_time(departure),
+                                               stop[0], seq + 1, 0, 0])
+                        clock = departure + hops[seq]
+                    counts["stop_times"] += len(sequence)
+    finally:
+        for f in (routes_f, variants_f, control_f, trips_f, stop_times_f):
+            f.close()
+
+    with open(os.path.join(gtfs_dir, "feed_info.txt"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["feed_publisher_name", "feed_publisher_url", "feed_lang", "feed_start_date", "feed_end_date"])
+        writer.writerow(["Synthetic", "http://example.invalid", "pl", "20250322", "20250406"])
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic, scaled-up Wrocław-shaped GTFS feed.")
+    parser.add_argument("output_dir", help="Directory to write the feed's .txt files into")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size relative to the Wrocław feed (default: 1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    counts = generate_feed(args.output_dir, args.scale, args.seed)
+    print(f"Synthetic feed written to {args.output_dir}:")
+    for name, count in counts.items():
+        print(f"  {name}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
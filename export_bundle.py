@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Script to build the static timetable bundle served with the frontend for offline lookups.
+
+Run it after export_snapshot.py, whenever the snapshot has been rebuilt. Without --snapshot it
+exports a temporary snapshot from the database first.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from public_transport_api import static_bundle, timetable_snapshot
+
+
+def main(db_path="trips.sqlite", output_dir="frontend/bundle", snapshot_path=None):
+    """Main function to build the bundle."""
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if snapshot_path is None:
+            print(f"Exporting {db_path} to a temporary snapshot...")
+            snapshot_path = os.path.join(tmp_dir, "trips.timetable")
+            timetable_snapshot.export(db_path, snapshot_path)
+        print(f"Building the bundle from {snapshot_path} into {output_dir}...")
+        manifest = static_bundle.build(snapshot_path, output_dir)
+    print(f"Bundle {manifest['file']} ({manifest['bytes']} bytes) written in {time.perf_counter() - started:.1f}s:")
+    for table, count in manifest["counts"].items():
+        print(f"  {table}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the static timetable bundle for the offline frontend.")
+    parser.add_argument("--database", default="trips.sqlite", help="SQLite database created by setup_database.py")
+    parser.add_argument("--snapshot", help="Snapshot written by export_snapshot.py to build from instead of the database")
+    parser.add_argument("--output", default="frontend/bundle", help="Directory served next to the frontend")
+    args = parser.parse_args()
+    main(args.database, args.output, args.snapshot)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Script to export the imported feed to Parquet or Arrow IPC files for offline analysis.
+
+Run it after setup_database.py. Needs pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import logging
+import time
+
+from public_transport_api import columnar
+
+
+def main(db_path="trips.sqlite", output_dir="trips_columnar", fmt="parquet", batch_rows=65536):
+    """Main function to export the columnar files."""
+    print(f"Exporting {db_path} to {output_dir} ({fmt})...")
+    started = time.perf_counter()
+    counts = columnar.export(db_path, output_dir, fmt, batch_rows)
+    print(f"Export written in {time.perf_counter() - started:.1f}s:")
+    for table, count in counts.items():
+        print(f"  {table}: {count} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the feed to Parquet or Arrow IPC files.")
+    parser.add_argument("--database", default="trips.sqlite", help="SQLite database created by setup_database.py")
+    parser.add_argument("--output", default="trips_columnar", help="Directory to write")
+    parser.add_argument("--format", choices=columnar.FORMATS, default="parquet", help="File format")
+    parser.add_argument("--batch-rows", type=int, default=65536, help="Rows held in memory per batch")
+    args = parser.parse_args()
+    logging.basicConfig(format="  Warning: %(message)s")
+    main(args.database, args.output, args.format, args.batch_rows)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Script to export the imported timetable into the memory-mapped snapshot read by the API workers.
+
+Run it after setup_database.py, whenever the database has been rebuilt. With --columnar it reads a
+Parquet/Arrow export written by export_columnar.py instead of the database.
+"""
+
+import argparse
+import time
+
+from public_transport_api import columnar, timetable_snapshot
+
+
+def main(db_path="trips.sqlite", snapshot_path="trips.timetable", columnar_dir=None):
+    """Main function to export the snapshot."""
+    print(f"Exporting {columnar_dir or db_path} to {snapshot_path}...")
+    started = time.perf_counter()
+    if columnar_dir:
+        counts = timetable_snapshot.build(*columnar.timetable_rows(columnar_dir), snapshot_path)
+    else:
+        counts = timetable_snapshot.export(db_path, snapshot_path)
+    print(f"Snapshot written in {time.perf_counter() - started:.1f}s:")
+    for table, count in counts.items():
+        print(f"  {table}: {count} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the timetable snapshot for the API workers.")
+    parser.add_argument("--database", default="trips.sqlite", help="SQLite database created by setup_database.py")
+    parser.add_argument("--output", default="trips.timetable", help="Snapshot file to write")
+    parser.add_argument("--columnar", help="Build from this export_columnar.py directory instead of the database")
+    args = parser.parse_args()
+    main(args.database, args.output, args.columnar)
@@ -0,0 +1,321 @@
+// Data layer for the frontend: every API request goes through here.
+//
+// - Requests for the same URL that overlap share one fetch (in-flight deduplication).
+// - A RequestChannel runs one request at a time: starting a new one aborts the previous one, so
+//   rapid map interaction never leaves stale searches running or overwriting newer results.
+// - Responses are cached by URL in memory and in IndexedDB together with the server's ETag. A
+//   cached response is revalidated with If-None-Match, and a 304 reuses it without downloading it
+//   again. When the network fails, the cached copy is served instead.
+// - With an OfflineTimetable (offline.js), departure and trip queries are answered from the static
+//   timetable bundle first, and only reach the API when the bundle cannot answer them.
+(function (global) {
+    'use strict';
+
+    const DB_NAME = 'public-transport-cache';
+    const DB_STORE = 'responses';
+    const MEMORY_ENTRIES = 200;
+    const MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000; // older IndexedDB entries are dropped on startup
+
+    class ApiError extends Error {
+        constructor(message, status) {
+            super(message);
+            this.name = 'ApiError';
+            this.status = status;
+        }
+    }
+
+    function abortError() {
+        return new DOMException('The request was aborted', 'AbortError');
+    }
+
+    function isAbortError(error) {
+        return error && error.name === 'AbortError';
+    }
+
+    // Keyed response cache: a small LRU in memory backed by IndexedDB when the browser has it
+    class ResponseCache {
+        constructor() {
+            this.memory = new Map();
+            this.db = openDatabase().catch((error) => {
+                console.warn('IndexedDB unavailable, caching in memory only:', error);
+                return null;
+            });
+        }
+
+        async get(key) {
+            if (this.memory.has(key)) {
+                const entry = this.memory.get(key);
+                this.memory.delete(key);
+                this.memory.set(key, entry);
+                return entry;
+            }
+            const db = await this.db;
+            if (!db) {
+                return null;
+            }
+            const entry = await storeRequest(db, 'readonly', (store) => store.get(key)).catch(() => null);
+            if (entry) {
+                this.remember(key, entry);
+            }
+            return entry || null;
+        }
+
+        async set(key, entry) {
+            this.remember(key, entry);
+            const db = await this.db;
+            if (db) {
+                await storeRequest(db, 'readwrite', (store) => store.put(entry, key)).catch((error) => {
+                    console.warn('Failed to store response in IndexedDB:', error);
+                });
+            }
+        }
+
+        remember(key, entry) {
+            this.memory.delete(key);
+            this.memory.set(key, entry);
+            if (this.memory.size > MEMORY_ENTRIES) {
+                this.memory.delete(this.memory.keys().next().value);
+            }
+        }
+    }
+
+    function openDatabase() {
+        return new Promise((resolve, reject) => {
+            if (!global.indexedDB) {
+                reject(new Error('indexedDB is not supported'));
+                return;
+            }
+            const request = global.indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(DB_STORE).createIndex('storedAt', 'storedAt');
+            };
+            request.onsuccess = () => {
+                pruneDatabase(request.result);
+                resolve(request.result);
+            };
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function pruneDatabase(db) {
+        const store = db.transaction(DB_STORE, 'readwrite').objectStore(DB_STORE);
+        const expired = IDBKeyRange.upperBound(Date.now() - MAX_AGE_MS);
+        store.index('storedAt').openCursor(expired).onsuccess = (event) => {
+            const cursor = event.target.result;
+            if (cursor) {
+                cursor.delete();
+                cursor.continue();
+            }
+        };
+    }
+
+    function storeRequest(db, mode, operation) {
+        return new Promise((resolve, reject) => {
+            const request = operation(db.transaction(DB_STORE, mode).objectStore(DB_STORE));
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async function errorFromResponse(response) {
+        let message = `HTTP Error: ${response.status} ${response.statusText}`;
+        try {
+            const errorData = await response.json();
+            if (errorData.message) {
+                message += ` - ${errorData.message}`;
+            } else if (errorData.error) {
+                message += ` - ${errorData.error}`;
+            }
+        } catch (parseError) {
+            // If response is not JSON, use default error message
+        }
+        return new ApiError(message, response.status);
+    }
+
+    class ApiClient {
+        constructor(baseUrl, cache = new ResponseCache(), local = null) {
+            this.baseUrl = baseUrl.replace(/\/$/, '');
+            this.cache = cache;
+            this.local = local;
+            this.inFlight = new Map(); // url -> { promise, controller, subscribers }
+        }
+
+        async getClosestDepartures(city, { startCoords, endCoords, startTime, limit }, options = {}) {
+            const params = new URLSearchParams({
+                start_coordinates: `${startCoords.lat},${startCoords.lng}`,
+                end_coordinates: `${endCoords.lat},${endCoords.lng}`,
+                start_time: startTime,
+                limit: String(limit)
+            });
+            const path = `/public_transport/city/${city}/closest_departures?${params}`;
+            const departures = await this.queryLocal('closestDepartures', {
+                startLat: startCoords.lat,
+                startLon: startCoords.lng,
+                endLat: endCoords.lat,
+                endLon: endCoords.lng,
+                startTime,
+                limit
+            }, options.signal);
+            if (departures) {
+                // Same shape as the API response; source tells the two apart
+                return {
+                    metadata: {
+                        self: path,
+                        city,
+                        source: 'bundle',
+                        feed_version: this.local.feedVersion,
+                        query_parameters: {
+                            start_coordinates: params.get('start_coordinates'),
+                            end_coordinates: params.get('end_coordinates'),
+                            start_time: startTime,
+                            limit
+                        }
+                    },
+                    departures
+                };
+            }
+            return this.get(path, options);
+        }
+
+        async getTrip(city, tripId, options = {}) {
+            const trip = await this.queryLocal('tripDetails', { tripId }, options.signal);
+            return trip || this.get(`/public_transport/city/${city}/trip/${encodeURIComponent(tripId)}`, options);
+        }
+
+        // Nearest stops come from the bundle only; resolves with [] when it is unavailable
+        async getNearestStops(lat, lng, limit = 1, options = {}) {
+            return (await this.queryLocal('nearestStops', { lat, lng, limit }, options.signal)) || [];
+        }
+
+        async queryLocal(method, args, signal) {
+            if (!this.local) {
+                return null;
+            }
+            const result = await this.local.query(method, args);
+            if (signal && signal.aborted) {
+                throw abortError();
+            }
+            return result;
+        }
+
+        // Resolves with the parsed JSON body; rejects with an AbortError once options.signal aborts
+        get(path, { signal } = {}) {
+            const url = `${this.baseUrl}${path}`;
+            if (signal && signal.aborted) {
+                return Promise.reject(abortError());
+            }
+
+            let shared = this.inFlight.get(url);
+            if (!shared) {
+                const controller = new AbortController();
+                shared = { controller, subscribers: 0, promise: this.load(url, controller.signal) };
+                shared.promise.then(() => {}, () => {}).then(() => {
+                    if (this.inFlight.get(url) === shared) {
+                        this.inFlight.delete(url);
+                    }
+                });
+                this.inFlight.set(url, shared);
+            }
+            shared.subscribers += 1;
+
+            return new Promise((resolve, reject) => {
+                let settled = false;
+                const onAbort = () => {
+                    if (settled) {
+                        return;
+                    }
+                    settled = true;
+                    reject(abortError());
+                    // The shared fetch is only cancelled once nobody is waiting for it any more
+                    shared.subscribers -= 1;
+                    if (shared.subscribers === 0 && this.inFlight.get(url) === shared) {
+                        this.inFlight.delete(url);
+                        shared.controller.abort();
+                    }
+                };
+                if (signal) {
+                    signal.addEventListener('abort', onAbort, { once: true });
+                }
+                shared.promise.then((data) => {
+                    if (!settled) {
+                        settled = true;
+                        resolve(data);
+                    }
+                }, (error) => {
+                    if (!settled) {
+                        settled = true;
+                        reject(error);
+                    }
+                }).finally(() => {
+                    if (signal) {
+                        signal.removeEventListener('abort', onAbort);
+                    }
+                });
+            });
+        }
+
+        async load(url, signal) {
+            const cached = await this.cache.get(url);
+            const headers = {};
+            if (cached && cached.etag) {
+                headers['If-None-Match'] = cached.etag;
+            }
+
+            let response;
+            try {
+                // The browser's HTTP cache is bypassed: revalidation is handled here, with our own entries
+                response = await fetch(url, { headers, signal, cache: 'no-store' });
+            } catch (error) {
+                if (cached && !isAbortError(error)) {
+                    console.warn(`Network error, serving cached ${url}:`, error);
+                    return cached.data;
+                }
+                throw error;
+            }
+
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+            if (!response.ok) {
+                throw await errorFromResponse(response);
+            }
+            const data = await response.json();
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                this.cache.set(url, { etag, data, storedAt: Date.now() });
+            }
+            return data;
+        }
+    }
+
+    // Runs one request at a time; starting a request aborts the one still running
+    class RequestChannel {
+        constructor() {
+            this.controller = null;
+        }
+
+        run(request) {
+            this.abort();
+            const controller = new AbortController();
+            this.controller = controller;
+            return request(controller.signal).finally(() => {
+                if (this.controller === controller) {
+                    this.controller = null;
+                }
+            });
+        }
+
+        abort() {
+            if (this.controller) {
+                this.controller.abort();
+                this.controller = null;
+            }
+        }
+
+        get busy() {
+            return this.controller !== null;
+        }
+    }
+
+    global.TransportApi = { ApiClient, ApiError, RequestChannel, ResponseCache, isAbortError };
+})(window);
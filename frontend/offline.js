@@ -0,0 +1,69 @@
+// Offline timetable for the data layer: sends queries to timetable-worker.js, which answers them
+// from the static bundle. Every query resolves with null when the bundle cannot answer it, and the
+// caller then asks the API instead. Also registers the service worker that keeps the app and the
+// bundle available without a connection.
+(function (global) {
+    'use strict';
+
+    class OfflineTimetable {
+        constructor(workerUrl = 'timetable-worker.js') {
+            this.pending = new Map();
+            this.nextId = 0;
+            this.available = true;
+            this.feedVersion = null;
+            try {
+                this.worker = new Worker(workerUrl);
+            } catch (error) {
+                console.warn('Web Workers unavailable, using the API only:', error);
+                this.worker = null;
+                this.available = false;
+                return;
+            }
+            this.worker.onmessage = (event) => this.handleMessage(event.data);
+            this.worker.onerror = (event) => {
+                console.warn('Offline timetable worker failed:', event.message);
+                this.fail();
+            };
+        }
+
+        handleMessage(message) {
+            if (message.type === 'ready') {
+                this.feedVersion = message.feedVersion;
+            } else if (message.type === 'unavailable') {
+                this.fail();
+            } else if (this.pending.has(message.id)) {
+                this.pending.get(message.id)(message.result);
+                this.pending.delete(message.id);
+            }
+        }
+
+        fail() {
+            this.available = false;
+            this.pending.forEach((resolve) => resolve(null));
+            this.pending.clear();
+        }
+
+        query(method, args) {
+            if (!this.available) {
+                return Promise.resolve(null);
+            }
+            const id = this.nextId++;
+            return new Promise((resolve) => {
+                this.pending.set(id, resolve);
+                this.worker.postMessage({ id, method, args });
+            });
+        }
+    }
+
+    function registerServiceWorker(url = 'sw.js') {
+        if (!('serviceWorker' in navigator)) {
+            return;
+        }
+        navigator.serviceWorker.register(url).catch((error) => {
+            console.warn('Service worker registration failed:', error);
+        });
+    }
+
+    global.OfflineTimetable = OfflineTimetable;
+    global.registerServiceWorker = registerServiceWorker;
+})(window);
@@ -6,6 +6,17 @@ document.addEventListener('DOMContentLoaded', () => {
     let startCoords = null;
     let endCoords = null;
     let isSelectingStart = true;
+    let routeLayer = null;
+    let hasSearched = false;
+
+    // Data layer (api.js): one search and one trip request at a time, deduplicated and cached, and
+    // answered from the offline timetable bundle (offline.js) whenever it can
+    registerServiceWorker();
+    const api = new TransportApi.ApiClient('http://localhost:5001', new TransportApi.ResponseCache(),
+        new OfflineTimetable());
+    const searchChannel = new TransportApi.RequestChannel();
+    const tripChannel = new TransportApi.RequestChannel();
+    const city = 'wroclaw';
 
     // DOM elements
     const searchBtn = document.getElementById('search-btn');
@@ -96,7 +107,13 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         }
 
-        validateInputs();
+        // Results for the old points are stale: replace them, aborting a search still running
+        if (hasSearched && startCoords && endCoords) {
+            handleSearch();
+        } else {
+            searchChannel.abort();
+            validateInputs();
+        }
     }
 
     function setStartPoint(lat, lng) {
@@ -116,6 +133,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
         
         startCoordsDisplay.textContent = `${lat.toFixed(6)}, ${lng.toFixed(6)}`;
+        showNearestStop(startCoordsDisplay, lat, lng);
     }
 
     function setEndPoint(lat, lng) {
@@ -135,6 +153,16 @@ document.addEventListener('DOMContentLoaded', () => {
         });
         
         endCoordsDisplay.textContent = `${lat.toFixed(6)}, ${lng.toFixed(6)}`;
+        showNearestStop(endCoordsDisplay, lat, lng);
+    }
+
+    async function showNearestStop(display, lat, lng) {
+        const coordinates = display.textContent;
+        const [stop] = await api.getNearestStops(lat, lng);
+        // Skip if the point has moved again in the meantime
+        if (stop && display.textContent === coordinates) {
+            display.textContent = `${coordinates} · near ${stop.stop_name} (${Math.round(stop.distance)}m)`;
+        }
     }
 
     function createCustomIcon(emoji, color) {
@@ -169,42 +197,19 @@ document.addEventListener('DOMContentLoaded', () => {
         const limit = parseInt(departureLimitInput.value) || 5;
         const departureTime = departureTimeInput.value || new Date().toISOString();
 
-        // Build API URL with query parameters
-        const baseUrl = 'http://localhost:5001/public_transport/city/wroclaw/closest_departures/';
-        const params = new URLSearchParams({
-            start_coordinates: `${startCoords.lat},${startCoords.lng}`,
-            end_coordinates: `${endCoords.lat},${endCoords.lng}`,
-            start_time: departureTime,
-            limit: limit.toString()
-        });
-
-        const apiUrl = `${baseUrl}?${params.toString()}`;
-
+        hasSearched = true;
         displayStatus('🔍 Searching for departures...', 'text-blue-600');
         searchBtn.disabled = true;
         jsonOutputTextarea.value = '';
-        resultsSection.classList.add('hidden');
 
         try {
-            const response = await fetch(apiUrl);
-
-            if (!response.ok) {
-                let errorMessage = `HTTP Error: ${response.status} ${response.statusText}`;
-                try {
-                    const errorData = await response.json();
-                    if (errorData.message) {
-                        errorMessage += ` - ${errorData.message}`;
-                    } else if (errorData.error) {
-                        errorMessage += ` - ${errorData.error}`;
-                    }
-                } catch (parseError) {
-                    // If response is not JSON, use default error message
-                }
-                throw new Error(errorMessage);
-            }
+            const data = await searchChannel.run((signal) => api.getClosestDepartures(city, {
+                startCoords,
+                endCoords,
+                startTime: departureTime,
+                limit
+            }, { signal }));
 
-            const data = await response.json();
-            
             // Display raw JSON for debugging
             jsonOutputTextarea.value = JSON.stringify(data, null, 2);
             
@@ -214,55 +219,54 @@ document.addEventListener('DOMContentLoaded', () => {
             displayStatus('✅ Departures found successfully!', 'text-green-600');
 
         } catch (error) {
+            if (TransportApi.isAbortError(error)) {
+                return; // superseded by a newer search, which owns the UI now
+            }
             console.error("Failed to call API:", error);
             jsonOutputTextarea.value = `Error: ${error.message}`;
             displayStatus(`❌ Error: ${error.message}`, 'text-red-600');
             resultsSection.classList.add('hidden');
-        } finally {
-            searchBtn.disabled = false;
-            validateInputs(); // Re-enable if inputs are still valid
         }
+
+        searchBtn.disabled = false;
+        validateInputs(); // Re-enable if inputs are still valid
     }
 
-    // Add this function to fetch recommended departures
-    async function fetchRecommendedDepartures(city, startCoords, endCoords) {
-        // Example: You may need to convert coordinates to stop IDs using a backend endpoint
-        // For now, assume backend can handle coordinates directly (adapt as needed)
-        const url = `/public_transport/city/${city}/closest_departures?start_lat=${startCoords.lat}&start_lng=${startCoords.lng}&end_lat=${endCoords.lat}&end_lng=${endCoords.lng}`;
+    async function showTrip(tripId) {
+        displayStatus('🗺️ Loading route...', 'text-blue-600');
         try {
-            const response = await fetch(url);
-            if (!response.ok) throw new Error('Network response was not ok');
-            const data = await response.json();
-            return data;
+            const trip = await tripChannel.run((signal) => api.getTrip(city, tripId, { signal }));
+            if (!trip || !trip.stops) {
+                displayStatus('Route details are not available for this trip', 'text-yellow-600');
+                return;
+            }
+            drawTrip(trip);
+            displayStatus(`🗺️ Showing line ${trip.route_id} to ${trip.trip_headsign}`, 'text-green-600');
         } catch (error) {
-            console.error('Error fetching departures:', error);
-            return null;
+            if (TransportApi.isAbortError(error)) {
+                return;
+            }
+            console.error("Failed to load trip:", error);
+            displayStatus(`❌ Error: ${error.message}`, 'text-red-600');
         }
     }
 
-    // Update event listener for search button
-    searchBtn.addEventListener('click', async () => {
-        if (!startCoords || !endCoords) {
-            statusMessageDiv.textContent = 'Please select both start and destination points.';
-            return;
+    function drawTrip(trip) {
+        if (routeLayer) {
+            map.removeLayer(routeLayer);
         }
-        statusMessageDiv.textContent = 'Searching for recommended stops and departures...';
-        const city = 'Wroclaw'; // Hardcoded for now
-        const departures = await fetchRecommendedDepartures(city, startCoords, endCoords);
-        if (departures && departures.length > 0) {
-            resultsContainer.innerHTML = departures.map(dep => `
-                <div class="bg-blue-50 p-3 rounded-lg mb-2">
-                    <strong>Stop:</strong> ${dep.stop_name || dep.stop_id}<br>
-                    <strong>Departure:</strong> ${dep.departure_time}<br>
-                    <strong>Destination:</strong> ${dep.destination_name || dep.destination}
-                </div>
-            `).join('');
-            statusMessageDiv.textContent = '';
-        } else {
-            resultsContainer.innerHTML = '';
-            statusMessageDiv.textContent = 'No departures found for the selected route.';
+        const points = trip.stops.map(stop => [stop.coordinates.latitude, stop.coordinates.longitude]);
+        routeLayer = L.layerGroup([
+            L.polyline(points, { color: '#2563eb', weight: 4 }),
+            ...trip.stops.map(stop => L.circleMarker([stop.coordinates.latitude, stop.coordinates.longitude], {
+                radius: 4,
+                color: '#2563eb'
+            }).bindTooltip(stop.name))
+        ]).addTo(map);
+        if (points.length > 0) {
+            map.fitBounds(points, { padding: [20, 20] });
         }
-    });
+    }
 
     function displayResults(data) {
         resultsContainer.innerHTML = '';
@@ -315,6 +319,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const headsign = departure.trip_headsign || departure.headsign || departure.destination || departure.direction || 'Unknown Destination';
         const departureTime = departure.departure_time || departure.departureTime || departure.scheduled_time || departure.time || 'Unknown Time';
         const distance = departure.distance || departure.distance_meters || null;
+        const tripId = departure.trip_id || null;
 
         // Format departure time if it's a timestamp
         let formattedTime = departureTime;
@@ -359,9 +364,18 @@ document.addEventListener('DOMContentLoaded', () => {
                     <div class="bg-blue-100 text-blue-800 px-2 py-1 rounded text-sm font-semibold">
                         #${index}
                     </div>
+                    ${tripId ? `
+                    <button class="show-route-btn mt-2 text-sm text-blue-600 hover:underline">
+                        🗺️ Show route
+                    </button>
+                    ` : ''}
                 </div>
             </div>
         `;
+
+        if (tripId) {
+            card.querySelector('.show-route-btn').addEventListener('click', () => showTrip(tripId));
+        }
         
         return card;
     }
@@ -0,0 +1,117 @@
+// Service worker that keeps the frontend usable without a connection.
+//
+// - The app shell (the SHELL files) and the libraries it loads from CDNs are served from cache and
+//   refreshed in the background (stale-while-revalidate).
+// - bundle/manifest.json is fetched from the network first, so a new feed is picked up as soon as
+//   it is deployed, with the cached copy as the offline fallback. When the manifest names a new
+//   bundle file, the bundles of earlier feeds are evicted.
+// - Bundle files are immutable (named after their content) and served cache-first.
+// Nothing else is intercepted, API requests included: the data layer caches those itself and
+// answers the queries the bundle covers without the API.
+const SHELL_CACHE = 'shell-v2';
+const BUNDLE_CACHE = 'timetable-bundle';
+const SHELL = [
+    './',
+    'index.html',
+    'styles.css',
+    'script.js',
+    'api.js',
+    'offline.js',
+    'timetable.js',
+    'timetable-worker.js'
+];
+const CDN_HOSTS = ['cdn.tailwindcss.com', 'unpkg.com'];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(caches.open(SHELL_CACHE).then((cache) => cache.addAll(SHELL)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(caches.keys()
+        .then((names) => Promise.all(names
+            .filter((name) => name !== SHELL_CACHE && name !== BUNDLE_CACHE)
+            .map((name) => caches.delete(name))))
+        .then(() => self.clients.claim()));
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    const scope = new URL(self.registration.scope);
+
+    if (url.origin === scope.origin && url.pathname.startsWith(`${scope.pathname}bundle/`)) {
+        if (url.pathname.endsWith('/manifest.json')) {
+            event.respondWith(manifestNetworkFirst(request));
+        } else {
+            event.respondWith(cacheFirst(BUNDLE_CACHE, request));
+        }
+    } else if (isShell(url, scope) || CDN_HOSTS.includes(url.hostname)) {
+        event.respondWith(staleWhileRevalidate(SHELL_CACHE, request, event));
+    }
+});
+
+function isShell(url, scope) {
+    return url.origin === scope.origin
+        && SHELL.some((path) => new URL(path, scope).pathname === url.pathname);
+}
+
+async function manifestNetworkFirst(request) {
+    const cache = await caches.open(BUNDLE_CACHE);
+    try {
+        const response = await fetch(request, { cache: 'no-cache' });
+        if (response.ok) {
+            const manifest = await response.clone().json();
+            await cache.put(request, response.clone());
+            await evictOldBundles(cache, manifest.file);
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function evictOldBundles(cache, currentFile) {
+    for (const request of await cache.keys()) {
+        const path = new URL(request.url).pathname;
+        if (path.endsWith('.bin') && !path.endsWith(`/${currentFile}`)) {
+            await cache.delete(request);
+        }
+    }
+}
+
+async function cacheFirst(cacheName, request) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(cacheName, request, event) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    const refresh = fetch(request).then(async (response) => {
+        // Cross-origin script and stylesheet loads are opaque (status 0) but still worth keeping
+        if (response.ok || response.type === 'opaque') {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(refresh.catch(() => {}));
+        return cached;
+    }
+    return refresh;
+}
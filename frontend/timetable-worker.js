@@ -0,0 +1,47 @@
+// Web Worker that loads the static timetable bundle and answers queries off the main thread.
+// Messages are { id, method, args }; replies are { id, result } with result null whenever the
+// bundle cannot answer (not built, not loaded yet, or failed to load), so the caller asks the API.
+importScripts('timetable.js');
+
+const BUNDLE_URL = 'bundle/';
+let bundle = null;
+
+const loading = (async () => {
+    try {
+        const response = await fetch(`${BUNDLE_URL}manifest.json`, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`No timetable bundle (HTTP ${response.status})`);
+        }
+        const manifest = await response.json();
+        // Bundle files are named after their content, so they never need revalidating
+        const data = await fetch(`${BUNDLE_URL}${manifest.file}`, { cache: 'force-cache' });
+        if (!data.ok) {
+            throw new Error(`Failed to download ${manifest.file} (HTTP ${data.status})`);
+        }
+        bundle = new TimetableBundle(await data.arrayBuffer(), manifest);
+        postMessage({ type: 'ready', feedVersion: bundle.feedVersion });
+    } catch (error) {
+        console.warn('Offline timetable unavailable, using the API only:', error);
+        postMessage({ type: 'unavailable', error: error.message });
+    }
+})();
+
+const METHODS = {
+    nearestStops: ({ lat, lng, limit }) => bundle.nearestStops(lat, lng, limit),
+    closestDepartures: (query) => bundle.closestDepartures(query),
+    tripDetails: ({ tripId }) => bundle.tripDetails(tripId)
+};
+
+self.onmessage = async (event) => {
+    const { id, method, args } = event.data;
+    await loading;
+    let result = null;
+    if (bundle && METHODS[method]) {
+        try {
+            result = METHODS[method](args);
+        } catch (error) {
+            console.error(`Offline ${method} failed:`, error);
+        }
+    }
+    postMessage({ id, result, feedVersion: bundle ? bundle.feedVersion : null });
+};
@@ -0,0 +1,263 @@
+// Reader for the static timetable bundle built by export_bundle.py, and the queries it answers
+// offline. Loaded by timetable-worker.js; the file layout is documented in static_bundle.py.
+//
+// The queries mirror the API: closestDepartures follows departures_service.get_closest_departures
+// and tripDetails follows trips_service.get_trip_details, and both return the same JSON shapes.
+(function (global) {
+    'use strict';
+
+    const MAGIC = 'PTSB';
+    const VERSION = 1;
+    const HEADER_BYTES = 16;
+    const ENTRY_BYTES = 56;
+    const TYPED_ARRAYS = { B: Uint8Array, H: Uint16Array, I: Uint32Array, i: Int32Array };
+    const EARTH_RADIUS_M = 6371000;
+    const NEARBY_RADIUS_M = 1000;
+    const DEPARTURES_PER_STOP = 3;
+
+    class StringTable {
+        constructor(offsets, blob) {
+            this.offsets = offsets;
+            this.blob = blob;
+            this.decoder = new TextDecoder();
+            this.length = offsets.length - 1;
+        }
+
+        get(i) {
+            return this.decoder.decode(this.blob.subarray(this.offsets[i], this.offsets[i + 1]));
+        }
+    }
+
+    function haversineDistance(lat1, lon1, lat2, lon2) {
+        const toRadians = Math.PI / 180;
+        const phi1 = lat1 * toRadians;
+        const phi2 = lat2 * toRadians;
+        const dphi = (lat2 - lat1) * toRadians;
+        const dlambda = (lon2 - lon1) * toRadians;
+        const a = Math.sin(dphi / 2) ** 2 + Math.cos(phi1) * Math.cos(phi2) * Math.sin(dlambda / 2) ** 2;
+        return EARTH_RADIUS_M * 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
+    }
+
+    function parseTime(hhmmss) {
+        const [hours, minutes, seconds] = hhmmss.split(':').map(Number);
+        return hours * 3600 + minutes * 60 + (seconds || 0);
+    }
+
+    function formatTime(seconds) {
+        const pad = (value) => String(value).padStart(2, '0');
+        return `${pad(Math.floor(seconds / 3600))}:${pad(Math.floor(seconds % 3600 / 60))}:${pad(seconds % 60)}`;
+    }
+
+    function today() {
+        return new Date().toISOString().slice(0, 10);
+    }
+
+    class TimetableBundle {
+        constructor(buffer, manifest = {}) {
+            const view = new DataView(buffer);
+            const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+            if (magic !== MAGIC || view.getUint32(4, true) !== VERSION) {
+                throw new Error(`Not a version ${VERSION} timetable bundle`);
+            }
+
+            const columns = {};
+            const decoder = new TextDecoder();
+            for (let i = 0, count = view.getUint32(8, true); i < count; i++) {
+                const entry = HEADER_BYTES + i * ENTRY_BYTES;
+                const name = decoder.decode(new Uint8Array(buffer, entry, 32)).replace(/\0+$/, '');
+                const type = String.fromCharCode(view.getUint8(entry + 32));
+                const offset = Number(view.getBigUint64(entry + 40, true));
+                const length = Number(view.getBigUint64(entry + 48, true));
+                columns[name] = new TYPED_ARRAYS[type](buffer, offset, length);
+            }
+            const strings = (name) => new StringTable(columns[`${name}.offsets`], columns[`${name}.blob`]);
+
+            this.feedVersion = manifest.feed_version || null;
+            this.columns = columns;
+            this.stopId = strings('stop_id');
+            this.stopName = strings('stop_name');
+            this.tripId = strings('trip_id');
+            this.routeId = strings('route_id');
+            this.headsign = strings('headsign');
+            this.stopRows = new Map();
+            for (let i = 0; i < this.stopId.length; i++) {
+                this.stopRows.set(this.stopId.get(i), i);
+            }
+            this.sdDeparture = this.deriveStopDepartures();
+        }
+
+        // Departure time of every (stop, trip) entry, which the bundle leaves out to stay small
+        deriveStopDepartures() {
+            const { sd_trip, sd_position, trip_start, trip_profile, profile_offsets, profile_departure } = this.columns;
+            const departures = new Int32Array(sd_trip.length);
+            for (let k = 0; k < sd_trip.length; k++) {
+                const trip = sd_trip[k];
+                departures[k] = trip_start[trip] + profile_departure[profile_offsets[trip_profile[trip]] + sd_position[k]];
+            }
+            return departures;
+        }
+
+        stopLat(row) {
+            return this.columns.stop_lat[row] / 1e6;
+        }
+
+        stopLon(row) {
+            return this.columns.stop_lon[row] / 1e6;
+        }
+
+        stop(row) {
+            return {
+                stop_id: this.stopId.get(row),
+                stop_name: this.stopName.get(row),
+                stop_lat: this.stopLat(row),
+                stop_lon: this.stopLon(row)
+            };
+        }
+
+        // Stops within radiusM of the point as { row, distance }, closest first
+        nearbyStops(lat, lon, radiusM = NEARBY_RADIUS_M) {
+            const { stop_lat, stop_lon } = this.columns;
+            // Cheap bounding box before the exact distance
+            const latDelta = radiusM / 111320;
+            const lonDelta = radiusM / (111320 * Math.max(Math.cos(lat * Math.PI / 180), 0.01));
+            const nearby = [];
+            for (let row = 0; row < stop_lat.length; row++) {
+                const stopLat = stop_lat[row] / 1e6;
+                const stopLon = stop_lon[row] / 1e6;
+                if (Math.abs(stopLat - lat) > latDelta || Math.abs(stopLon - lon) > lonDelta) {
+                    continue;
+                }
+                const distance = haversineDistance(lat, lon, stopLat, stopLon);
+                if (distance <= radiusM) {
+                    nearby.push({ row, distance });
+                }
+            }
+            return nearby.sort((a, b) => a.distance - b.distance);
+        }
+
+        nearestStops(lat, lon, limit = 1, radiusM = NEARBY_RADIUS_M) {
+            return this.nearbyStops(lat, lon, radiusM).slice(0, limit).map(({ row, distance }) => ({
+                ...this.stop(row),
+                distance
+            }));
+        }
+
+        tripRow(tripId) {
+            let low = 0;
+            let high = this.tripId.length;
+            while (low < high) {
+                const middle = (low + high) >> 1;
+                if (this.tripId.get(middle) < tripId) {
+                    low = middle + 1;
+                } else {
+                    high = middle;
+                }
+            }
+            return low < this.tripId.length && this.tripId.get(low) === tripId ? low : null;
+        }
+
+        // [{ stop, arrival, departure }] of a trip in sequence order, times in seconds
+        tripStops(trip) {
+            const { trip_start, trip_profile, profile_pattern, profile_offsets, profile_arrival, profile_departure,
+                pattern_offsets, pattern_stops } = this.columns;
+            const profile = trip_profile[trip];
+            const pattern = profile_pattern[profile];
+            const start = trip_start[trip];
+            const stops = [];
+            for (let i = 0, count = pattern_offsets[pattern + 1] - pattern_offsets[pattern]; i < count; i++) {
+                stops.push({
+                    stop: pattern_stops[pattern_offsets[pattern] + i],
+                    arrival: start + profile_arrival[profile_offsets[profile] + i],
+                    departure: start + profile_departure[profile_offsets[profile] + i]
+                });
+            }
+            return stops;
+        }
+
+        // Departures from a stop at or after fromSeconds as { trip, position, departure }, sorted
+        stopDepartures(stopRow, fromSeconds, limit) {
+            const { stop_dep_offsets, sd_trip, sd_position } = this.columns;
+            let low = stop_dep_offsets[stopRow];
+            let high = stop_dep_offsets[stopRow + 1];
+            const end = high;
+            while (low < high) {
+                const middle = (low + high) >> 1;
+                if (this.sdDeparture[middle] < fromSeconds) {
+                    low = middle + 1;
+                } else {
+                    high = middle;
+                }
+            }
+            const departures = [];
+            for (let k = low; k < Math.min(end, low + limit); k++) {
+                departures.push({ trip: sd_trip[k], position: sd_position[k], departure: this.sdDeparture[k] });
+            }
+            return departures;
+        }
+
+        movesTowards(trip, position, endLat, endLon) {
+            // The trip must reach the stop closest to the destination after boarding
+            let destination = null;
+            let closest = Infinity;
+            this.tripStops(trip).forEach(({ stop }, i) => {
+                const distance = haversineDistance(this.stopLat(stop), this.stopLon(stop), endLat, endLon);
+                if (distance < closest) {
+                    closest = distance;
+                    destination = i;
+                }
+            });
+            return destination !== null && position < destination;
+        }
+
+        closestDepartures({ startLat, startLon, endLat, endLon, startTime, limit = 5 }) {
+            const fromSeconds = parseTime(startTime.slice(11, 19));
+            const date = today();
+            const departures = [];
+            for (const { row, distance } of this.nearbyStops(startLat, startLon).slice(0, limit)) {
+                for (const { trip, position, departure } of this.stopDepartures(row, fromSeconds, DEPARTURES_PER_STOP)) {
+                    if (!this.movesTowards(trip, position, endLat, endLon)) {
+                        continue;
+                    }
+                    const time = `${date}T${formatTime(departure)}Z`;
+                    departures.push({
+                        distance,
+                        departure: {
+                            trip_id: this.tripId.get(trip),
+                            route_id: this.routeId.get(this.columns.trip_route[trip]),
+                            trip_headsign: this.headsign.get(this.columns.trip_headsign[trip]),
+                            stop: {
+                                name: this.stopName.get(row),
+                                coordinates: { latitude: this.stopLat(row), longitude: this.stopLon(row) },
+                                arrival_time: time,
+                                departure_time: time
+                            }
+                        }
+                    });
+                }
+            }
+            // Sorted by walking distance like the API; the sort is stable, so ties keep departure order
+            return departures.sort((a, b) => a.distance - b.distance).slice(0, limit).map(({ departure }) => departure);
+        }
+
+        tripDetails(tripId) {
+            const trip = this.tripRow(tripId);
+            if (trip === null) {
+                return null;
+            }
+            const date = today();
+            return {
+                trip_id: tripId,
+                route_id: this.routeId.get(this.columns.trip_route[trip]),
+                trip_headsign: this.headsign.get(this.columns.trip_headsign[trip]),
+                stops: this.tripStops(trip).map(({ stop, arrival, departure }) => ({
+                    name: this.stopName.get(stop),
+                    coordinates: { latitude: this.stopLat(stop), longitude: this.stopLon(stop) },
+                    arrival_time: `${date}T${formatTime(arrival)}Z`,
+                    departure_time: `${date}T${formatTime(departure)}Z`
+                }))
+            };
+        }
+    }
+
+    global.TimetableBundle = TimetableBundle;
+})(self);
@@ -1,13 +1,25 @@
 #!/usr/bin/env python3
 """
 Script to import GTFS data into SQLite database for the public transport API.
+
+The feed is validated first (see public_transport_api/feed_validation.py) and the report is written
+next to the database as <database>.validation.json. A feed with errors is not imported.
 """
 
+import argparse
 import sqlite3
 import csv
+import json
 import os
+import sys
 from pathlib import Path
 
+try:
+    from public_transport_api import analytics, feed_validation, timetable_snapshot
+except ImportError:  # run from a checkout without `pip install .`; the modules it needs are stdlib-only
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+    from public_transport_api import analytics, feed_validation, timetable_snapshot
+
 def create_table_from_csv(cursor, csv_file_path, table_name):
     """Create a table based on CSV headers."""
     with open(csv_file_path, 'r', encoding='utf-8-sig') as file:
@@ -57,10 +69,187 @@ def import_csv_to_table(cursor, csv_file_path, table_name):
 
         print(f"  Completed: {rows_imported} rows imported into {table_name}")
 
-def main():
+def _table_columns(cursor, table_name):
+    cursor.execute(f'PRAGMA table_info("{table_name}")')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _interpolate(stops):
+    """
+    Times for the untimed stops of one trip, spread evenly between the timed stops around them.
+
+    ``stops`` are (stop_sequence, rowid, arrival, departure) with normalized times, None when untimed.
+    Yields (rowid, time); untimed stops before the first or after the last timed stop get nothing.
+    """
+    stops.sort()
+    timed = [i for i, stop in enumerate(stops) if stop[2] is not None]
+    for before, after in zip(timed, timed[1:]):
+        start = timetable_snapshot.parse_time(stops[before][3])
+        end = timetable_snapshot.parse_time(stops[after][2])
+        for i in range(before + 1, after):
+            yield stops[i][1], timetable_snapshot.format_time(start + (end - start) * (i - before) // (after - before))
+
+
+def normalize_stop_times(cursor):
+    """
+    Rewrites stop_times arrival and departure times as zero-padded HH:MM:SS.
+
+    The SQLite and in-memory query engines compare times as text and the snapshot compares seconds;
+    they only agree when "8:05:00" is stored as "08:05:00". An empty time becomes NULL, and a stop with
+    only one of the two times gets it for both, the rule the snapshot and the block index apply.
+    Untimed stops, which GTFS allows between timed ones, get times interpolated along their trip.
+    Times that do not parse are left as they are.
+    """
+    columns = _table_columns(cursor, 'stop_times')
+    if not {'arrival_time', 'departure_time'} <= columns:
+        return
+    by_trip = {'trip_id', 'stop_sequence'} <= columns
+    cursor.execute(f"SELECT rowid, arrival_time, departure_time, {'trip_id' if by_trip else 'NULL'} FROM stop_times")
+    updates = {}
+    untimed_trips = set()
+    for rowid, arrival_time, departure_time, trip_id in cursor.fetchall():
+        try:
+            arrival = timetable_snapshot.normalize_time(arrival_time)
+            departure = timetable_snapshot.normalize_time(departure_time)
+        except ValueError:
+            continue
+        arrival, departure = arrival or departure, departure or arrival
+        if (arrival, departure) != (arrival_time, departure_time):
+            updates[rowid] = (arrival, departure)
+        if arrival is None and by_trip:
+            untimed_trips.add(trip_id)
+
+    interpolated = 0
+    if untimed_trips:
+        # Only the trips that have untimed stops are kept in memory
+        cursor.execute("SELECT rowid, trip_id, stop_sequence, arrival_time, departure_time FROM stop_times")
+        trips = {}
+        for rowid, trip_id, stop_sequence, arrival_time, departure_time in cursor.fetchall():
+            if trip_id in untimed_trips and str(stop_sequence).isdigit():
+                arrival, departure = updates.get(rowid, (arrival_time, departure_time))
+                trips.setdefault(trip_id, []).append((int(stop_sequence), rowid, arrival, departure))
+        for stops in trips.values():
+            try:
+                times = list(_interpolate(stops))
+            except ValueError:  # a timed stop around them does not parse
+                continue
+            for rowid, time in times:
+                updates[rowid] = (time, time)
+            interpolated += len(times)
+
+    cursor.executemany("UPDATE stop_times SET arrival_time = ?, departure_time = ? WHERE rowid = ?",
+                       ((arrival, departure, rowid) for rowid, (arrival, departure) in updates.items()))
+    if updates:
+        print(f"  Normalized the times of {len(updates)} stop_times rows ({interpolated} untimed stops interpolated)")
+
+
+def build_block_index(cursor):
+    """
+    Build the blocks table: every (route, brigade, service) vehicle day as an ordered trip list.
+
+    Each row is one trip of a block with its position in the day and its first departure and last
+    arrival in seconds since midnight (NULL when the feed has no stop_times), so a whole block is a
+    single range read on the primary key. The table is rebuilt from scratch on every import and holds
+    each trip_id once.
+    """
+    trip_columns = _table_columns(cursor, 'trips')
+    if 'brigade_id' not in trip_columns:
+        print("Warning: trips has no brigade_id column, skipping the block index...")
+        return 0
+
+    print("\nBuilding block index...")
+    spans = {}
+    if {'trip_id', 'arrival_time', 'departure_time'} <= _table_columns(cursor, 'stop_times'):
+        cursor.execute("SELECT trip_id, arrival_time, departure_time FROM stop_times")
+        for trip_id, arrival_time, departure_time in cursor.fetchall():
+            try:
+                departure = timetable_snapshot.parse_time(departure_time or arrival_time)
+                arrival = timetable_snapshot.parse_time(arrival_time or departure_time)
+            except (AttributeError, ValueError):
+                continue
+            first, last = spans.get(trip_id, (departure, arrival))
+            spans[trip_id] = (min(first, departure), max(last, arrival))
+
+    vehicle = 'vehicle_id' if 'vehicle_id' in trip_columns else 'NULL'
+    cursor.execute(f"""
+        SELECT route_id, brigade_id, service_id, trip_id, trip_headsign, direction_id, {vehicle}
+        FROM trips WHERE brigade_id IS NOT NULL AND brigade_id != ''
+    """)
+    blocks = {}
+    indexed = set()
+    for route_id, brigade_id, service_id, trip_id, headsign, direction_id, vehicle_id in cursor.fetchall():
+        # A trip runs in one block only; a repeated trips row would repeat the run
+        if trip_id in indexed:
+            continue
+        indexed.add(trip_id)
+        first, last = spans.get(trip_id, (None, None))
+        blocks.setdefault((route_id, brigade_id, service_id), []).append(
+            (first, last, trip_id, headsign, direction_id, vehicle_id))
+
+    cursor.execute("DROP TABLE IF EXISTS blocks")
+    cursor.execute("""
+        CREATE TABLE blocks (
+            route_id TEXT NOT NULL,
+            brigade_id TEXT NOT NULL,
+            service_id TEXT NOT NULL,
+            block_seq INTEGER NOT NULL,
+            trip_id TEXT NOT NULL,
+            trip_headsign TEXT,
+            direction_id TEXT,
+            vehicle_id TEXT,
+            first_departure INTEGER,
+            last_arrival INTEGER,
+            PRIMARY KEY (route_id, brigade_id, service_id, block_seq)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE UNIQUE INDEX blocks_trip ON blocks (trip_id)")
+    rows = []
+    for (route_id, brigade_id, service_id), trips in blocks.items():
+        # Trips without times sort last, in trip_id order
+        trips.sort(key=lambda trip: (trip[0] is None, trip[0] or 0, trip[2]))
+        for block_seq, (first, last, trip_id, headsign, direction_id, vehicle_id) in enumerate(trips):
+            rows.append((route_id, brigade_id, service_id, block_seq, trip_id, headsign, direction_id, vehicle_id,
+                         first, last))
+    cursor.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    print(f"  Completed: {len(blocks)} blocks, {len(rows)} trips indexed")
+    return len(blocks)
+
+
+def build_stats(conn):
+    """Refresh the line and stop statistics served by /stats; unchanged routes are kept as they are."""
+    if not {'trip_id', 'departure_time', 'stop_sequence'} <= _table_columns(conn.cursor(), 'stop_times'):
+        print("Warning: no stop_times, skipping line statistics...")
+        return None
+    print("\nComputing line statistics...")
+    counts = analytics.refresh(conn)
+    print(f"  Completed: {counts['changed']} routes recomputed, {counts['unchanged']} unchanged, "
+          f"{counts['removed']} removed")
+    return counts
+
+
+def validate_feed(gtfs_dir, report_path, workers=None):
+    """Validate the feed and write the report; raises FeedValidationError when it has errors."""
+    print(f"Validating {gtfs_dir}...")
+    report = feed_validation.validate(gtfs_dir, workers)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for issue in report["warnings"]:
+        print(f"  Warning: {feed_validation.format_issue(issue)}")
+    for issue in report["errors"]:
+        print(f"  Error: {feed_validation.format_issue(issue)}")
+    print(f"  {'Passed' if report['valid'] else 'Failed'} in {report['elapsed_s']:.1f}s "
+          f"({len(report['errors'])} errors, {len(report['warnings'])} warnings); report: {report_path}")
+    if not report["valid"]:
+        raise feed_validation.FeedValidationError(report)
+    return report
+
+
+def main(db_path="trips.sqlite", gtfs_dir="OtwartyWroclaw_rozklad_jazdy_GTFS", report_path=None, workers=None,
+         validate=True):
     """Main function to set up the database."""
-    db_path = "trips.sqlite"
-    gtfs_dir = "OtwartyWroclaw_rozklad_jazdy_GTFS"
+    if validate:
+        # Before the database is opened, so a broken feed never reaches it
+        validate_feed(gtfs_dir, report_path or os.path.splitext(db_path)[0] + ".validation.json", workers)
 
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
@@ -74,12 +263,24 @@ def main():
             file_path = os.path.join(gtfs_dir, filename)
 
             print(f"\nProcessing {filename}...")
+            # Replace the table of an earlier import: the GTFS tables have no keys, so importing into
+            # it would append a second copy of every row. The derived stats_* tables are kept, which
+            # lets analytics.refresh skip the routes whose rows did not change.
+            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
             # Create table based on CSV structure
             create_table_from_csv(cursor, file_path, table_name)
             # Import data
             import_csv_to_table(cursor, file_path, table_name)
             conn.commit()
 
+        normalize_stop_times(cursor)
+        conn.commit()
+
+        build_block_index(cursor)
+        conn.commit()
+
+        build_stats(conn)
+
         print("\nDatabase setup completed successfully!")
 
         # Show statistics for all tables
@@ -95,8 +296,19 @@ def main():
     except Exception as e:
         print(f"Error setting up database: {e}")
         conn.rollback()
+        raise
     finally:
         conn.close()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Validate a GTFS feed and import it into SQLite.")
+    parser.add_argument("--database", default="trips.sqlite", help="SQLite database to create or update")
+    parser.add_argument("--gtfs-dir", default="OtwartyWroclaw_rozklad_jazdy_GTFS", help="Directory of GTFS .txt files")
+    parser.add_argument("--report", help="Validation report path (default: <database>.validation.json)")
+    parser.add_argument("--workers", type=int, help="Validation processes (default: one per CPU)")
+    parser.add_argument("--skip-validation", action="store_true", help="Import without validating the feed first")
+    args = parser.parse_args()
+    try:
+        main(args.database, args.gtfs_dir, args.report, args.workers, not args.skip_validation)
+    except feed_validation.FeedValidationError:
+        sys.exit(1)
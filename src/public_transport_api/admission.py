@@ -0,0 +1,196 @@
+"""
+Request coalescing and admission control for bursts of near-identical requests.
+
+``coalesce`` runs one computation per key at a time: concurrent callers with the same (normalized)
+key wait for the leader and share its result instead of repeating the stop scan and trip queries.
+Only the leader's computation goes through admission control; followers wait without taking a slot,
+so a burst of identical requests costs one slot however large it is.
+
+``admission_controlled`` bounds the work a worker takes on in views that do not coalesce. At most
+ADMISSION_MAX_CONCURRENT requests run at once and at most ADMISSION_MAX_QUEUE wait for a slot. Anything beyond that, or a
+request that waits longer than ADMISSION_QUEUE_TIMEOUT, is shed with 503 and ``Retry-After``.
+While the recent p95 latency is above ADMISSION_LATENCY_SLO, nothing is queued: a request either
+gets a free slot or is shed straight away.
+"""
+import functools
+import threading
+import time
+from collections import deque
+
+from public_transport_api.instrumentation import is_muted
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; carries the Retry-After value in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("Service overloaded")
+        self.retry_after = retry_after
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns (result, shared); shared is True when another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+
+class AdmissionController:
+    """Bounded concurrency plus a bounded wait queue, tightened while the latency SLO is breached."""
+
+    def __init__(self, max_concurrent=8, max_queue=16, queue_timeout=2.0, latency_slo=1.0, retry_after=1,
+                 window=200):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_slo = latency_slo
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._latencies = deque(maxlen=window)
+        self.shed = 0
+
+    def slo_breached(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < 20:
+            return False
+        return latencies[int(0.95 * (len(latencies) - 1))] > self.latency_slo
+
+    def _reject(self):
+        with self._lock:
+            self.shed += 1
+        raise Overloaded(self.retry_after)
+
+    def run(self, fn):
+        """Runs fn in an admission slot or raises Overloaded."""
+        strict = self.slo_breached()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                queue_full = self._waiting >= self.max_queue
+                if not queue_full and not strict:
+                    self._waiting += 1
+            if queue_full or strict:
+                self._reject()
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                self._reject()
+
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            elapsed = time.perf_counter() - started
+            if not is_muted():
+                with self._lock:
+                    self._latencies.append(elapsed)
+            self._slots.release()
+
+
+_flights = SingleFlight()
+
+
+def _controller():
+    from flask import current_app, has_app_context
+
+    return current_app.extensions.get("admission") if has_app_context() else None
+
+
+def coalesce(key, fn):
+    """
+    Shares one in-flight computation of fn among concurrent callers with the same key.
+
+    The leader runs fn in an admission slot of the app's AdmissionController; when it is shed, the
+    callers waiting on it get the same Overloaded error.
+    """
+    controller = _controller()
+    result, _ = _flights.do(key, fn if controller is None else lambda: controller.run(fn))
+    return result
+
+
+def normalize_coordinates(coordinates, places=4):
+    """Rounds "lat,lon" to ~10 m so that near-identical requests share a key; bad input is left alone."""
+    try:
+        lat, lon = map(float, coordinates.split(','))
+    except (AttributeError, ValueError):
+        return coordinates
+    return f"{lat:.{places}f},{lon:.{places}f}"
+
+
+def admission_controlled(view):
+    """Runs a view under the app's AdmissionController (a no-op when init_app was not called)."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = _controller()
+        if controller is None:
+            return view(*args, **kwargs)
+        return controller.run(lambda: view(*args, **kwargs))
+
+    return wrapper
+
+
+def init_app(app):
+    """Creates the app's AdmissionController from config and turns Overloaded into 503 responses."""
+    from flask import jsonify
+
+    app.config.setdefault("ADMISSION_MAX_CONCURRENT", 8)
+    app.config.setdefault("ADMISSION_MAX_QUEUE", 16)
+    app.config.setdefault("ADMISSION_QUEUE_TIMEOUT", 2.0)
+    app.config.setdefault("ADMISSION_LATENCY_SLO", 1.0)
+    app.config.setdefault("ADMISSION_RETRY_AFTER", 1)
+
+    controller = AdmissionController(
+        max_concurrent=app.config["ADMISSION_MAX_CONCURRENT"],
+        max_queue=app.config["ADMISSION_MAX_QUEUE"],
+        queue_timeout=app.config["ADMISSION_QUEUE_TIMEOUT"],
+        latency_slo=app.config["ADMISSION_LATENCY_SLO"],
+        retry_after=app.config["ADMISSION_RETRY_AFTER"],
+    )
+    app.extensions["admission"] = controller
+
+    @app.errorhandler(Overloaded)
+    def overloaded(e):
+        response = jsonify({'error': 'Service overloaded, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+
+    return controller
@@ -0,0 +1,232 @@
+"""
+Line and stop frequency statistics, materialized after import.
+
+``refresh`` reads trips and stop_times once and aggregates departure times into summary tables
+that the /stats endpoints serve with single indexed reads:
+
+    stats_lines       per (route, service, direction): trips, first/last departure from the
+                      first stop, mean and max headway, peak trips per hour
+    stats_line_hours  per (route, service, direction, hour): trips starting in that hour
+    stats_stops       per (stop, route, service): departures, first/last departure, max gap,
+                      peak departures per hour; a trip's last stop is not a departure
+    stats_sources     per route: digest of the rows its statistics were computed from
+
+Times are seconds since the start of the service day. The aggregation sorts (group, time) arrays
+and reduces them per group. It runs on NumPy when that is installed and falls back to plain Python
+with the same results. Refreshes are incremental: only routes whose trips or stop times changed
+since the last run are recomputed and rewritten.
+"""
+import hashlib
+
+from public_transport_api.timetable_snapshot import parse_time
+
+HOURS = 48  # service days run past midnight; later departures are folded into the last bucket
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stats_lines (
+        route_id TEXT NOT NULL,
+        service_id TEXT NOT NULL,
+        direction_id TEXT NOT NULL,
+        trips INTEGER NOT NULL,
+        first_departure INTEGER NOT NULL,
+        last_departure INTEGER NOT NULL,
+        mean_headway REAL,
+        max_headway INTEGER,
+        peak_trips_per_hour INTEGER NOT NULL,
+        PRIMARY KEY (route_id, service_id, direction_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS stats_line_hours (
+        route_id TEXT NOT NULL,
+        service_id TEXT NOT NULL,
+        direction_id TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        trips INTEGER NOT NULL,
+        PRIMARY KEY (route_id, service_id, direction_id, hour)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS stats_stops (
+        stop_id TEXT NOT NULL,
+        route_id TEXT NOT NULL,
+        service_id TEXT NOT NULL,
+        departures INTEGER NOT NULL,
+        first_departure INTEGER NOT NULL,
+        last_departure INTEGER NOT NULL,
+        max_gap INTEGER,
+        peak_departures_per_hour INTEGER NOT NULL,
+        PRIMARY KEY (stop_id, route_id, service_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS stats_stops_route ON stats_stops (route_id);
+    CREATE TABLE IF NOT EXISTS stats_sources (
+        route_id TEXT PRIMARY KEY,
+        digest TEXT NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+STATS_TABLES = ("stats_lines", "stats_line_hours", "stats_stops", "stats_sources")
+
+
+def _load_numpy():
+    try:
+        import numpy
+    except ImportError:  # optional, the pure Python aggregation gives the same results
+        return None
+    return numpy
+
+
+def _group_stats_numpy(np, keys, times, groups, hourly):
+    keys = np.asarray(keys, dtype=np.int64)
+    times = np.asarray(times, dtype=np.int64)
+    order = np.lexsort((times, keys))
+    keys, times = keys[order], times[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    gaps = np.diff(times, prepend=times[:1])
+    gaps[starts] = 0
+    max_gaps = np.maximum.reduceat(gaps, starts)
+    hours = None
+    if hourly:
+        buckets = np.minimum(times // 3600, HOURS - 1)
+        hours = np.bincount(keys * HOURS + buckets, minlength=groups * HOURS).reshape(groups, HOURS)
+    return [
+        (int(key), int(end - start), int(times[start]), int(times[end - 1]), int(gap),
+         None if hours is None else hours[key].tolist())
+        for key, start, end, gap in zip(keys[starts].tolist(), starts.tolist(), ends.tolist(), max_gaps.tolist())
+    ]
+
+
+def _group_stats_python(keys, times, hourly):
+    grouped = {}
+    for key, time in zip(keys, times):
+        grouped.setdefault(key, []).append(time)
+    stats = []
+    for key in sorted(grouped):
+        group_times = sorted(grouped[key])
+        max_gap = max((b - a for a, b in zip(group_times, group_times[1:])), default=0)
+        hours = None
+        if hourly:
+            hours = [0] * HOURS
+            for time in group_times:
+                hours[min(time // 3600, HOURS - 1)] += 1
+        stats.append((key, len(group_times), group_times[0], group_times[-1], max_gap, hours))
+    return stats
+
+
+def group_stats(keys, times, groups, hourly=False, np=None):
+    """
+    Aggregates times per group; keys are dense group numbers in ``range(groups)``.
+
+    Returns (key, count, first, last, max_gap, hours) per non-empty group in key order, where
+    hours is the per-hour count (HOURS buckets) when ``hourly`` is set and None otherwise.
+    """
+    if not keys:
+        return []
+    if np is not None:
+        return _group_stats_numpy(np, keys, times, groups, hourly)
+    return _group_stats_python(keys, times, hourly)
+
+
+class _Codes(dict):
+    """Assigns dense integer codes to hashable values in first-seen order."""
+
+    def __missing__(self, value):
+        code = self[value] = len(self)
+        return code
+
+    def values_by_code(self):
+        return list(self.keys())
+
+
+def _read_routes(cursor):
+    """Returns {route_id: sorted [(service_id, direction_id, trip_id, stop_sequence, stop_id, seconds), ...]}."""
+    cursor.execute("SELECT trip_id, route_id, service_id, direction_id FROM trips")
+    trips = {trip_id: (route_id, service_id, direction_id or '') for trip_id, route_id, service_id, direction_id
+             in cursor.fetchall()}
+    cursor.execute("SELECT trip_id, stop_id, departure_time, stop_sequence FROM stop_times")
+    routes = {}
+    parsed = {}  # a feed has at most a few thousand distinct times, parse each once
+    for trip_id, stop_id, departure_time, stop_sequence in cursor.fetchall():
+        trip = trips.get(trip_id)
+        seconds = parsed.get(departure_time)
+        try:
+            if seconds is None:
+                seconds = parsed[departure_time] = parse_time(departure_time)
+            stop_sequence = int(stop_sequence)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if trip is not None:
+            routes.setdefault(trip[0], []).append((trip[1], trip[2], trip_id, stop_sequence, stop_id, seconds))
+    for rows in routes.values():
+        rows.sort()
+    return routes
+
+
+def _digest(rows):
+    return hashlib.blake2b(repr(rows).encode(), digest_size=16).hexdigest()
+
+
+def _aggregate(routes, np):
+    """Computes the summary rows for the given routes in one vectorized pass per statistic."""
+    trip_codes, stop_group_codes = _Codes(), _Codes()
+    trip_keys, times, stop_keys, departures = [], [], [], []
+    for route_id, rows in routes.items():
+        for index, (service_id, direction_id, trip_id, _, stop_id, seconds) in enumerate(rows):
+            trip_keys.append(trip_codes[(route_id, service_id, direction_id, trip_id)])
+            times.append(seconds)
+            # Rows are in stop_sequence order per trip. Nothing departs from a trip's last stop,
+            # unless the trip has only one.
+            first = index == 0 or rows[index - 1][2] != trip_id
+            last = index == len(rows) - 1 or rows[index + 1][2] != trip_id
+            if first or not last:
+                stop_keys.append(stop_group_codes[(stop_id, route_id, service_id)])
+                departures.append(seconds)
+
+    # A trip leaves its first stop at its earliest departure; line headways are measured there
+    trips = trip_codes.values_by_code()
+    line_codes = _Codes()
+    line_keys, starts = [], []
+    for key, _, first, _, _, _ in group_stats(trip_keys, times, len(trips), np=np):
+        route_id, service_id, direction_id, _ = trips[key]
+        line_keys.append(line_codes[(route_id, service_id, direction_id)])
+        starts.append(first)
+
+    lines = line_codes.values_by_code()
+    line_rows, hour_rows = [], []
+    for key, count, first, last, max_gap, hours in group_stats(line_keys, starts, len(lines), hourly=True, np=np):
+        mean_headway = (last - first) / (count - 1) if count > 1 else None
+        line_rows.append((*lines[key], count, first, last, mean_headway, max_gap if count > 1 else None, max(hours)))
+        hour_rows.extend((*lines[key], hour, trips_in_hour) for hour, trips_in_hour in enumerate(hours) if trips_in_hour)
+
+    stop_groups = stop_group_codes.values_by_code()
+    stop_rows = [
+        (*stop_groups[key], count, first, last, max_gap if count > 1 else None, max(hours))
+        for key, count, first, last, max_gap, hours
+        in group_stats(stop_keys, departures, len(stop_groups), hourly=True, np=np)
+    ]
+    return line_rows, hour_rows, stop_rows
+
+
+def refresh(conn, use_numpy=True):
+    """
+    Brings the summary tables up to date with trips and stop_times, recomputing changed routes only.
+
+    Returns {"changed": n, "removed": n, "unchanged": n} route counts.
+    """
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA)
+    routes = _read_routes(cursor)
+    digests = {route_id: _digest(rows) for route_id, rows in routes.items()}
+    cursor.execute("SELECT route_id, digest FROM stats_sources")
+    stored = dict(cursor.fetchall())
+
+    changed = {route_id: rows for route_id, rows in routes.items() if stored.get(route_id) != digests[route_id]}
+    removed = set(stored) - set(routes)
+    for route_id in list(changed) + sorted(removed):
+        for table in STATS_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE route_id = ?", (route_id,))
+
+    line_rows, hour_rows, stop_rows = _aggregate(changed, _load_numpy() if use_numpy else None)
+    cursor.executemany("INSERT INTO stats_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", line_rows)
+    cursor.executemany("INSERT INTO stats_line_hours VALUES (?, ?, ?, ?, ?)", hour_rows)
+    cursor.executemany("INSERT INTO stats_stops VALUES (?, ?, ?, ?, ?, ?, ?, ?)", stop_rows)
+    cursor.executemany("INSERT INTO stats_sources VALUES (?, ?)", ((route_id, digests[route_id]) for route_id in changed))
+    conn.commit()
+    return {"changed": len(changed), "removed": len(removed), "unchanged": len(routes) - len(changed)}
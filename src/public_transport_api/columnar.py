@@ -0,0 +1,348 @@
+"""
+Columnar export of the imported feed to Parquet or Arrow IPC files, for offline analysis.
+
+``export`` streams every table out of trips.sqlite in batches of ``batch_rows`` rows, so memory stays
+bounded by the batch size (plus the id dictionaries) whatever the size of the feed. Columns get
+proper types instead of SQLite's TEXT:
+
+    coordinates              float64
+    arrival/departure times  int32 seconds since the start of the service day (may exceed 86400)
+    sequences, enums         int32 / int16 / int8
+    weekday flags, is_main   bool
+    dates                    date32
+    ids, names, headsigns    dictionary<int32, string>
+
+Dictionaries only ever grow while a table is written, so every batch of a file shares one dictionary
+(Arrow IPC files require that, and Parquet keeps a single dictionary page per column chunk).
+
+Layout (``ext`` is ``parquet`` or ``arrow``)::
+
+    <output>/stops.<ext>, routes.<ext>, trips.<ext>, variants.<ext>, calendar.<ext>, calendar_dates.<ext>
+    <output>/stop_times/service_id=<service_id>/part-0.<ext>
+
+stop_times is partitioned Hive-style by the service of its trip, and every partition is sorted by
+(trip_id, stop_sequence). ``pyarrow.dataset.dataset(output + "/stop_times", partitioning="hive")``
+reads it back with the service_id column. ``timetable_rows`` turns an export into the row streams that
+``timetable_snapshot.build`` takes, so the API snapshot can be built without the SQLite database.
+
+Values that cannot be converted to their column's type are written as null and logged as a warning
+with a count per column.
+
+Requires pyarrow, which is an optional dependency.
+"""
+import datetime
+import heapq
+import logging
+import os
+import shutil
+import sqlite3
+from urllib.parse import quote, unquote
+
+from public_transport_api.timetable_snapshot import parse_time
+
+TABLES = ("stops", "routes", "trips", "variants", "calendar", "calendar_dates", "stop_times")
+PARTITIONED = {"stop_times": "service_id"}
+FORMATS = ("parquet", "arrow")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Column name -> logical type; anything not listed is a string, or a dictionary when it is an id
+COLUMN_TYPES = {
+    "stop_lat": "float64",
+    "stop_lon": "float64",
+    "arrival_time": "time",
+    "departure_time": "time",
+    "stop_sequence": "int32",
+    "direction_id": "int8",
+    "route_type": "int16",
+    "location_type": "int8",
+    "wheelchair_boarding": "int8",
+    "pickup_type": "int8",
+    "drop_off_type": "int8",
+    "exception_type": "int8",
+    "is_main": "bool",
+    "start_date": "date",
+    "end_date": "date",
+    "date": "date",
+    "valid_from": "date",
+    "valid_until": "date",
+    **{day: "bool" for day in WEEKDAYS},
+}
+DICTIONARY_COLUMNS = {"stop_name", "trip_headsign", "route_short_name"}
+
+logger = logging.getLogger(__name__)
+
+
+def _load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:  # optional, only the columnar export needs it
+        return None
+    return pyarrow
+
+
+def _require_pyarrow():
+    pa = _load_pyarrow()
+    if pa is None:
+        raise RuntimeError("The columnar export needs pyarrow: pip install pyarrow")
+    return pa
+
+
+def _date(value):
+    # GTFS dates are YYYYMMDD; routes.txt uses ISO dates
+    if "-" in value:
+        return datetime.date.fromisoformat(value)
+    return datetime.datetime.strptime(value, "%Y%m%d").date()
+
+
+_CONVERTERS = {
+    "float64": float,
+    "time": parse_time,
+    "int32": int,
+    "int16": int,
+    "int8": int,
+    "bool": lambda value: value == "1",
+    "date": _date,
+}
+
+
+def logical_type(column):
+    if column in COLUMN_TYPES:
+        return COLUMN_TYPES[column]
+    if column.endswith("_id") or column in DICTIONARY_COLUMNS:
+        return "dictionary"
+    return "string"
+
+
+def _arrow_type(pa, logical):
+    if logical == "dictionary":
+        return pa.dictionary(pa.int32(), pa.string())
+    return {
+        "float64": pa.float64,
+        "time": pa.int32,
+        "int32": pa.int32,
+        "int16": pa.int16,
+        "int8": pa.int8,
+        "bool": pa.bool_,
+        "date": pa.date32,
+        "string": pa.string,
+    }[logical]()
+
+
+def _convert(values, logical):
+    """Returns (converted values, number of values that could not be converted and became None)."""
+    converter = _CONVERTERS.get(logical)
+    if converter is None:
+        return [None if value is None else str(value) for value in values], 0
+    converted = []
+    invalid = 0
+    for value in values:
+        try:
+            converted.append(None if value is None or value == "" else converter(value))
+        except (TypeError, ValueError):
+            converted.append(None)
+            invalid += 1
+    return converted, invalid
+
+
+class _Dictionary:
+    """Append-only string dictionary shared by all batches of a column."""
+
+    def __init__(self, pa):
+        self._pa = pa
+        self._codes = {}
+        self._values = []
+        self._array = pa.array([], pa.string())
+
+    def encode(self, values):
+        pa = self._pa
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self._values)
+                self._values.append(value)
+            indices.append(code)
+        if len(self._values) != len(self._array):
+            self._array = pa.concat_arrays([self._array, pa.array(self._values[len(self._array):], pa.string())])
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), self._array)
+
+
+class _TableWriter:
+    """Converts row batches of one table to typed record batches and writes them to one file per partition."""
+
+    def __init__(self, pa, path, columns, fmt):
+        self._pa = pa
+        self._path = path
+        self._fmt = fmt
+        self._columns = columns
+        self._logical = [logical_type(column) for column in columns]
+        self.schema = pa.schema([
+            pa.field(column, _arrow_type(pa, logical),
+                     metadata={"unit": "seconds since the start of the service day"} if logical == "time" else None)
+            for column, logical in zip(columns, self._logical)
+        ])
+        self._dictionaries = {column: _Dictionary(pa) for column, logical in zip(columns, self._logical)
+                              if logical == "dictionary"}
+        self._writers = {}
+        self.rows = 0
+        self.invalid = {}
+
+    def _writer(self, partition):
+        writer = self._writers.get(partition)
+        if writer is None:
+            path = self._path if partition is None else os.path.join(self._path, partition, f"part-0.{self._fmt}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self._fmt == "parquet":
+                writer = self._pa.parquet.ParquetWriter(path, self.schema, compression="zstd")
+            else:
+                writer = self._pa.ipc.new_file(path, self.schema,
+                                               options=self._pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+            self._writers[partition] = writer
+        return writer
+
+    def write(self, rows, partition=None):
+        pa = self._pa
+        arrays = []
+        for i, (column, logical) in enumerate(zip(self._columns, self._logical)):
+            values, invalid = _convert([row[i] for row in rows], "string" if logical == "dictionary" else logical)
+            if invalid:
+                self.invalid[column] = self.invalid.get(column, 0) + invalid
+            if logical == "dictionary":
+                arrays.append(self._dictionaries[column].encode(values))
+            else:
+                arrays.append(pa.array(values, _arrow_type(pa, logical)))
+        self._writer(partition).write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self, partitioned=False):
+        if not self._writers and not partitioned:
+            self._writer(None)  # an empty table still gets a file with its schema
+        for writer in self._writers.values():
+            writer.close()
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _export_table(pa, conn, table, columns, output_dir, fmt, batch_rows):
+    partition_column = PARTITIONED.get(table)
+    select = ", ".join(f'x."{column}"' for column in columns)
+    if partition_column is None:
+        writer = _TableWriter(pa, os.path.join(output_dir, f"{table}.{fmt}"), columns, fmt)
+        cursor = conn.execute(f'SELECT {select} FROM "{table}" x')
+    else:
+        # stop_times has no service_id of its own; take it from the trip, sorted so that every
+        # partition comes out ordered by (trip_id, stop_sequence). SQLite spills the sort to disk.
+        writer = _TableWriter(pa, os.path.join(output_dir, table), columns, fmt)
+        cursor = conn.execute(f"""
+            SELECT {select}, t.{partition_column}
+            FROM "{table}" x LEFT JOIN trips t ON t.trip_id = x.trip_id
+            ORDER BY x.trip_id, CAST(x.stop_sequence AS INTEGER)
+        """)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            if partition_column is None:
+                writer.write(rows)
+                continue
+            partitions = {}
+            for row in rows:
+                partitions.setdefault(row[-1], []).append(row)
+            for value, partition_rows in partitions.items():
+                writer.write(partition_rows, f"{partition_column}={quote(str(value or ''), safe='')}")
+    finally:
+        writer.close(partitioned=partition_column is not None)
+    for column, invalid in sorted(writer.invalid.items()):
+        logger.warning("%s.%s: %d value(s) of type %s could not be converted and were written as null",
+                       table, column, invalid, logical_type(column))
+    return writer.rows
+
+
+def export(db_path, output_dir, fmt="parquet", batch_rows=65536):
+    """Writes every table of an imported database as columnar files; returns row counts per table."""
+    pa = _require_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+    # Write next to the target and swap it in at the end, so readers never see half an export
+    tmp_dir = output_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    counts = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        for table in TABLES:
+            columns = _table_columns(conn, table)
+            if not columns or (table in PARTITIONED and "trip_id" not in columns):
+                continue
+            counts[table] = _export_table(pa, conn, table, columns, tmp_dir, fmt, batch_rows)
+    finally:
+        conn.close()
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return counts
+
+
+def _table_files(directory, table):
+    """Returns [(partition values, path), ...] for a table, in partition order."""
+    for fmt in FORMATS:
+        path = os.path.join(directory, f"{table}.{fmt}")
+        if os.path.exists(path):
+            return [({}, path)]
+    table_dir = os.path.join(directory, table)
+    if not os.path.isdir(table_dir):
+        return []
+    files = []
+    for partition in sorted(os.listdir(table_dir)):
+        key, _, value = partition.partition("=")
+        for fmt in FORMATS:
+            path = os.path.join(table_dir, partition, f"part-0.{fmt}")
+            if os.path.exists(path):
+                files.append(({key: unquote(value)}, path))
+    return files
+
+
+def _file_batches(pa, path, columns, batch_rows):
+    if path.endswith(".parquet"):
+        yield from pa.parquet.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns)
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).select(columns)
+
+
+def _file_rows(pa, path, columns, batch_rows):
+    for batch in _file_batches(pa, path, columns, batch_rows):
+        yield from zip(*(batch.column(column).to_pylist() for column in columns))
+
+
+def iter_rows(directory, table, columns, batch_rows=65536):
+    """Streams a table of an export as tuples of the requested columns, partition by partition."""
+    pa = _require_pyarrow()
+    for _, path in _table_files(directory, table):
+        yield from _file_rows(pa, path, columns, batch_rows)
+
+
+def timetable_rows(directory, batch_rows=65536):
+    """The (stops, trips, stop_times) row streams ``timetable_snapshot.build`` expects, read from an export."""
+    pa = _require_pyarrow()
+    stops = iter_rows(directory, "stops", ["stop_id", "stop_name", "stop_lat", "stop_lon"], batch_rows)
+    trips = iter_rows(directory, "trips", ["trip_id", "route_id", "trip_headsign", "service_id", "variant_id",
+                                           "brigade_id"], batch_rows)
+    # Every partition is sorted by (trip_id, stop_sequence); merging them keeps that order globally
+    partitions = [
+        _file_rows(pa, path, ["trip_id", "stop_sequence", "stop_id", "arrival_time", "departure_time"], batch_rows)
+        for _, path in _table_files(directory, "stop_times")
+    ]
+    stop_times = ((trip_id, stop_id, arrival, departure) for trip_id, _, stop_id, arrival, departure
+                  in heapq.merge(*partitions, key=lambda row: (row[0], row[1] if row[1] is not None else -1)))
+    return stops, trips, stop_times
@@ -0,0 +1,234 @@
+"""
+Negotiated response compression with a cache for immutable payloads.
+
+``init_app`` compresses JSON and text responses with the best encoding the client accepts
+(``br`` > ``zstd`` > ``gzip``; brotli and zstd only when their packages are installed). Ordinary
+responses use fast levels, because they are compressed on every request.
+
+Views decorated with ``precompressed`` return payloads that repeat across many requests, such as a
+trip's stop list, which changes only with the feed and the service date stamped on its times. Their
+bodies are compressed once at a high level and cached by content digest, in memory and optionally in
+``COMPRESSION_CACHE_DIR``. Repeated requests then only pay for hashing the body. A new feed or a new
+day produces new bodies and so new cache entries, and stale ones age out of the LRU.
+
+Every eligible response also gets a weak ETag derived from its uncompressed body (weak, because
+each encoding is a different byte sequence of the same content). A request whose If-None-Match
+matches is answered with an empty 304, so clients that keep responses, like the frontend's data
+layer, revalidate them without downloading or decompressing them again.
+
+Bytes on the wire and compression CPU time are exported at ``/metrics`` next to the request
+histograms.
+"""
+import functools
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from public_transport_api.instrumentation import METRICS, Counter, Histogram, span
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CPU_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+RESPONSE_BYTES = Histogram("pt_response_bytes", "Response body size on the wire.", "encoding", buckets=SIZE_BUCKETS)
+COMPRESSION_CPU = Histogram("pt_compression_cpu_seconds", "CPU time spent compressing a response body.",
+                            "encoding", buckets=CPU_BUCKETS)
+PRECOMPRESSED_LOOKUPS = Counter("pt_precompressed_lookups_total", "Precompressed cache lookups.",
+                                ("encoding", "result"))
+METRICS.extend([RESPONSE_BYTES, COMPRESSION_CPU, PRECOMPRESSED_LOOKUPS])
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/css", "application/javascript"}
+
+
+def _load_brotli():
+    try:
+        import brotli
+    except ImportError:  # optional, gzip is always available
+        return None
+    return brotli
+
+
+def _load_zstd():
+    try:
+        import zstandard
+    except ImportError:  # optional, gzip is always available
+        return None
+    return zstandard
+
+
+_brotli = _load_brotli()
+_zstd = _load_zstd()
+
+
+def _gzip(data, level):
+    # mtime=0 keeps the output deterministic, so equal bodies compress to equal bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def available_encodings():
+    """Supported encodings in order of preference."""
+    encodings = []
+    if _brotli is not None:
+        encodings.append("br")
+    if _zstd is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def compress(data, encoding, high=False):
+    """Compresses data; ``high`` trades CPU for size and is meant for bodies that get cached."""
+    if encoding == "gzip":
+        return _gzip(data, 9 if high else 5)
+    if encoding == "br":
+        return _brotli.compress(data, quality=11 if high else 4)
+    if encoding == "zstd":
+        return _zstd.ZstdCompressor(level=19 if high else 3).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def negotiate(accept_encodings, encodings=None):
+    """Picks the best encoding from a werkzeug Accept object, or None for identity."""
+    return accept_encodings.best_match(encodings or available_encodings())
+
+
+class PrecompressedCache:
+    """LRU of compressed bodies keyed by (digest, encoding), bounded by total size, with an optional disk tier."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _path(self, digest, encoding):
+        return os.path.join(self.directory, f"{digest}.{encoding}")
+
+    def get(self, digest, encoding):
+        key = (digest, encoding)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(digest, encoding), "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        self._remember(key, body)
+        return body
+
+    def put(self, digest, encoding, body):
+        self._remember((digest, encoding), body)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(digest, encoding)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+def precompressed(view):
+    """Marks a view whose successful responses repeat across requests, so their compressed bodies are cached."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import g
+
+        g.precompressed = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _compressed_body(cache, data, encoding, cacheable, digest=None):
+    if cacheable:
+        digest = digest or _digest(data)
+        body = cache.get(digest, encoding)
+        PRECOMPRESSED_LOOKUPS.inc(encoding, "miss" if body is None else "hit")
+        if body is not None:
+            return body
+    started = time.process_time()
+    body = compress(data, encoding, high=cacheable)
+    COMPRESSION_CPU.observe(encoding, time.process_time() - started)
+    if cacheable:
+        cache.put(digest, encoding, body)
+    return body
+
+
+def init_app(app):
+    """
+    Compresses eligible responses according to Accept-Encoding.
+
+    Config keys (all optional): COMPRESSION_MIN_SIZE (bytes, default 512), COMPRESSION_CACHE_BYTES
+    (in-memory precompressed cache, default 32 MiB), COMPRESSION_CACHE_DIR (disk tier, off by
+    default) and COMPRESSION_ETAGS (ETags and 304 answers, default on). Call after ``instrumentation.init_app`` so the compression span is in Server-Timing.
+    """
+    from flask import g, request
+
+    app.config.setdefault("COMPRESSION_MIN_SIZE", 512)
+    app.config.setdefault("COMPRESSION_CACHE_BYTES", 32 * 1024 * 1024)
+    app.config.setdefault("COMPRESSION_CACHE_DIR", None)
+    app.config.setdefault("COMPRESSION_ETAGS", True)
+
+    cache = PrecompressedCache(app.config["COMPRESSION_CACHE_BYTES"], app.config["COMPRESSION_CACHE_DIR"])
+    app.extensions["compression"] = cache
+
+    @app.after_request
+    def _compress(response):
+        eligible = (
+            response.status_code == 200
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and "Content-Encoding" not in response.headers
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+        )
+        if not eligible:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        data = response.get_data()
+        digest = None
+        if app.config["COMPRESSION_ETAGS"] and request.method in ("GET", "HEAD") and "ETag" not in response.headers:
+            digest = _digest(data)
+            response.set_etag(digest, weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        encoding = negotiate(request.accept_encodings) if len(data) >= app.config["COMPRESSION_MIN_SIZE"] else None
+        if encoding is None:
+            RESPONSE_BYTES.observe("identity", len(data))
+            return response
+
+        with span("compress"):
+            body = _compressed_body(cache, data, encoding, g.get("precompressed", False), digest)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        RESPONSE_BYTES.observe(encoding, len(body))
+        return response
+
+    return cache
@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, request
+from datetime import date
+
+from public_transport_api.admission import admission_controlled
+from public_transport_api.compression import precompressed
+from public_transport_api.query_engine import DataUnavailable
+from public_transport_api.services.blocks_service import get_block
+
+blocks_bp = Blueprint('blocks', __name__, url_prefix='/public_transport/city/<string:city>/blocks')
+
+@blocks_bp.route("/<string:route_id>/<string:brigade_id>", methods=["GET"])
+@admission_controlled
+@precompressed
+def handle_block(city, route_id, brigade_id):
+    """
+    Retrieves the vehicle day of one brigade: every trip it runs on a line on a given date, in order.
+
+    Endpoint:
+        GET /public_transport/city/<city>/blocks/<route_id>/<brigade_id>?date=YYYY-MM-DD
+
+    Parameters:
+        Path Parameters:
+        - city (str): Only "wroclaw" is supported.
+        - route_id (str): The line, e.g. "A".
+        - brigade_id (str): The brigade (vehicle duty) number, e.g. "21".
+        Query Parameters:
+        - date (str, optional): Service date in ISO format; defaults to today.
+
+    Returns:
+        JSON response containing metadata and block_details (route_id, brigade_id, date, service_ids,
+        first_departure, last_arrival and trips with their headsign, direction, vehicle and times).
+
+    Errors:
+        - 400 Bad Request: If the date is malformed.
+        - 404 Not Found: If the city is not supported or the brigade does not run that day.
+        - 503 Service Unavailable: If the database has no block index (import it with setup_database.py).
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+
+    service_date = request.args.get('date')
+    try:
+        service_date = date.fromisoformat(service_date) if service_date else date.today()
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
+    try:
+        block = get_block(route_id, brigade_id, service_date)
+    except DataUnavailable:
+        return jsonify({'error': 'Block index not available'}), 503
+    if block is None:
+        return jsonify({'error': 'Block not found'}), 404
+
+    metadata = {
+        'self': request.full_path.rstrip('?'),
+        'city': city,
+        'route_id': route_id,
+        'brigade_id': brigade_id,
+        'date': service_date.isoformat()
+    }
+    return jsonify({'metadata': metadata, 'block_details': block})
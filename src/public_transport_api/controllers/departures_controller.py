@@ -1,9 +1,29 @@
 from flask import Blueprint, jsonify, request
-from datetime import datetime
-from public_transport_api.services.departures_service import get_closest_departures
+from datetime import datetime, timedelta
+from public_transport_api.admission import coalesce, normalize_coordinates
+from public_transport_api.services.departures_service import get_closest_departures, get_departures_in_window
 
 departures_bp = Blueprint('departures', __name__)
 
+
+def _parse_timestamp(value):
+    """An ISO 8601 date and time as YYYY-MM-DDTHH:MM:SSZ, or None when it is malformed or has no time."""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if 'T' not in value:
+        return None
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _valid_window(start, end):
+    """A window must end after it starts and span at most a day; the service reads it as one service day."""
+    start_moment = datetime.strptime(start, '%Y-%m-%dT%H:%M:%SZ')
+    end_moment = datetime.strptime(end, '%Y-%m-%dT%H:%M:%SZ')
+    return start_moment < end_moment <= start_moment + timedelta(days=1)
+
+
 @departures_bp.route('/public_transport/city/<city>/closest_departures', methods=['GET'])
 def closest_departures(city):
     # Validate city
@@ -14,18 +34,45 @@ def closest_departures(city):
     start_coordinates = request.args.get('start_coordinates')
     end_coordinates = request.args.get('end_coordinates')
     start_time = request.args.get('start_time', datetime.utcnow().isoformat() + 'Z')
+    end_time = request.args.get('end_time')
+    cursor = request.args.get('cursor')
     limit = request.args.get('limit', 5)
     try:
         limit = int(limit)
     except ValueError:
         return jsonify({'error': 'Invalid limit'}), 400
+    if limit < 1:
+        return jsonify({'error': 'Invalid limit'}), 400
 
     # Validate required params
     if not start_coordinates or not end_coordinates:
         return jsonify({'error': 'Missing required parameters'}), 400
+    # The services read the HH:MM:SS part of the timestamps, so a date alone is not enough
+    start = _parse_timestamp(start_time)
+    if start is None:
+        return jsonify({'error': 'Invalid start_time'}), 400
+    end = None
+    if end_time:
+        end = _parse_timestamp(end_time)
+        if end is None:
+            return jsonify({'error': 'Invalid end_time'}), 400
+        if not _valid_window(start, end):
+            return jsonify({'error': 'end_time must be after start_time and at most 24 hours later'}), 400
 
-    # Call service
-    departures = get_closest_departures(start_coordinates, end_coordinates, start_time, limit)
+    # Call service; an end_time turns the request into a range query over the time window.
+    # Concurrent requests whose coordinates round to the same key share one computation, which alone
+    # takes an admission slot. The service gets the caller's own coordinates.
+    key = (normalize_coordinates(start_coordinates), normalize_coordinates(end_coordinates), start)
+    args = (start_coordinates, end_coordinates, start)
+    next_cursor = None
+    if end_time:
+        args += (end, limit, cursor)
+        window = coalesce(('window',) + key + args[3:], lambda: get_departures_in_window(*args))
+        departures = window['departures']
+        next_cursor = window['next_cursor']
+    else:
+        args += (limit,)
+        departures = coalesce(('closest',) + key + args[3:], lambda: get_closest_departures(*args))
 
     # Build metadata
     metadata = {
@@ -38,4 +85,8 @@ def closest_departures(city):
             'limit': limit
         }
     }
+    if end_time:
+        metadata['query_parameters']['end_time'] = end_time
+        metadata['query_parameters']['cursor'] = cursor
+        metadata['next_cursor'] = next_cursor
     return jsonify({'metadata': metadata, 'departures': departures})
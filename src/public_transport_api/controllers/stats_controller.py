@@ -0,0 +1,88 @@
+from flask import Blueprint, jsonify, request
+
+from public_transport_api.admission import admission_controlled
+from public_transport_api.compression import precompressed
+from public_transport_api.query_engine import DataUnavailable
+from public_transport_api.services.stats_service import get_line_stats, get_lines_summary, get_stop_stats
+
+stats_bp = Blueprint('stats', __name__, url_prefix='/public_transport/city/<string:city>/stats')
+
+
+@stats_bp.errorhandler(DataUnavailable)
+def _statistics_unavailable(e):
+    return jsonify({'error': 'Statistics not available'}), 503
+
+
+def _metadata(city, **parameters):
+    return {
+        'self': request.full_path.rstrip('?'),
+        'city': city,
+        'query_parameters': {'service_id': request.args.get('service_id'), **parameters}
+    }
+
+
+@stats_bp.route("", methods=["GET"])
+@admission_controlled
+@precompressed
+def handle_lines_summary(city):
+    """
+    Frequency statistics of every line: trips, first/last departure, mean/max headway and peak trips
+    per hour, per service and direction.
+
+    Endpoint:
+        GET /public_transport/city/<city>/stats?service_id=<service_id>
+
+    The statistics are materialized by setup_database.py after import; ``service_id`` is optional.
+
+    Errors:
+        - 404 Not Found: If the city is not supported.
+        - 503 Service Unavailable: If the database has no statistics tables.
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+    lines = get_lines_summary(request.args.get('service_id'))
+    return jsonify({'metadata': _metadata(city), 'lines': lines})
+
+
+@stats_bp.route("/lines/<string:route_id>", methods=["GET"])
+@admission_controlled
+@precompressed
+def handle_line_stats(city, route_id):
+    """
+    Statistics of one line, including the number of trips started in every hour.
+
+    Endpoint:
+        GET /public_transport/city/<city>/stats/lines/<route_id>?service_id=<service_id>
+
+    Errors:
+        - 404 Not Found: If the city is not supported or the line is unknown.
+        - 503 Service Unavailable: If the database has no statistics tables.
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+    stats = get_line_stats(route_id, request.args.get('service_id'))
+    if stats is None:
+        return jsonify({'error': 'Line not found'}), 404
+    return jsonify({'metadata': _metadata(city, route_id=route_id), 'line_stats': stats})
+
+
+@stats_bp.route("/stops/<string:stop_id>", methods=["GET"])
+@admission_controlled
+@precompressed
+def handle_stop_stats(city, stop_id):
+    """
+    Departures, first/last departure, longest gap and peak departures per hour of every line at a stop.
+
+    Endpoint:
+        GET /public_transport/city/<city>/stats/stops/<stop_id>?service_id=<service_id>
+
+    Errors:
+        - 404 Not Found: If the city is not supported or nothing departs from the stop.
+        - 503 Service Unavailable: If the database has no statistics tables.
+    """
+    if city.lower() != 'wroclaw':
+        return jsonify({'error': 'City not supported'}), 404
+    stats = get_stop_stats(stop_id, request.args.get('service_id'))
+    if stats is None:
+        return jsonify({'error': 'Stop not found'}), 404
+    return jsonify({'metadata': _metadata(city, stop_id=stop_id), 'stop_stats': stats})
@@ -1,11 +1,14 @@
 from flask import Blueprint, jsonify
 
 # Adjust import path based on your project structure
+from public_transport_api.admission import coalesce
+from public_transport_api.compression import precompressed
 from public_transport_api.services.trips_service import get_trip_details
 
 trips_bp = Blueprint('trips', __name__, url_prefix='/public_transport/city/<string:city>/trip')
 
 @trips_bp.route("/<string:trip_id>", methods=["GET"])
+@precompressed
 def handle_trip_details(city, trip_id):
     """
     Retrieves details about a specific trip, including its route, headsign, and stop details.
@@ -70,4 +73,8 @@ def handle_trip_details(city, trip_id):
         }
     """
     # TODO handle the city and the metadata. Add also error handling (i.e.: 404)
-    return jsonify(get_trip_details(trip_id))
\ No newline at end of file
+    # Concurrent requests for the same trip share one lookup, which alone takes an admission slot
+    trip_details = coalesce(('trip', trip_id), lambda: get_trip_details(trip_id))
+    if trip_details is None:
+        return jsonify({'error': 'Trip not found'}), 404
+    return jsonify(trip_details)
\ No newline at end of file
@@ -0,0 +1,398 @@
+"""
+GTFS feed validation, run by setup_database.py before anything is written to the database.
+
+Every file of the feed is scanned in its own worker process. A worker reads only the columns the
+checks need, runs the checks local to its file (duplicate keys, coordinates, times, stop sequence
+order) and returns the distinct values of its id columns with their row counts. Referential
+integrity is then a set difference per foreign key, between the referencing column's distinct
+values and the union of the referenced key columns:
+
+    routes.agency_id           agency.agency_id
+    routes.route_type2_id      route_types.route_type2_id
+    trips.route_id             routes.route_id
+    trips.service_id           calendar.service_id or calendar_dates.service_id
+    trips.variant_id           variants.variant_id
+    trips.vehicle_id           vehicle_types.vehicle_type_id
+    variants.*_stop_id         stops.stop_id
+    control_stops.variant_id   variants.variant_id
+    control_stops.stop_id      stops.stop_id
+    stop_times.trip_id         trips.trip_id
+    stop_times.stop_id         stops.stop_id
+
+A foreign key is only checked when the referenced file is part of the feed; empty values are not
+references. The set operations and the stop_times checks run on NumPy when that is installed and
+fall back to plain Python with the same results.
+
+``validate`` returns a JSON-serializable report:
+
+    {"feed": ..., "valid": bool, "elapsed_s": ..., "files": {file: {"rows": n}},
+     "errors": [issue, ...], "warnings": [issue, ...]}
+
+where an issue has ``check``, ``file``, ``message``, and where it applies ``column``,
+``references``, ``rows`` (affected row count) and ``examples`` (up to MAX_EXAMPLES values).
+"""
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MAX_EXAMPLES = 5
+
+REQUIRED_FILES = ("agency.txt", "stops.txt", "routes.txt", "trips.txt")
+
+REQUIRED_COLUMNS = {
+    "agency.txt": ("agency_id", "agency_name"),
+    "stops.txt": ("stop_id", "stop_name", "stop_lat", "stop_lon"),
+    "routes.txt": ("route_id",),
+    "trips.txt": ("route_id", "service_id", "trip_id"),
+    "stop_times.txt": ("trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"),
+    "calendar.txt": ("service_id",),
+    "calendar_dates.txt": ("service_id", "date", "exception_type"),
+    "variants.txt": ("variant_id",),
+    "control_stops.txt": ("variant_id", "stop_id"),
+}
+
+PRIMARY_KEYS = {
+    "agency.txt": "agency_id",
+    "stops.txt": "stop_id",
+    "routes.txt": "route_id",
+    "trips.txt": "trip_id",
+    "calendar.txt": "service_id",
+    "variants.txt": "variant_id",
+    "route_types.txt": "route_type2_id",
+    "vehicle_types.txt": "vehicle_type_id",
+}
+
+FOREIGN_KEYS = (
+    ("routes.txt", "agency_id", (("agency.txt", "agency_id"),)),
+    ("routes.txt", "route_type2_id", (("route_types.txt", "route_type2_id"),)),
+    ("trips.txt", "route_id", (("routes.txt", "route_id"),)),
+    ("trips.txt", "service_id", (("calendar.txt", "service_id"), ("calendar_dates.txt", "service_id"))),
+    ("trips.txt", "variant_id", (("variants.txt", "variant_id"),)),
+    ("trips.txt", "vehicle_id", (("vehicle_types.txt", "vehicle_type_id"),)),
+    ("variants.txt", "equiv_main_variant_id", (("variants.txt", "variant_id"),)),
+    ("variants.txt", "join_stop_id", (("stops.txt", "stop_id"),)),
+    ("variants.txt", "disjoin_stop_id", (("stops.txt", "stop_id"),)),
+    ("control_stops.txt", "variant_id", (("variants.txt", "variant_id"),)),
+    ("control_stops.txt", "stop_id", (("stops.txt", "stop_id"),)),
+    ("stop_times.txt", "trip_id", (("trips.txt", "trip_id"),)),
+    ("stop_times.txt", "stop_id", (("stops.txt", "stop_id"),)),
+)
+
+
+class FeedValidationError(ValueError):
+    """Raised by setup_database.py when the feed has errors; ``report`` is the validation report."""
+
+    def __init__(self, report):
+        super().__init__(f"{len(report['errors'])} feed validation error(s)")
+        self.report = report
+
+
+def _load_numpy():
+    try:
+        import numpy
+    except ImportError:  # optional, the pure Python checks give the same results
+        return None
+    return numpy
+
+
+def _issue(check, file, message, column=None, references=None, rows=None, examples=()):
+    issue = {"check": check, "file": file, "message": message}
+    if column is not None:
+        issue["column"] = column
+    if references is not None:
+        issue["references"] = references
+    if rows is not None:
+        issue["rows"] = rows
+    if examples:
+        issue["examples"] = [str(value) for value in list(examples)[:MAX_EXAMPLES]]
+    return issue
+
+
+def _key_columns(filename):
+    """Columns of a file whose distinct values the cross-file checks need."""
+    columns = set()
+    if filename in PRIMARY_KEYS:
+        columns.add(PRIMARY_KEYS[filename])
+    for source, column, targets in FOREIGN_KEYS:
+        if source == filename:
+            columns.add(column)
+        columns.update(target_column for target, target_column in targets if target == filename)
+    return columns
+
+
+def _parse_time(hhmmss):
+    """GTFS HH:MM:SS (hours may exceed 23) to seconds since midnight, or None when malformed."""
+    parts = hhmmss.split(":")
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return None
+    hours, minutes, seconds = map(int, parts)
+    if minutes > 59 or seconds > 59:
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _distinct(values, np):
+    """Distinct non-empty values and their row counts, as two parallel lists."""
+    if np is not None:
+        array = np.asarray(values, dtype=str)
+        unique, counts = np.unique(array[array != ""], return_counts=True)
+        return unique.tolist(), counts.tolist()
+    counts = {}
+    for value in values:
+        if value:
+            counts[value] = counts.get(value, 0) + 1
+    unique = sorted(counts)
+    return unique, [counts[value] for value in unique]
+
+
+def _check_coordinates(columns, issues):
+    bad = []
+    for stop_id, lat, lon in zip(columns["stop_id"], columns["stop_lat"], columns["stop_lon"]):
+        try:
+            if -90 <= float(lat) <= 90 and -180 <= float(lon) <= 180:
+                continue
+        except ValueError:
+            pass
+        bad.append(stop_id)
+    if bad:
+        issues.append(("error", _issue("coordinates", "stops.txt", "stop_lat/stop_lon missing or out of range",
+                                       column="stop_lat", rows=len(bad), examples=bad)))
+
+
+def _sequence_violations_numpy(np, trips, sequences, arrivals, departures):
+    codes = np.unique(np.asarray(trips, dtype=str), return_inverse=True)[1]
+    sequences, arrivals, departures = (np.asarray(values, dtype=np.int64)
+                                       for values in (sequences, arrivals, departures))
+    order = np.lexsort((sequences, codes))
+    same_trip = codes[order][1:] == codes[order][:-1]
+    duplicate = same_trip & (sequences[order][1:] == sequences[order][:-1])
+    # The vehicle cannot reach the next stop before it left the previous one
+    backwards = same_trip & ~duplicate & (arrivals[order][1:] < departures[order][:-1])
+    return np.sort(order[1:][duplicate]).tolist(), np.sort(order[1:][backwards]).tolist()
+
+
+def _sequence_violations_python(trips, sequences, arrivals, departures):
+    by_trip = {}
+    for row, trip_id in enumerate(trips):
+        by_trip.setdefault(trip_id, []).append(row)
+    duplicate, backwards = [], []
+    for rows in by_trip.values():
+        rows.sort(key=lambda row: sequences[row])
+        for previous, row in zip(rows, rows[1:]):
+            if sequences[row] == sequences[previous]:
+                duplicate.append(row)
+            elif arrivals[row] < departures[previous]:
+                backwards.append(row)
+    return sorted(duplicate), sorted(backwards)
+
+
+def _untimed_ends(columns, untimed):
+    """The untimed (trip_id, stop_sequence) rows that are the first or last stop of their trip."""
+    trips = {trip_id for trip_id, _ in untimed}
+    bounds = {}
+    for trip_id, stop_sequence in zip(columns["trip_id"], columns["stop_sequence"]):
+        if trip_id in trips and stop_sequence.isdigit():
+            sequence = int(stop_sequence)
+            first, last = bounds.get(trip_id, (sequence, sequence))
+            bounds[trip_id] = (min(first, sequence), max(last, sequence))
+    return [(trip_id, sequence) for trip_id, sequence in untimed if sequence in bounds[trip_id]]
+
+
+def _check_stop_times(columns, issues, np):
+    trips, sequences, arrivals, departures = [], [], [], []
+    bad_times, bad_sequences, untimed = [], [], []
+    # A feed has far fewer distinct times than rows
+    seconds = {"": None}
+    for trip_id, arrival_time, departure_time, stop_sequence in zip(
+            columns["trip_id"], columns["arrival_time"], columns["departure_time"], columns["stop_sequence"]):
+        if arrival_time not in seconds:
+            seconds[arrival_time] = _parse_time(arrival_time)
+        if departure_time not in seconds:
+            seconds[departure_time] = _parse_time(departure_time)
+        arrival, departure = seconds[arrival_time], seconds[departure_time]
+        if (arrival_time and arrival is None) or (departure_time and departure is None):
+            bad_times.append(trip_id)
+            continue
+        if not stop_sequence.isdigit():
+            bad_sequences.append(trip_id)
+            continue
+        if arrival is None and departure is None:
+            # GTFS allows untimed stops between timed ones; the import interpolates their times
+            untimed.append((trip_id, int(stop_sequence)))
+            continue
+        trips.append(trip_id)
+        sequences.append(int(stop_sequence))
+        arrivals.append(departure if arrival is None else arrival)
+        departures.append(arrival if departure is None else departure)
+
+    if bad_times:
+        issues.append(("error", _issue("times", "stop_times.txt", "times are not HH:MM:SS",
+                                       column="arrival_time", rows=len(bad_times), examples=dict.fromkeys(bad_times))))
+    if untimed:
+        ends = _untimed_ends(columns, untimed)
+        if ends:
+            issues.append(("error", _issue("times", "stop_times.txt", "first or last stop of a trip has no times",
+                                           column="arrival_time", rows=len(ends),
+                                           examples=dict.fromkeys(trip_id for trip_id, _ in ends))))
+        if len(ends) < len(untimed):
+            ends = set(ends)
+            between = [trip_id for trip_id, sequence in untimed if (trip_id, sequence) not in ends]
+            issues.append(("warning", _issue("times", "stop_times.txt",
+                                             "untimed intermediate stops; their times are interpolated at import",
+                                             column="arrival_time", rows=len(between),
+                                             examples=dict.fromkeys(between))))
+    if bad_sequences:
+        issues.append(("error", _issue("stop_sequence", "stop_times.txt", "stop_sequence is not a non-negative integer",
+                                       column="stop_sequence", rows=len(bad_sequences),
+                                       examples=dict.fromkeys(bad_sequences))))
+    if not trips:
+        return
+    if np is not None:
+        duplicate, backwards = _sequence_violations_numpy(np, trips, sequences, arrivals, departures)
+    else:
+        duplicate, backwards = _sequence_violations_python(trips, sequences, arrivals, departures)
+    if duplicate:
+        issues.append(("error", _issue("stop_sequence", "stop_times.txt", "stop_sequence repeats within a trip",
+                                       column="stop_sequence", rows=len(duplicate),
+                                       examples=dict.fromkeys(trips[row] for row in duplicate))))
+    if backwards:
+        issues.append(("error", _issue("stop_sequence", "stop_times.txt",
+                                       "times go backwards in stop_sequence order",
+                                       column="stop_sequence", rows=len(backwards),
+                                       examples=dict.fromkeys(trips[row] for row in backwards))))
+
+
+def scan_file(path, use_numpy=True):
+    """
+    Reads one feed file and runs its local checks; the unit of work of the worker processes.
+
+    Returns {"file", "rows", "header", "keys": {column: (values, counts)}, "issues": [(severity, issue)]}.
+    """
+    filename = os.path.basename(path)
+    np = _load_numpy() if use_numpy else None
+    issues = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [column.strip().replace("\ufeff", "") for column in next(reader, [])]
+        missing = [column for column in REQUIRED_COLUMNS.get(filename, ()) if column not in header]
+        if missing:
+            issues.append(("error", _issue("columns", filename, f"missing required column(s) {', '.join(missing)}",
+                                           column=missing[0])))
+        wanted = [column for column in header if column in _key_columns(filename)
+                  or column in REQUIRED_COLUMNS.get(filename, ())]
+        width = len(header)
+        records = [record for record in reader if record]
+    rows = len(records)
+    short_rows = sum(1 for record in records if len(record) < width)
+    if short_rows:
+        records = [record + [""] * (width - len(record)) for record in records]
+    columns = {column: [record[position] for record in records]
+               for column, position in ((column, header.index(column)) for column in wanted)}
+    del records
+    if short_rows:
+        issues.append(("error", _issue("row_width", filename, f"rows have fewer fields than the header's {width}",
+                                       rows=short_rows)))
+
+    keys = {column: _distinct(columns[column], np) for column in _key_columns(filename) if column in columns}
+    key_column = PRIMARY_KEYS.get(filename)
+    if key_column in keys:
+        values, counts = keys[key_column]
+        duplicated = [value for value, count in zip(values, counts) if count > 1]
+        if duplicated:
+            issues.append(("error", _issue("primary_key", filename, f"{key_column} is not unique", column=key_column,
+                                           rows=sum(count - 1 for count in counts if count > 1),
+                                           examples=duplicated)))
+        empty = rows - sum(counts)
+        if empty:
+            issues.append(("error", _issue("primary_key", filename, f"{key_column} is empty", column=key_column,
+                                           rows=empty)))
+    if filename == "stops.txt" and not missing:
+        _check_coordinates(columns, issues)
+    if filename == "stop_times.txt" and not missing:
+        _check_stop_times(columns, issues, np)
+    return {"file": filename, "rows": rows, "header": header, "keys": keys, "issues": issues}
+
+
+def _missing_references(values, counts, referenced, np):
+    """Values absent from the referenced keys, with the number of rows that use them."""
+    if np is not None:
+        values_array = np.asarray(values, dtype=str)
+        absent = ~np.isin(values_array, np.asarray(sorted(referenced), dtype=str))
+        return values_array[absent].tolist(), int(np.asarray(counts, dtype=np.int64)[absent].sum())
+    absent = [(value, count) for value, count in zip(values, counts) if value not in referenced]
+    return [value for value, _ in absent], sum(count for _, count in absent)
+
+
+def check_references(scans, np=None):
+    """Foreign key issues between scanned files, as (severity, issue) pairs."""
+    issues = []
+    for source, column, targets in FOREIGN_KEYS:
+        scan = scans.get(source)
+        present = [(target, target_column) for target, target_column in targets
+                   if target in scans and target_column in scans[target]["keys"]]
+        if scan is None or column not in scan["keys"] or not present:
+            continue
+        referenced = set()
+        for target, target_column in present:
+            referenced.update(scans[target]["keys"][target_column][0])
+        values, counts = scan["keys"][column]
+        missing, rows = _missing_references(values, counts, referenced, np)
+        if missing:
+            references = " or ".join(f"{target}:{target_column}" for target, target_column in present)
+            issues.append(("error", _issue("foreign_key", source, f"{column} references unknown {references} values",
+                                           column=column, references=references, rows=rows, examples=missing)))
+
+    trips, stop_times = scans.get("trips.txt"), scans.get("stop_times.txt")
+    if trips is not None and stop_times is not None and "trip_id" in trips["keys"] \
+            and "trip_id" in stop_times["keys"]:
+        served = set(stop_times["keys"]["trip_id"][0])
+        unserved = [trip_id for trip_id in trips["keys"]["trip_id"][0] if trip_id not in served]
+        if unserved:
+            issues.append(("warning", _issue("unused", "trips.txt", "trips without stop_times", column="trip_id",
+                                             rows=len(unserved), examples=unserved)))
+    return issues
+
+
+def validate(gtfs_dir, workers=None, use_numpy=True):
+    """Validates the feed in gtfs_dir, scanning its files in parallel; returns the report."""
+    started = time.perf_counter()
+    np = _load_numpy() if use_numpy else None
+    filenames = sorted(name for name in os.listdir(gtfs_dir) if name.endswith(".txt"))
+    issues = [("error", _issue("missing_file", name, "required file is missing"))
+              for name in REQUIRED_FILES if name not in filenames]
+    if "stop_times.txt" not in filenames:
+        issues.append(("warning", _issue("missing_file", "stop_times.txt",
+                                         "no stop_times: departures and trip details will be empty")))
+
+    # Largest files first, so stop_times does not start last
+    paths = sorted((os.path.join(gtfs_dir, name) for name in filenames), key=os.path.getsize, reverse=True)
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        results = [scan_file(path, use_numpy) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan_file, paths, [use_numpy] * len(paths)))
+    results.sort(key=lambda scan: scan["file"])
+
+    scans = {scan["file"]: scan for scan in results}
+    for scan in results:
+        issues.extend(scan["issues"])
+    issues.extend(check_references(scans, np))
+
+    errors = [issue for severity, issue in issues if severity == "error"]
+    return {
+        "feed": os.path.abspath(gtfs_dir),
+        "valid": not errors,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "files": {scan["file"]: {"rows": scan["rows"]} for scan in results},
+        "errors": errors,
+        "warnings": [issue for severity, issue in issues if severity == "warning"],
+    }
+
+
+def format_issue(issue):
+    location = issue["file"] + (f":{issue['column']}" if "column" in issue else "")
+    rows = f" ({issue['rows']} rows)" if "rows" in issue else ""
+    examples = f", e.g. {', '.join(issue['examples'])}" if issue.get("examples") else ""
+    return f"{location}: {issue['message']}{rows}{examples}"
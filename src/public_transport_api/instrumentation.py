@@ -0,0 +1,359 @@
+"""
+Request-level instrumentation: timing spans, SQL tracing, Prometheus metrics and opt-in profiling.
+
+Services wrap their stages in ``span("name")`` and open their database connections with
+``factory=TracedConnection``. Both feed process-wide histograms (served at ``/metrics``) and, while a
+request is being handled, a per-request timing record that is returned in the ``Server-Timing`` header.
+"""
+import bisect
+import contextvars
+import cProfile
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+_muted = contextvars.ContextVar("metrics_muted", default=False)
+
+
+@contextmanager
+def muted():
+    """Keeps everything run inside the block out of the metrics, e.g. the startup warm-up request."""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def is_muted():
+    return _muted.get()
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """A Prometheus-style cumulative histogram keyed by a single label."""
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        if _muted.get():
+            return
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value in sorted(self._series):
+                series = self._series[label_value]
+                label = f'{self.label}="{label_value}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return "\n".join(lines)
+
+
+class Counter:
+    """A Prometheus-style counter keyed by one or more labels."""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if _muted.get():
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values in sorted(self._values):
+                label = ",".join(f'{name}="{value}"' for name, value in zip(self.labels, label_values))
+                lines.append(f"{self.name}{{{label}}} {self._values[label_values]}")
+        return "\n".join(lines)
+
+
+REQUEST_DURATION = Histogram("pt_request_duration_seconds", "Time spent handling a request.", "endpoint")
+SPAN_DURATION = Histogram("pt_span_duration_seconds", "Time spent in an instrumented service stage.", "span")
+SQL_DURATION = Histogram("pt_sql_query_duration_seconds", "Time spent executing and fetching a SQL query.", "statement")
+REQUEST_SQL_QUERIES = Histogram("pt_request_sql_queries", "SQL statements issued per request.", "endpoint",
+                                buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+
+SERVICE_ERRORS = Counter("pt_service_errors_total", "Errors a service caught and answered with an empty result.",
+                         ("operation", "error"))
+
+METRICS = [REQUEST_DURATION, SPAN_DURATION, SQL_DURATION, REQUEST_SQL_QUERIES, SERVICE_ERRORS]
+
+
+class RequestTimings:
+    """Span durations and SQL counters collected while handling one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        """Formats the collected timings as a Server-Timing header value (durations in ms)."""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        parts.append(f'sql;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_queries} queries"')
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Times a block of code and records it under ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_DURATION.observe(name, elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_span(name, elapsed)
+
+
+def _statement_kind(sql):
+    words = sql.split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+def _record_sql(sql, elapsed):
+    SQL_DURATION.observe(_statement_kind(sql), elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.sql_seconds += elapsed
+
+
+def _count_statement(statement):
+    timings = _current.get()
+    if timings is not None:
+        timings.sql_queries += 1
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor that times execute plus the fetches that follow it.
+
+    A statement is observed once, with its execute and fetch time added up: when it returns no rows,
+    when its rows are exhausted, or else when the cursor runs its next statement or is closed.
+    """
+
+    _sql = None
+    _elapsed = 0.0
+
+    def _add(self, started):
+        self._elapsed += time.perf_counter() - started
+
+    def _finish(self):
+        if self._sql is not None:
+            _record_sql(self._sql, self._elapsed)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._sql = sql
+        self._elapsed = 0.0
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(started)
+            if self.description is None:
+                self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = None
+        try:
+            row = super().fetchone()
+            return row
+        finally:
+            self._add(started)
+            if row is None:
+                self._finish()
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            return rows
+        finally:
+            self._add(started)
+            if not rows:
+                self._finish()
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._add(started)
+            self._finish()
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return super().__next__()
+        except StopIteration:
+            self._add(started)
+            self._finish()
+            raise
+        else:
+            self._add(started)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Connection factory for ``sqlite3.connect(..., factory=TracedConnection)``.
+
+    The trace callback counts every statement SQLite runs (including ones issued by executescript),
+    while TracedCursor adds wall-clock durations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_count_statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+
+def render_metrics():
+    """Returns all histograms in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+
+def _load_pyinstrument():
+    # Imported on first use so that workers which never profile do not pay for it at startup
+    try:
+        import pyinstrument
+    except ImportError:  # optional, cProfile is always available
+        return None
+    return pyinstrument
+
+
+def _dump_profile(profiler, profile_dir, endpoint):
+    os.makedirs(profile_dir, exist_ok=True)
+    # The random suffix keeps profiles of requests finishing in the same second apart
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint or 'request'}-{uuid.uuid4().hex[:8]}"
+    stem = os.path.join(profile_dir, name)
+    if not isinstance(profiler, cProfile.Profile):
+        path = stem + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    else:
+        path = stem + ".prof"
+        profiler.dump_stats(path)
+    return path
+
+
+def init_app(app):
+    """
+    Registers the request hooks, the Server-Timing header and the /metrics endpoint on a Flask app.
+
+    Profiling is opt-in: set ``PROFILING_ENABLED`` (or the ``PT_PROFILING`` environment variable) and
+    send ``?profile=1`` or an ``X-Profile: 1`` header. The dump lands in ``PROFILE_DIR`` and its file
+    name, without the directory, is returned in the ``X-Profile-Dump`` header.
+    """
+    from flask import Response, g, request
+
+    app.config.setdefault("PROFILING_ENABLED", os.environ.get("PT_PROFILING") == "1")
+    app.config.setdefault("PROFILE_DIR", os.environ.get("PT_PROFILE_DIR", "profiles"))
+
+    @app.before_request
+    def _start_timings():
+        g.timings_token = _current.set(RequestTimings())
+        g.profiler = None
+        if app.config["PROFILING_ENABLED"] and (request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1"):
+            pyinstrument = _load_pyinstrument()
+            if pyinstrument is not None:
+                g.profiler = pyinstrument.Profiler()
+                g.profiler.start()
+            else:
+                g.profiler = cProfile.Profile()
+                g.profiler.enable()
+
+    @app.after_request
+    def _finish_timings(response):
+        timings = _current.get()
+        if timings is None:
+            return response
+        endpoint = request.endpoint or "unknown"
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            if not isinstance(profiler, cProfile.Profile):
+                profiler.stop()
+            else:
+                profiler.disable()
+            path = _dump_profile(profiler, app.config["PROFILE_DIR"], endpoint)
+            response.headers["X-Profile-Dump"] = os.path.basename(path)
+        REQUEST_DURATION.observe(endpoint, time.perf_counter() - timings.started)
+        REQUEST_SQL_QUERIES.observe(endpoint, timings.sql_queries)
+        response.headers["Server-Timing"] = timings.server_timing()
+        return response
+
+    @app.teardown_request
+    def _reset_timings(exc):
+        token = g.pop("timings_token", None)
+        if token is not None:
+            _current.reset(token)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    return app
@@ -0,0 +1,325 @@
+"""
+Query engines behind the departures and trips services.
+
+Every engine answers the same four queries, and returns the same plain dicts whatever it reads from:
+
+    nearby_stops(lat, lon, radius_m)   [(stop, distance)] within radius_m, closest first, ties by
+                                       stop_id; a stop has stop_id, stop_name, stop_lat, stop_lon
+    stop_departures(stop_id, from_time, to_time=None, limit=None)
+                                       departures from the stop with trip_id, route_id,
+                                       trip_headsign, variant_id, arrival_time (departure_time
+                                       when missing), departure_time (GTFS HH:MM:SS), by
+                                       departure time then trip_id
+    trip(trip_id)                      route_id and trip_headsign, or None
+    trip_stops(trip_id)                stops of the trip in stop_sequence order with stop_id,
+                                       stop_name, stop_lat, stop_lon, arrival_time, departure_time
+
+Engines:
+
+    sqlite    queries trips.sqlite; ``session()`` opens one connection per service call. Nearby
+              stops come from the mapped stop index when one is loaded.
+    memory    reads the three tables into Python structures once, then answers from memory.
+    snapshot  reads the memory-mapped timetable snapshot written by export_snapshot.py; nearby stops
+              come from the stop index over the snapshot's stop columns.
+
+The engine is chosen with the QUERY_ENGINE config key ("auto", "sqlite", "memory" or
+"snapshot") and set up by the startup warm-up, which also points ``database_path()`` at the DATABASE
+config key. "auto", the default, uses the snapshot when one is
+loaded and SQLite otherwise. tests/public_transport_api/test_query_engine.py checks that all engines
+give identical results, and ``python -m benchmarks.run_benchmarks`` times each of them.
+"""
+import bisect
+import contextlib
+import math
+import sqlite3
+
+from public_transport_api import stop_index, timetable_snapshot
+from public_transport_api.instrumentation import TracedConnection
+from public_transport_api.stop_index import EARTH_RADIUS_M, haversine_distance
+
+ENGINES = ("auto", "sqlite", "memory", "snapshot")
+
+_configured = None
+_db_path = "trips.sqlite"
+
+
+class DataUnavailable(Exception):
+    """Raised when the database lacks a table an endpoint reads, e.g. one imported by an older setup_database.py."""
+
+
+def _stop(row):
+    return {
+        "stop_id": row['stop_id'],
+        "stop_name": row['stop_name'],
+        "stop_lat": float(row['stop_lat']),
+        "stop_lon": float(row['stop_lon']),
+    }
+
+
+def _closest_first(found):
+    return sorted(found, key=lambda item: (item[1], item[0]['stop_id']))
+
+
+def _lat_band(radius_m):
+    return math.degrees(radius_m / EARTH_RADIUS_M)
+
+
+class QueryEngine:
+    """Base class; engines that need no per-call resources are their own session."""
+
+    name = None
+
+    @contextlib.contextmanager
+    def session(self):
+        yield self
+
+    def nearby_stops(self, lat, lon, radius_m):
+        raise NotImplementedError
+
+    def stop_departures(self, stop_id, from_time, to_time=None, limit=None):
+        raise NotImplementedError
+
+    def trip(self, trip_id):
+        raise NotImplementedError
+
+    def trip_stops(self, trip_id):
+        raise NotImplementedError
+
+
+class _SQLiteSession:
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def nearby_stops(self, lat, lon, radius_m):
+        index = stop_index.current()
+        if index is not None:
+            return index.within(lat, lon, radius_m)
+
+        # No stop index loaded: scan the whole stops table
+        self._cursor.execute("SELECT stop_id, stop_name, stop_lat, stop_lon FROM stops")
+        found = []
+        for row in self._cursor.fetchall():
+            stop = _stop(row)
+            dist = haversine_distance(lat, lon, stop['stop_lat'], stop['stop_lon'])
+            if dist <= radius_m:
+                found.append((stop, dist))
+        return _closest_first(found)
+
+    def stop_departures(self, stop_id, from_time, to_time=None, limit=None):
+        sql = """
+            SELECT st.trip_id, t.route_id, t.trip_headsign, t.variant_id,
+                   COALESCE(NULLIF(st.arrival_time, ''), st.departure_time) AS arrival_time, st.departure_time
+            FROM stop_times st
+            JOIN trips t ON st.trip_id = t.trip_id
+            WHERE st.stop_id = ? AND st.departure_time >= ?
+        """
+        params = [stop_id, from_time]
+        if to_time:
+            sql += " AND st.departure_time <= ?"
+            params.append(to_time)
+        sql += " ORDER BY st.departure_time ASC, st.trip_id ASC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        self._cursor.execute(sql, params)
+        return [dict(row) for row in self._cursor.fetchall()]
+
+    def trip(self, trip_id):
+        self._cursor.execute("SELECT route_id, trip_headsign FROM main.trips WHERE trip_id = ?", (trip_id,))
+        row = self._cursor.fetchone()
+        return None if row is None else {"route_id": row['route_id'], "trip_headsign": row['trip_headsign']}
+
+    def trip_stops(self, trip_id):
+        self._cursor.execute("""
+            SELECT st.stop_id, s.stop_name, s.stop_lat, s.stop_lon, st.arrival_time, st.departure_time
+            FROM stop_times st
+            JOIN stops s ON st.stop_id = s.stop_id
+            WHERE st.trip_id = ?
+            ORDER BY CAST(st.stop_sequence AS INTEGER) ASC
+        """, (trip_id,))
+        return [{**_stop(row), "arrival_time": row['arrival_time'], "departure_time": row['departure_time']}
+                for row in self._cursor.fetchall()]
+
+
+class SQLiteEngine(QueryEngine):
+    """Queries the database on every call."""
+
+    name = "sqlite"
+
+    def __init__(self, db_path="trips.sqlite"):
+        self.db_path = db_path
+
+    @contextlib.contextmanager
+    def session(self):
+        conn = sqlite3.connect(self.db_path, factory=TracedConnection)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield _SQLiteSession(conn)
+        finally:
+            conn.close()
+
+    def _one_shot(self, method, *args):
+        with self.session() as session:
+            return getattr(session, method)(*args)
+
+    def nearby_stops(self, lat, lon, radius_m):
+        return self._one_shot("nearby_stops", lat, lon, radius_m)
+
+    def stop_departures(self, stop_id, from_time, to_time=None, limit=None):
+        return self._one_shot("stop_departures", stop_id, from_time, to_time, limit)
+
+    def trip(self, trip_id):
+        return self._one_shot("trip", trip_id)
+
+    def trip_stops(self, trip_id):
+        return self._one_shot("trip_stops", trip_id)
+
+
+class MemoryEngine(QueryEngine):
+    """Loads stops, trips and stop_times once and answers from Python structures."""
+
+    name = "memory"
+
+    def __init__(self, db_path="trips.sqlite"):
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            stops = [_stop(row) for row in conn.execute("SELECT stop_id, stop_name, stop_lat, stop_lon FROM stops")]
+            trips = {row['trip_id']: {"route_id": row['route_id'], "trip_headsign": row['trip_headsign'],
+                                      "variant_id": row['variant_id']}
+                     for row in conn.execute("SELECT trip_id, route_id, trip_headsign, variant_id FROM trips")}
+            stop_times = conn.execute("""
+                SELECT trip_id, stop_id, arrival_time, departure_time FROM stop_times
+                ORDER BY trip_id, CAST(stop_sequence AS INTEGER)
+            """).fetchall()
+        finally:
+            conn.close()
+
+        self._stops = sorted(stops, key=lambda stop: (stop['stop_lat'], stop['stop_lon'], stop['stop_id']))
+        self._lats = [stop['stop_lat'] for stop in self._stops]
+        by_id = {stop['stop_id']: stop for stop in stops}
+        self._trips = trips
+
+        self._trip_stops = {}
+        departures = {}
+        for row in stop_times:
+            stop = by_id.get(row['stop_id'])
+            if stop is not None:
+                self._trip_stops.setdefault(row['trip_id'], []).append(
+                    {**stop, "arrival_time": row['arrival_time'], "departure_time": row['departure_time']})
+            trip = trips.get(row['trip_id'])
+            # An empty time is missing, as NULLIF makes it in the SQL query and _seconds in the snapshot
+            if trip is not None and row['departure_time']:
+                departures.setdefault(row['stop_id'], []).append({
+                    "trip_id": row['trip_id'],
+                    **trip,
+                    "arrival_time": row['arrival_time'] or row['departure_time'],
+                    "departure_time": row['departure_time'],
+                })
+        # Per-stop departure arrays with a parallel key list for bisecting
+        self._departures = {}
+        for stop_id, rows in departures.items():
+            rows.sort(key=lambda row: (row['departure_time'], row['trip_id']))
+            self._departures[stop_id] = ([row['departure_time'] for row in rows], rows)
+
+    def nearby_stops(self, lat, lon, radius_m):
+        dlat = _lat_band(radius_m)
+        found = []
+        for i in range(bisect.bisect_left(self._lats, lat - dlat), bisect.bisect_right(self._lats, lat + dlat)):
+            stop = self._stops[i]
+            dist = haversine_distance(lat, lon, stop['stop_lat'], stop['stop_lon'])
+            if dist <= radius_m:
+                found.append((dict(stop), dist))
+        return _closest_first(found)
+
+    def stop_departures(self, stop_id, from_time, to_time=None, limit=None):
+        times, rows = self._departures.get(stop_id, ((), ()))
+        start = bisect.bisect_left(times, from_time)
+        end = bisect.bisect_right(times, to_time, start) if to_time else len(times)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [dict(row) for row in rows[start:end]]
+
+    def trip(self, trip_id):
+        trip = self._trips.get(trip_id)
+        return None if trip is None else {"route_id": trip['route_id'], "trip_headsign": trip['trip_headsign']}
+
+    def trip_stops(self, trip_id):
+        return [dict(stop) for stop in self._trip_stops.get(trip_id, ())]
+
+
+class SnapshotEngine(QueryEngine):
+    """Answers from the memory-mapped timetable snapshot."""
+
+    name = "snapshot"
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def nearby_stops(self, lat, lon, radius_m):
+        index = stop_index.current()
+        if index is None:
+            # Same columns, just not installed as the process-wide index
+            index = stop_index.StopIndex(self.snapshot)
+        return index.within(lat, lon, radius_m)
+
+    def stop_departures(self, stop_id, from_time, to_time=None, limit=None):
+        stop_row = self.snapshot.stop_row(stop_id)
+        if stop_row is None:
+            return []
+        to_seconds = timetable_snapshot.parse_time(to_time) if to_time else None
+        return self.snapshot.departures(stop_row, timetable_snapshot.parse_time(from_time), to_seconds, limit)
+
+    def trip(self, trip_id):
+        trip_row = self.snapshot.trip_row(trip_id)
+        if trip_row is None:
+            return None
+        return {"route_id": self.snapshot.route_id[trip_row], "trip_headsign": self.snapshot.trip_headsign[trip_row]}
+
+    def trip_stops(self, trip_id):
+        trip_row = self.snapshot.trip_row(trip_id)
+        return [] if trip_row is None else self.snapshot.trip_stops(trip_row)
+
+
+def create(name, db_path="trips.sqlite", snapshot=None):
+    """Builds the engine for a QUERY_ENGINE value; "auto" returns None (choose per call)."""
+    if name == "auto":
+        return None
+    if name == "sqlite":
+        return SQLiteEngine(db_path)
+    if name == "memory":
+        return MemoryEngine(db_path)
+    if name == "snapshot":
+        if snapshot is None:
+            raise ValueError("QUERY_ENGINE is 'snapshot' but no timetable snapshot is loaded; run export_snapshot.py")
+        return SnapshotEngine(snapshot)
+    raise ValueError(f"Unknown QUERY_ENGINE {name!r}, expected one of {', '.join(ENGINES)}")
+
+
+def configure(engine):
+    """Makes ``engine`` the one the services use; None restores automatic selection."""
+    global _configured
+    _configured = engine
+    return engine
+
+
+def configure_database(db_path):
+    """Sets the database the services open (the DATABASE config key); returns the previous one."""
+    global _db_path
+    previous, _db_path = _db_path, db_path
+    return previous
+
+
+def database_path():
+    """The database the services open, trips.sqlite in the working directory unless configured."""
+    return _db_path
+
+
+def current():
+    """The configured engine, or the snapshot engine when a snapshot is loaded, else SQLite."""
+    if _configured is not None:
+        return _configured
+    snapshot = timetable_snapshot.current()
+    if snapshot is not None:
+        return SnapshotEngine(snapshot)
+    return SQLiteEngine(_db_path)
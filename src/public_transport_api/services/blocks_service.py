@@ -0,0 +1,82 @@
+import logging
+import sqlite3
+import datetime
+
+from public_transport_api import query_engine
+from public_transport_api.instrumentation import TracedConnection, span
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+logger = logging.getLogger(__name__)
+
+
+def _format_time(service_date, seconds):
+    # GTFS times count from the start of the service day and may run past 24:00
+    if seconds is None:
+        return None
+    moment = datetime.datetime.combine(service_date, datetime.time()) + datetime.timedelta(seconds=seconds)
+    return moment.isoformat() + "Z"
+
+
+def get_block(route_id, brigade_id, service_date):
+    """
+    Returns every trip brigade ``brigade_id`` of ``route_id`` runs on ``service_date`` (a date), in
+    running order, or None when the brigade has no service that day.
+
+    The services active that day come from calendar and calendar_dates; the trips are a single range
+    read on the blocks table built by setup_database.py. Raises DataUnavailable when the database has
+    no such tables.
+    """
+    day = service_date.strftime("%Y%m%d")
+    conn = sqlite3.connect(query_engine.database_path(), factory=TracedConnection)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    try:
+        with span("block.lookup"):
+            cursor.execute(f"""
+                SELECT b.service_id, b.trip_id, b.trip_headsign, b.direction_id, b.vehicle_id,
+                       b.first_departure, b.last_arrival
+                FROM blocks b
+                WHERE b.route_id = ? AND b.brigade_id = ? AND b.service_id IN (
+                    SELECT service_id FROM calendar
+                    WHERE "{WEEKDAYS[service_date.weekday()]}" = '1' AND start_date <= ? AND end_date >= ?
+                      AND service_id NOT IN (
+                          SELECT service_id FROM calendar_dates WHERE date = ? AND exception_type = '2')
+                    UNION
+                    SELECT service_id FROM calendar_dates WHERE date = ? AND exception_type = '1'
+                )
+                ORDER BY b.service_id, b.block_seq
+            """, (route_id, brigade_id, day, day, day, day))
+            rows = cursor.fetchall()
+    except sqlite3.OperationalError as e:
+        logger.warning("Block lookup failed: %s", e)
+        raise query_engine.DataUnavailable(str(e)) from e
+    finally:
+        conn.close()
+
+    if not rows:
+        return None
+
+    # More than one service can run on the same day; merge them back into running order
+    rows.sort(key=lambda row: (row['first_departure'] is None, row['first_departure'] or 0))
+    trips = [{
+        "trip_id": row['trip_id'],
+        "trip_headsign": row['trip_headsign'],
+        "direction_id": row['direction_id'],
+        "vehicle_id": row['vehicle_id'],
+        "first_departure": _format_time(service_date, row['first_departure']),
+        "last_arrival": _format_time(service_date, row['last_arrival'])
+    } for row in rows]
+
+    departures = [row['first_departure'] for row in rows if row['first_departure'] is not None]
+    arrivals = [row['last_arrival'] for row in rows if row['last_arrival'] is not None]
+    return {
+        "route_id": route_id,
+        "brigade_id": brigade_id,
+        "date": service_date.isoformat(),
+        "service_ids": sorted({row['service_id'] for row in rows}),
+        "first_departure": _format_time(service_date, min(departures)) if departures else None,
+        "last_arrival": _format_time(service_date, max(arrivals)) if arrivals else None,
+        "trips": trips,
+    }
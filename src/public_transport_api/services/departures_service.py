@@ -1,16 +1,20 @@
 import sqlite3
-import math
 import datetime
+import base64
+import json
+import logging
 
+from public_transport_api import query_engine
+from public_transport_api.instrumentation import SERVICE_ERRORS, span
+from public_transport_api.stop_index import haversine_distance
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+logger = logging.getLogger(__name__)
+
+
+def _report_error(operation, error):
+    # The caller still answers with an empty result, so make the failure visible in logs and metrics
+    SERVICE_ERRORS.inc(operation, "database" if isinstance(error, sqlite3.Error) else "unexpected")
+    logger.exception("%s failed", operation)
 
 
 def get_closest_departures(start_coordinates, end_coordinates, start_time, limit=5):
@@ -21,98 +25,234 @@ def get_closest_departures(start_coordinates, end_coordinates, start_time, limit
     except Exception:
         return []
 
-    conn = None
     try:
-        conn = sqlite3.connect("trips.sqlite")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Find stops within 1km of start
-        cursor.execute("SELECT stop_id, stop_name, stop_lat, stop_lon FROM stops")
-        stops = cursor.fetchall()
-        nearby_stops = []
-        for stop in stops:
-            dist = haversine_distance(start_lat, start_lon, stop['stop_lat'], stop['stop_lon'])
-            if dist <= 1000:
-                nearby_stops.append((stop, dist))
-        nearby_stops = sorted(nearby_stops, key=lambda x: x[1])[:limit]
-
-        departures = []
-        for stop, dist in nearby_stops:
-            # Find upcoming departures for this stop
-            cursor.execute("""
-                SELECT st.trip_id, st.departure_time, t.route_id, t.trip_headsign
-                FROM stop_times st
-                JOIN trips t ON st.trip_id = t.trip_id
-                WHERE st.stop_id = ? AND st.departure_time >= ?
-                ORDER BY st.departure_time ASC
-                LIMIT 3
-            """, (stop['stop_id'], start_time[11:19]))  # Use only HH:MM:SS
-            for row in cursor.fetchall():
-                departures.append({
-                    "trip_id": row['trip_id'],
-                    "route_id": row['route_id'],
-                    "trip_headsign": row['trip_headsign'],
-                    "stop": {
-                        "id": stop['stop_id'],
-                        "name": stop['stop_name'],
-                        "coordinates": {
+        with query_engine.current().session() as engine:
+            with span("departures.stop_scan"):
+                # Find stops within 1km of start
+                nearby_stops = engine.nearby_stops(start_lat, start_lon, 1000)[:limit]
+
+            with span("departures.stop_queries"):
+                departures = []
+                for stop, dist in nearby_stops:
+                    # Find upcoming departures for this stop
+                    rows = engine.stop_departures(stop['stop_id'], start_time[11:19], limit=3)  # Use only HH:MM:SS
+                    for row in rows:
+                        departures.append({
+                            "trip_id": row['trip_id'],
+                            "route_id": row['route_id'],
+                            "trip_headsign": row['trip_headsign'],
+                            "stop": {
+                                "id": stop['stop_id'],
+                                "name": stop['stop_name'],
+                                "coordinates": {
+                                    "latitude": float(stop['stop_lat']),
+                                    "longitude": float(stop['stop_lon'])
+                                },
+                                "departure_time": row['departure_time']
+                            },
+                            "distance_start_to_stop": dist
+                        })
+
+            with span("departures.direction_filter"):
+                # Filter departures by direction and format times
+                filtered_departures = []
+                for dep in departures:
+                    # Get the full stop sequence for the trip
+                    trip_stops = engine.trip_stops(dep['trip_id'])
+                    # Find indices of departure stop and closest stop to destination
+                    dep_idx = None
+                    dest_idx = None
+                    min_dest_dist = float('inf')
+                    for i, ts in enumerate(trip_stops):
+                        if ts['stop_id'] == dep['stop']['id']:
+                            dep_idx = i
+                        dest_dist = haversine_distance(float(ts['stop_lat']), float(ts['stop_lon']), end_lat, end_lon)
+                        if dest_dist < min_dest_dist:
+                            min_dest_dist = dest_dist
+                            dest_idx = i
+                    # Only include departures where the trip moves towards the destination
+                    if dep_idx is not None and dest_idx is not None and dep_idx < dest_idx:
+                        # Format departure time as ISO 8601 (assume today)
+                        today = datetime.date.today().isoformat()
+                        dep_time_iso = f"{today}T{dep['stop']['departure_time']}Z"
+                        filtered_departures.append({
+                            "trip_id": dep['trip_id'],
+                            "route_id": dep['route_id'],
+                            "trip_headsign": dep['trip_headsign'],
+                            "stop": {
+                                "name": dep['stop']['name'],
+                                "coordinates": dep['stop']['coordinates'],
+                                "arrival_time": dep_time_iso,  # No arrival_time in current query
+                                "departure_time": dep_time_iso
+                            }
+                        })
+            # Sort by distance and apply global limit
+            with span("departures.sort"):
+                filtered_departures = sorted(filtered_departures, key=lambda x: haversine_distance(start_lat, start_lon, x['stop']['coordinates']['latitude'], x['stop']['coordinates']['longitude']))[:limit]
+            return filtered_departures
+    except Exception as e:
+        _report_error("closest_departures", e)
+        return []
+
+
+def _window_bound(time_str):
+    # GTFS times are HH:MM:SS and may run past 24:00 for trips after midnight
+    return time_str[11:19]
+
+
+def _shift_past_midnight(hhmmss):
+    hours, rest = hhmmss.split(':', 1)
+    return f"{int(hours) + 24:02d}:{rest}"
+
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        return None
+
+
+def _sort_key(option):
+    return (option['departure_time'], option['distance'], option['trip_id'], option['stop_id'])
+
+
+def _pareto_front(options):
+    """
+    Keeps, per trip, the boardings that are not dominated on (departure time, walking distance).
+
+    Boarding the same vehicle later at a stop that is no farther away is always at least as good,
+    so an earlier boarding is only kept when it also saves walking. Dominance is only applied within
+    a trip: different trips are different options for the rider, so an earlier departure of another
+    trip is kept even when it walks farther.
+    """
+    by_trip = {}
+    for option in options:
+        by_trip.setdefault(option['trip_id'], []).append(option)
+
+    front = []
+    for trip_options in by_trip.values():
+        # Latest departure first; keep an option only if it walks less than everything after it
+        trip_options.sort(key=lambda o: (o['departure_time'], -o['distance']), reverse=True)
+        best_distance = float('inf')
+        for option in trip_options:
+            if option['distance'] < best_distance:
+                front.append(option)
+                best_distance = option['distance']
+    return front
+
+
+def _moves_towards(trip_stops, dep_stop_id, end_lat, end_lon):
+    dep_idx = None
+    dest_idx = None
+    min_dest_dist = float('inf')
+    for i, ts in enumerate(trip_stops):
+        if dep_idx is None and ts['stop_id'] == dep_stop_id:
+            dep_idx = i
+        dest_dist = haversine_distance(float(ts['stop_lat']), float(ts['stop_lon']), end_lat, end_lon)
+        if dest_dist < min_dest_dist:
+            min_dest_dist = dest_dist
+            dest_idx = i
+    return dep_idx is not None and dest_idx is not None and dep_idx < dest_idx
+
+
+def get_departures_in_window(start_coordinates, end_coordinates, start_time, end_time, limit=5, page_cursor=None):
+    """
+    Returns every departure heading towards the destination between start_time and end_time.
+
+    The window is swept once: each nearby stop contributes one sorted array of departures, and the
+    direction filter runs once per (variant, stop) pair instead of once per departure. The result is,
+    for every trip, its Pareto set of boardings over departure time and walking distance (see
+    ``_pareto_front``), ordered by departure time and paged with an opaque cursor.
+
+    Returns:
+        dict with "departures" (list) and "next_cursor" (str or None).
+    """
+    empty = {"departures": [], "next_cursor": None}
+    try:
+        start_lat, start_lon = map(float, start_coordinates.split(','))
+        end_lat, end_lon = map(float, end_coordinates.split(','))
+    except Exception:
+        return empty
+
+    after = None
+    if page_cursor:
+        after = _decode_cursor(page_cursor)
+        if after is None:
+            return empty
+
+    window_start = _window_bound(start_time)
+    window_end = _window_bound(end_time)
+    if end_time[:10] > start_time[:10]:
+        # Ends on the next day: GTFS writes those times past 24:00 on the start's service day
+        window_end = _shift_past_midnight(window_end)
+    service_date = start_time[:10]
+
+    try:
+        with query_engine.current().session() as engine:
+            with span("window.stop_scan"):
+                nearby_stops = engine.nearby_stops(start_lat, start_lon, 1000)
+
+            with span("window.stop_queries"):
+                # Per-stop departure arrays, already sorted by the query
+                stop_departures = []
+                for stop, dist in nearby_stops:
+                    rows = engine.stop_departures(stop['stop_id'], window_start, window_end)
+                    stop_departures.append((stop, dist, rows))
+
+            with span("window.direction_filter"):
+                # Direction is a property of the variant's stop sequence, so evaluate it once per variant and stop
+                direction_cache = {}
+                options = []
+                for stop, dist, rows in stop_departures:
+                    for row in rows:
+                        key = (row['variant_id'] or row['trip_id'], stop['stop_id'])
+                        if key not in direction_cache:
+                            trip_stops = engine.trip_stops(row['trip_id'])
+                            direction_cache[key] = _moves_towards(trip_stops, stop['stop_id'], end_lat, end_lon)
+                        if not direction_cache[key]:
+                            continue
+                        options.append({
+                            "trip_id": row['trip_id'],
+                            "route_id": row['route_id'],
+                            "trip_headsign": row['trip_headsign'],
+                            "stop_id": stop['stop_id'],
+                            "stop_name": stop['stop_name'],
                             "latitude": float(stop['stop_lat']),
-                            "longitude": float(stop['stop_lon'])
-                        },
-                        "departure_time": row['departure_time']
+                            "longitude": float(stop['stop_lon']),
+                            "arrival_time": row['arrival_time'] or row['departure_time'],
+                            "departure_time": row['departure_time'],
+                            "distance": round(dist, 1),
+                        })
+
+        with span("window.pareto"):
+            front = sorted(_pareto_front(options), key=_sort_key)
+        if after is not None:
+            front = [option for option in front if _sort_key(option) > after]
+
+        page = front[:limit]
+        next_cursor = _encode_cursor(_sort_key(page[-1])) if len(front) > limit else None
+        return {
+            "departures": [{
+                "trip_id": option['trip_id'],
+                "route_id": option['route_id'],
+                "trip_headsign": option['trip_headsign'],
+                "stop": {
+                    "name": option['stop_name'],
+                    "coordinates": {
+                        "latitude": option['latitude'],
+                        "longitude": option['longitude']
                     },
-                    "distance_start_to_stop": dist
-                })
-
-        # Filter departures by direction and format times
-        filtered_departures = []
-        for dep in departures:
-            # Get the full stop sequence for the trip
-            cursor.execute("""
-                SELECT st.stop_id, s.stop_lat, s.stop_lon
-                FROM stop_times st
-                JOIN stops s ON st.stop_id = s.stop_id
-                WHERE st.trip_id = ?
-                ORDER BY st.stop_sequence ASC
-            """, (dep['trip_id'],))
-            trip_stops = cursor.fetchall()
-            # Find indices of departure stop and closest stop to destination
-            dep_idx = None
-            dest_idx = None
-            min_dest_dist = float('inf')
-            for i, ts in enumerate(trip_stops):
-                if ts['stop_id'] == dep['stop']['id']:
-                    dep_idx = i
-                dest_dist = haversine_distance(ts['stop_lat'], ts['stop_lon'], end_lat, end_lon)
-                if dest_dist < min_dest_dist:
-                    min_dest_dist = dest_dist
-                    dest_idx = i
-            # Only include departures where the trip moves towards the destination
-            if dep_idx is not None and dest_idx is not None and dep_idx < dest_idx:
-                # Format departure time as ISO 8601 (assume today)
-                today = datetime.date.today().isoformat()
-                dep_time_iso = f"{today}T{dep['stop']['departure_time']}Z"
-                filtered_departures.append({
-                    "trip_id": dep['trip_id'],
-                    "route_id": dep['route_id'],
-                    "trip_headsign": dep['trip_headsign'],
-                    "stop": {
-                        "name": dep['stop']['name'],
-                        "coordinates": dep['stop']['coordinates'],
-                        "arrival_time": dep_time_iso,  # No arrival_time in current query
-                        "departure_time": dep_time_iso
-                    }
-                })
-        # Sort by distance and apply global limit
-        filtered_departures = sorted(filtered_departures, key=lambda x: haversine_distance(start_lat, start_lon, x['stop']['coordinates']['latitude'], x['stop']['coordinates']['longitude']))[:limit]
-        return filtered_departures
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return []
+                    "arrival_time": f"{service_date}T{option['arrival_time']}Z",
+                    "departure_time": f"{service_date}T{option['departure_time']}Z"
+                },
+                "walking_distance": option['distance']
+            } for option in page],
+            "next_cursor": next_cursor
+        }
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return []
-    finally:
-        if conn:
-            conn.close()
+        _report_error("departures_in_window", e)
+        return empty
@@ -0,0 +1,101 @@
+import logging
+import sqlite3
+
+from public_transport_api import query_engine
+from public_transport_api.instrumentation import TracedConnection, span
+from public_transport_api.timetable_snapshot import format_time
+
+logger = logging.getLogger(__name__)
+
+
+def _minutes(seconds):
+    return None if seconds is None else round(seconds / 60, 1)
+
+
+def _format_line(row):
+    return {
+        "route_id": row['route_id'],
+        "service_id": row['service_id'],
+        "direction_id": row['direction_id'],
+        "trips": row['trips'],
+        "first_departure": format_time(row['first_departure']),
+        "last_departure": format_time(row['last_departure']),
+        "mean_headway_minutes": _minutes(row['mean_headway']),
+        "max_headway_minutes": _minutes(row['max_headway']),
+        "peak_trips_per_hour": row['peak_trips_per_hour']
+    }
+
+
+def _query(sql, parameters):
+    """Runs a read on the stats tables; raises DataUnavailable when setup_database.py has not built them."""
+    conn = sqlite3.connect(query_engine.database_path(), factory=TracedConnection)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        with span("stats.lookup"):
+            cursor.execute(sql, parameters)
+            return cursor.fetchall()
+    except sqlite3.OperationalError as e:
+        logger.warning("Statistics lookup failed: %s", e)
+        raise query_engine.DataUnavailable(str(e)) from e
+    finally:
+        conn.close()
+
+
+def _service_filter(service_id):
+    return ("AND service_id = ?", (service_id,)) if service_id else ("", ())
+
+
+def get_lines_summary(service_id=None):
+    """Frequency summary of every line, per service and direction, read from the stats_lines table."""
+    condition, parameters = _service_filter(service_id)
+    rows = _query(f"""
+        SELECT * FROM stats_lines WHERE 1 = 1 {condition} ORDER BY route_id, service_id, direction_id
+    """, parameters)
+    return [_format_line(row) for row in rows]
+
+
+def get_line_stats(route_id, service_id=None):
+    """One line's summary with trips started per hour, or None for an unknown line."""
+    condition, parameters = _service_filter(service_id)
+    rows = _query(f"""
+        SELECT * FROM stats_lines WHERE route_id = ? {condition} ORDER BY service_id, direction_id
+    """, (route_id,) + parameters)
+    if not rows:
+        return None
+    hours = _query(f"""
+        SELECT service_id, direction_id, hour, trips FROM stats_line_hours
+        WHERE route_id = ? {condition} ORDER BY service_id, direction_id, hour
+    """, (route_id,) + parameters)
+
+    directions = []
+    for row in rows:
+        line = _format_line(row)
+        line["trips_per_hour"] = {
+            f"{hour['hour']:02d}": hour['trips'] for hour in hours
+            if hour['service_id'] == row['service_id'] and hour['direction_id'] == row['direction_id']
+        }
+        directions.append(line)
+    return {"route_id": route_id, "directions": directions}
+
+
+def get_stop_stats(stop_id, service_id=None):
+    """Departures per line at one stop, or None when nothing departs from it."""
+    condition, parameters = _service_filter(service_id)
+    rows = _query(f"""
+        SELECT * FROM stats_stops WHERE stop_id = ? {condition} ORDER BY route_id, service_id
+    """, (stop_id,) + parameters)
+    if not rows:
+        return None
+    return {
+        "stop_id": stop_id,
+        "lines": [{
+            "route_id": row['route_id'],
+            "service_id": row['service_id'],
+            "departures": row['departures'],
+            "first_departure": format_time(row['first_departure']),
+            "last_departure": format_time(row['last_departure']),
+            "max_gap_minutes": _minutes(row['max_gap']),
+            "peak_departures_per_hour": row['peak_departures_per_hour']
+        } for row in rows]
+    }
@@ -1,56 +1,35 @@
-import sqlite3
+import datetime
 
+from public_transport_api import query_engine
+from public_transport_api.instrumentation import span
 
-def get_trip_details(trip_id):
-    # FIXME This is a mock implementation and should be replaced with actual database queries.
-    conn = sqlite3.connect('trips.sqlite')
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT route_id, trip_headsign FROM main.trips LIMIT 1
-    """)
-    first_trip_row = cursor.fetchone()
 
-    conn.close()
+def _format_stop(stop, service_date):
+    return {
+        "name": stop['stop_name'],
+        "coordinates": {
+            "latitude": float(stop['stop_lat']),
+            "longitude": float(stop['stop_lon'])
+        },
+        "arrival_time": f"{service_date}T{stop['arrival_time']}Z",
+        "departure_time": f"{service_date}T{stop['departure_time']}Z"
+    }
 
-    if not first_trip_row:
-        return None
 
-    route_id, trip_headsign = first_trip_row
+def get_trip_details(trip_id):
+    # Format stop times as ISO 8601 (assume today), like the departures service
+    today = datetime.date.today().isoformat()
 
-    mocked_stop_details = [
-        {
-            "name": "Mock Stop A",
-            "coordinates": {
-                "latitude": 40.7128,
-                "longitude": -74.0060
-            },
-            "arrival_time": "2025-04-02T08:00:00Z",
-            "departure_time": "2025-04-02T08:05:00Z"
-        },
-        {
-            "name": "Mock Stop B",
-            "coordinates": {
-                "latitude": 40.7580,
-                "longitude": -73.9855
-            },
-            "arrival_time": "2025-04-02T08:15:00Z",
-            "departure_time": "2025-04-02T08:20:00Z"
-        },
-        {
-            "name": "Mock Stop C",
-            "coordinates": {
-                "latitude": 40.7850,
-                "longitude": -73.9650
-            },
-            "arrival_time": "2025-04-02T08:30:00Z",
-            "departure_time": "2025-04-02T08:35:00Z"
-        }
-    ]
+    with query_engine.current().session() as engine:
+        with span("trip.lookup"):
+            trip = engine.trip(trip_id)
+            if trip is None:
+                return None
+            stops = engine.trip_stops(trip_id)
 
     return {
         "trip_id": trip_id,
-        "route_id": route_id,
-        "trip_headsign": trip_headsign,
-        "stops": mocked_stop_details
+        "route_id": trip['route_id'],
+        "trip_headsign": trip['trip_headsign'],
+        "stops": [_format_stop(stop, today) for stop in stops]
     }
@@ -0,0 +1,169 @@
+"""
+Startup pipeline: warm-up off the request path, readiness reporting and time-to-first-response.
+
+``init_app`` registers ``/ready``; ``start`` runs the warm-up, by default in a background thread, so
+the worker can accept connections immediately while the load balancer keeps traffic away until
+``/ready`` flips to 200. ``start`` is called by the serving entry point once every route is
+registered (``main.py``, or a server hook such as gunicorn's ``post_worker_init``); when nothing
+called it, the worker's first request starts it. Warm-up maps the timetable snapshot and the stop index:
+the index is a view on the snapshot's stop columns, or, without a usable snapshot, a stops-only
+snapshot built when it is missing or older than the database. It then sets up the query engine the services read from, then serves one real request through the app to prime every
+code path. That request is kept out of the metrics and the admission latency window.
+"""
+import os
+import threading
+import time
+
+from public_transport_api import instrumentation, query_engine, stop_index, timetable_snapshot
+
+DEFAULT_WARM_UP_URL = (
+    "/public_transport/city/wroclaw/closest_departures"
+    "?start_coordinates=51.1079,17.0385&end_coordinates=51.1141,17.0301&start_time=2025-04-02T08:00:00Z"
+)
+
+
+class StartupState:
+    """Tracks warm-up progress and timings for one worker process."""
+
+    def __init__(self, process_started):
+        self.process_started = process_started
+        self.ready = threading.Event()
+        self.steps = {}
+        self.time_to_first_response = None
+        self.error = None
+        self.started = False
+        self._start_lock = threading.Lock()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.process_started) * 1000
+
+    def report(self):
+        return {
+            "ready": self.ready.is_set(),
+            "steps_ms": {name: round(ms, 2) for name, ms in self.steps.items()},
+            "time_to_first_response_ms": (
+                None if self.time_to_first_response is None else round(self.time_to_first_response, 2)
+            ),
+            "error": self.error,
+        }
+
+
+def _snapshot_is_stale(db_path, snapshot_path):
+    return not os.path.exists(snapshot_path) or os.path.getmtime(snapshot_path) < os.path.getmtime(db_path)
+
+
+def load_stop_index(db_path, snapshot_path, timetable=None):
+    """
+    Makes the stop index a view on the loaded timetable snapshot, or else maps the stops-only
+    snapshot, rebuilding it first if it is missing, older than the database or in an old format.
+    """
+    if timetable is not None:
+        return stop_index.load(timetable)
+    if not os.path.exists(db_path):
+        return None
+    if _snapshot_is_stale(db_path, snapshot_path):
+        stop_index.build_snapshot(db_path, snapshot_path)
+    try:
+        return stop_index.load(snapshot_path)
+    except ValueError:
+        stop_index.build_snapshot(db_path, snapshot_path)
+        return stop_index.load(snapshot_path)
+
+
+def load_timetable(db_path, snapshot_path):
+    """Maps the timetable snapshot written by export_snapshot.py, unless it predates the database."""
+    if not os.path.exists(snapshot_path):
+        return None
+    if os.path.exists(db_path) and _snapshot_is_stale(db_path, snapshot_path):
+        print(f"Startup: {snapshot_path} is older than {db_path}; re-run export_snapshot.py. Serving from SQLite.")
+        return None
+    return timetable_snapshot.load(snapshot_path)
+
+
+def configure_query_engine(app):
+    """Creates the engine named by QUERY_ENGINE and makes the services use it and DATABASE."""
+    query_engine.configure_database(app.config["DATABASE"])
+    engine = query_engine.create(app.config["QUERY_ENGINE"], app.config["DATABASE"], timetable_snapshot.current())
+    app.extensions["query_engine"] = query_engine.configure(engine)
+    return engine
+
+
+def warm_up(app, state):
+    """Runs the warm-up steps in order and marks the worker ready."""
+    try:
+        started = time.perf_counter()
+        timetable = load_timetable(app.config["DATABASE"], app.config["TIMETABLE_SNAPSHOT_PATH"])
+        state.steps["timetable"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        load_stop_index(app.config["DATABASE"], app.config["STOP_INDEX_PATH"], timetable)
+        state.steps["stop_index"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        configure_query_engine(app)
+        state.steps["query_engine"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with instrumentation.muted(), app.test_client() as client:
+            client.get(app.config["WARM_UP_URL"])
+        state.steps["first_request"] = (time.perf_counter() - started) * 1000
+        state.time_to_first_response = state.elapsed_ms()
+    except Exception as e:
+        # A failed warm-up leaves the slow paths in place; it must not keep the worker out of rotation
+        state.error = str(e)
+    finally:
+        state.ready.set()
+        print(f"Startup: ready after {state.elapsed_ms():.1f} ms "
+              f"(steps: {', '.join(f'{name}={ms:.1f} ms' for name, ms in state.steps.items()) or 'none'}; "
+              f"time to first response: "
+              f"{'n/a' if state.time_to_first_response is None else f'{state.time_to_first_response:.1f} ms'})")
+
+
+def init_app(app, process_started):
+    """
+    Registers /ready; the warm-up runs once ``start`` is called, or on the first request otherwise.
+
+    Config keys (all optional): DATABASE, STOP_INDEX_PATH (defaults to ``<database>.stops.idx``),
+    TIMETABLE_SNAPSHOT_PATH (defaults to ``<database>.timetable``), QUERY_ENGINE (``auto``, ``sqlite``,
+    ``memory`` or ``snapshot``, see query_engine) and WARM_UP_URL.
+    """
+    from flask import jsonify
+
+    app.config.setdefault("DATABASE", "trips.sqlite")
+    app.config.setdefault("STOP_INDEX_PATH", os.path.splitext(app.config["DATABASE"])[0] + ".stops.idx")
+    app.config.setdefault("TIMETABLE_SNAPSHOT_PATH", os.path.splitext(app.config["DATABASE"])[0] + ".timetable")
+    app.config.setdefault("QUERY_ENGINE", "auto")
+    app.config.setdefault("WARM_UP_URL", DEFAULT_WARM_UP_URL)
+
+    state = StartupState(process_started)
+    state.steps["imports"] = state.elapsed_ms()
+    app.extensions["startup"] = state
+
+    @app.before_request
+    def _start_warm_up():
+        start(app)
+
+    @app.route("/ready")
+    def ready():
+        return jsonify(state.report()), 200 if state.ready.is_set() else 503
+
+    return state
+
+
+def start(app, background=True):
+    """
+    Starts the warm-up of an app set up with ``init_app``; later calls do nothing.
+
+    Call it once the app has all its routes. Set ``background=False`` to warm up synchronously, e.g.
+    from a gunicorn preload hook. Returns the app's StartupState.
+    """
+    state = app.extensions["startup"]
+    with state._start_lock:
+        if state.started:
+            return state
+        state.started = True
+    if background:
+        threading.Thread(target=warm_up, args=(app, state), name="warm-up", daemon=True).start()
+    else:
+        warm_up(app, state)
+    return state
@@ -0,0 +1,165 @@
+"""
+Compact static timetable bundle for the offline frontend.
+
+``export_bundle.py`` converts the timetable snapshot into one binary file that the browser downloads
+once per feed. A Web Worker then answers nearest-stop, departure and trip queries without the API
+(see ``frontend/timetable.js``). The bundle uses the snapshot's container format (header,
+directory, 8-byte aligned columns) with its own magic, so every column can be viewed as a typed
+array. It is less than a third of the snapshot's size:
+
+    stops       stop_id, stop_name (string tables), stop_lat, stop_lon (int32 microdegrees)
+    patterns    pattern_offsets uint32[patterns + 1] into pattern_stops (uint32 stop row): every
+                distinct stop sequence is stored once, however many trips run it
+    profiles    profile_pattern (uint32), profile_offsets uint32[profiles + 1] into profile_arrival
+                and profile_departure (int32 seconds after the trip's first departure): trips with
+                the same pattern and running times share a profile
+    trips       trip_id (string table, sorted), trip_route and trip_headsign (uint32 indexes into
+                the route_id and headsign string tables), trip_profile (uint32), trip_start (int32
+                seconds since midnight of the service day)
+    stop deps   stop_dep_offsets uint32[stops + 1] into sd_trip (uint32 trip row) and sd_position
+                (uint16 index into the trip's pattern), sorted by departure within each stop
+
+Departure times per stop are not stored: the reader derives them once after loading as
+``trip_start[trip] + profile_departure[profile_offsets[trip_profile[trip]] + position]``.
+
+The bundle file is named after its content digest, and ``manifest.json`` next to it points to the
+current one. Clients can cache a bundle forever and only need to revalidate the manifest.
+"""
+import datetime
+import hashlib
+import json
+import os
+from array import array
+
+from public_transport_api import timetable_snapshot
+
+MAGIC = b"PTSB"
+VERSION = 1
+MANIFEST = "manifest.json"
+
+
+class _Codes(dict):
+    """Assigns dense integer codes to hashable values in first-seen order."""
+
+    def __missing__(self, value):
+        code = self[value] = len(self)
+        return code
+
+
+def _microdegrees(values):
+    return array("i", (round(value * 1_000_000) for value in values))
+
+
+def _write(snapshot, path):
+    """Writes the bundle for an open TimetableSnapshot; returns row counts."""
+    patterns, profiles, routes, headsigns = _Codes(), _Codes(), _Codes(), _Codes()
+    trip_route, trip_headsign, trip_profile, trip_start = array("I"), array("I"), array("I"), array("i")
+    offsets = snapshot.trip_stop_offsets
+    for trip_row in range(len(snapshot.trip_id)):
+        start, end = offsets[trip_row], offsets[trip_row + 1]
+        first = snapshot.st_departure[start] if end > start else 0
+        pattern = patterns[tuple(snapshot.st_stop[start:end])]
+        profile = profiles[(pattern,
+                            tuple(arrival - first for arrival in snapshot.st_arrival[start:end]),
+                            tuple(departure - first for departure in snapshot.st_departure[start:end]))]
+        trip_route.append(routes[snapshot.route_id[trip_row]])
+        trip_headsign.append(headsigns[snapshot.trip_headsign[trip_row]])
+        trip_profile.append(profile)
+        trip_start.append(first)
+
+    pattern_offsets, pattern_stops = array("I", [0]), array("I")
+    for stops in patterns:
+        pattern_stops.extend(stops)
+        pattern_offsets.append(len(pattern_stops))
+    profile_pattern, profile_offsets = array("I"), array("I", [0])
+    profile_arrival, profile_departure = array("i"), array("i")
+    for pattern, arrivals, departures in profiles:
+        profile_pattern.append(pattern)
+        profile_arrival.extend(arrivals)
+        profile_departure.extend(departures)
+        profile_offsets.append(len(profile_arrival))
+
+    writer = timetable_snapshot.ColumnWriter(MAGIC, VERSION)
+    stop_count = len(snapshot.stop_id)
+    writer.add_strings("stop_id", (snapshot.stop_id[i] for i in range(stop_count)))
+    writer.add_strings("stop_name", (snapshot.stop_name[i] for i in range(stop_count)))
+    writer.add("stop_lat", "i", _microdegrees(snapshot.stop_lat))
+    writer.add("stop_lon", "i", _microdegrees(snapshot.stop_lon))
+    writer.add("pattern_offsets", "I", pattern_offsets)
+    writer.add("pattern_stops", "I", pattern_stops)
+    writer.add("profile_pattern", "I", profile_pattern)
+    writer.add("profile_offsets", "I", profile_offsets)
+    writer.add("profile_arrival", "i", profile_arrival)
+    writer.add("profile_departure", "i", profile_departure)
+    writer.add_strings("trip_id", (snapshot.trip_id[i] for i in range(len(snapshot.trip_id))))
+    writer.add_strings("route_id", routes)
+    writer.add_strings("headsign", headsigns)
+    writer.add("trip_route", "I", trip_route)
+    writer.add("trip_headsign", "I", trip_headsign)
+    writer.add("trip_profile", "I", trip_profile)
+    writer.add("trip_start", "i", trip_start)
+    writer.add("stop_dep_offsets", "I", array("I", snapshot.stop_dep_offsets))
+    writer.add("sd_trip", "I", array("I", snapshot.sd_trip))
+    if max(snapshot.sd_position, default=0) > 0xFFFF:
+        raise ValueError("A trip has more than 65536 stops, which sd_position cannot index")
+    writer.add("sd_position", "H", array("H", snapshot.sd_position))
+    writer.write(path)
+    return {"stops": stop_count, "trips": len(snapshot.trip_id), "patterns": len(patterns),
+            "profiles": len(profiles), "departures": len(snapshot.sd_trip)}
+
+
+def _digest(path):
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build(snapshot_path, output_dir):
+    """
+    Writes a bundle for the snapshot and points ``manifest.json`` to it; returns the manifest.
+
+    Bundles of earlier feeds are removed once the manifest has been replaced.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = os.path.join(output_dir, "timetable.bin.tmp")
+    snapshot = timetable_snapshot.TimetableSnapshot(snapshot_path)
+    try:
+        counts = _write(snapshot, tmp_path)
+    finally:
+        snapshot.close()
+
+    feed_version = _digest(tmp_path)
+    file_name = f"timetable-{feed_version}.bin"
+    os.replace(tmp_path, os.path.join(output_dir, file_name))
+    manifest = {
+        "format": VERSION,
+        "feed_version": feed_version,
+        "file": file_name,
+        "bytes": os.path.getsize(os.path.join(output_dir, file_name)),
+        "generated": datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat(),
+        "counts": counts,
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    for name in os.listdir(output_dir):
+        if name.startswith("timetable-") and name.endswith(".bin") and name != file_name:
+            os.remove(os.path.join(output_dir, name))
+    return manifest
+
+
+def read(path):
+    """Reads a bundle back as {column: array or bytes}; the browser does the same with typed arrays."""
+    bundle = timetable_snapshot.ColumnFile(path, MAGIC, VERSION, kind="timetable bundle")
+    try:
+        columns = {}
+        for name in bundle.names():
+            view = bundle.column(name)
+            columns[name] = view.tobytes() if view.format == "B" else array(view.format, view.tobytes())
+        return columns
+    finally:
+        bundle.close()
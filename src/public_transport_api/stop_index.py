@@ -0,0 +1,102 @@
+"""
+Spatial index of the stops over the stop columns of a timetable snapshot.
+
+The timetable snapshot (timetable_snapshot.py) stores stop_id, stop_name, stop_lat sorted ascending and
+stop_lon, which is all the index needs: when the snapshot is loaded, the index is a view on those
+columns and nothing is mapped twice. Without a timetable snapshot, ``build_snapshot`` writes a file in
+the same container format holding only the stop columns, built once from trips.sqlite and opened with
+mmap by every worker, so finding the stops around a point neither reloads nor rescans the stops table.
+"""
+import bisect
+import math
+import os
+import sqlite3
+
+from public_transport_api import timetable_snapshot
+
+EARTH_RADIUS_M = 6371000
+
+_loaded = None
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters; every query engine measures with this one function."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+    return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def build_snapshot(db_path, snapshot_path):
+    """Reads the stops table and writes a stops-only snapshot; returns the number of stops."""
+    conn = sqlite3.connect(db_path)
+    try:
+        stops = timetable_snapshot.sort_stops(conn.execute("SELECT stop_id, stop_name, stop_lat, stop_lon FROM stops"))
+    finally:
+        conn.close()
+    writer = timetable_snapshot.ColumnWriter()
+    timetable_snapshot.add_stops(writer, stops)
+    writer.write(snapshot_path)
+    return len(stops)
+
+
+class StopIndex:
+    """
+    Read-only view of the stop columns; every array is a zero-copy memoryview into the mapping.
+
+    ``source`` is the path of a stops-only or full timetable snapshot, which the index maps and closes
+    itself, or an open TimetableSnapshot whose columns it borrows.
+    """
+
+    def __init__(self, source):
+        self._owned = isinstance(source, (str, os.PathLike))
+        self._columns = timetable_snapshot.ColumnFile(source, kind="stop index") if self._owned else source
+        self.lat = self._columns.column("stop_lat")
+        self.lon = self._columns.column("stop_lon")
+        self._stop_id = self._columns.strings("stop_id")
+        self._stop_name = self._columns.strings("stop_name")
+        self.count = len(self.lat)
+
+    def stop(self, i):
+        return {
+            "stop_id": self._stop_id[i],
+            "stop_name": self._stop_name[i],
+            "stop_lat": self.lat[i],
+            "stop_lon": self.lon[i],
+        }
+
+    def within(self, lat, lon, radius_m):
+        """Returns (stop, distance) pairs within radius_m of the point, closest first (ties by stop_id)."""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        lo = bisect.bisect_left(self.lat, lat - dlat)
+        hi = bisect.bisect_right(self.lat, lat + dlat)
+        found = []
+        for i in range(lo, hi):
+            dist = haversine_distance(lat, lon, self.lat[i], self.lon[i])
+            if dist <= radius_m:
+                found.append((self.stop(i), dist))
+        found.sort(key=lambda item: (item[1], item[0]["stop_id"]))
+        return found
+
+    def close(self):
+        if self._owned:
+            self._columns.close()
+
+
+def load(source):
+    """
+    Opens an index (see StopIndex) and makes it the one the services use.
+
+    The index it replaces is not closed here: requests that read it before the swap may still be
+    using it, and its mapping is released once the last of them lets go.
+    """
+    global _loaded
+    _loaded = StopIndex(source)
+    return _loaded
+
+
+def current():
+    """The loaded index, or None when the services should fall back to scanning the stops table."""
+    return _loaded
@@ -0,0 +1,380 @@
+"""
+Versioned, memory-mapped binary snapshot of the timetable.
+
+The export step (``export_snapshot.py``, run after ``setup_database.py``) writes stops, trips, the
+ordered stop sequence of every trip and per-stop departure arrays into one file of fixed-width
+columns. API workers open it with mmap and read the columns zero-copy, so N workers share a single
+page-cache copy and nothing is decoded at startup. With NumPy installed, ``numpy_column`` exposes the
+same bytes as ndarray views.
+
+File layout (little endian, every column 8-byte aligned):
+    header     magic b"PTTT", version u32, column count u32, reserved u32
+    directory  one entry per column: name (32 bytes, NUL padded), type code (1 byte, struct format),
+               padding (7 bytes), byte offset u64, item count u64
+    columns    raw arrays
+
+Tables and their columns:
+    stops        stop_id, stop_name (string tables), stop_lat, stop_lon (float64)
+    trips        trip_id (string table, sorted), route_id, trip_headsign, service_id, variant_id,
+                 brigade_id (string tables)
+    trip stops   trip_stop_offsets uint32[trips + 1] into st_stop (uint32 stop row), st_arrival,
+                 st_departure (int32 seconds since midnight of the service day)
+    stop deps    stop_dep_offsets uint32[stops + 1] into sd_trip (uint32 trip row), sd_position
+                 (uint32 index into the trip's stop sequence), sd_departure (int32 seconds, sorted
+                 within each stop)
+
+A string table ``name`` is stored as two columns: ``name.offsets`` (uint32[n + 1]) and ``name.blob``.
+
+``ColumnWriter`` and ``ColumnFile`` write and map any file in this container format. The stop index
+(stop_index.py) reads the stop columns, either from the timetable snapshot or from a file holding only
+those, and the offline bundle (static_bundle.py) uses the container with its own magic.
+"""
+import bisect
+import mmap
+import os
+import sqlite3
+import struct
+import weakref
+from array import array
+
+MAGIC = b"PTTT"
+VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+_ENTRY = struct.Struct("<32sc7xQQ")
+
+_loaded = None
+
+
+def parse_time(hhmmss):
+    """GTFS HH:MM:SS (hours may exceed 23) to seconds since midnight."""
+    hours, minutes, seconds = hhmmss.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def format_time(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def normalize_time(hhmmss):
+    """A GTFS time as zero-padded HH:MM:SS ("8:05:00" becomes "08:05:00"); None when it is empty or NULL."""
+    seconds = _seconds(hhmmss)
+    return None if seconds is None else format_time(seconds)
+
+
+class ColumnWriter:
+    """Collects named columns and writes them into one container file."""
+
+    def __init__(self, magic=MAGIC, version=VERSION):
+        self.magic = magic
+        self.version = version
+        self.columns = []
+
+    def add(self, name, type_code, values):
+        self.columns.append((name, type_code, values if isinstance(values, array) else array(type_code, values)))
+
+    def add_strings(self, name, values):
+        blob = bytearray()
+        offsets = array("I", [0])
+        for value in values:
+            blob += (value or "").encode("utf-8")
+            offsets.append(len(blob))
+        self.add(name + ".offsets", "I", offsets)
+        self.columns.append((name + ".blob", "B", bytes(blob)))
+
+    def write(self, path):
+        """Writes the file atomically (through ``path + ".tmp"``)."""
+        position = _HEADER.size + _ENTRY.size * len(self.columns)
+        entries = []
+        for name, type_code, values in self.columns:
+            position = (position + 7) & ~7
+            item_size = 1 if type_code == "B" else values.itemsize
+            entries.append((name, type_code, position, len(values)))
+            position += item_size * len(values)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(self.magic, self.version, len(self.columns), 0))
+            for name, type_code, offset, count in entries:
+                f.write(_ENTRY.pack(name.encode("ascii"), type_code.encode("ascii"), offset, count))
+            for (_, _, values), (_, _, offset, _) in zip(self.columns, entries):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(values if isinstance(values, bytes) else values.tobytes())
+        os.replace(tmp_path, path)
+
+
+def _seconds(hhmmss):
+    # Text times come from SQLite, integer seconds from the columnar export
+    if hhmmss is None or hhmmss == "":
+        return None
+    return hhmmss if isinstance(hhmmss, int) else parse_time(hhmmss)
+
+
+def sort_stops(stop_rows):
+    """(lat, lon, stop_id, stop_name) tuples from (stop_id, stop_name, lat, lon) rows, in stop row order."""
+    return sorted((float(lat), float(lon), str(stop_id), name) for stop_id, name, lat, lon in stop_rows)
+
+
+def add_stops(writer, stops):
+    """Adds the stop columns for stops sorted with ``sort_stops``; stop_lat is ascending."""
+    writer.add_strings("stop_id", (stop[2] for stop in stops))
+    writer.add_strings("stop_name", (stop[3] for stop in stops))
+    writer.add("stop_lat", "d", (stop[0] for stop in stops))
+    writer.add("stop_lon", "d", (stop[1] for stop in stops))
+
+
+def export(db_path, snapshot_path):
+    """Builds the snapshot from an imported database; returns row counts per table."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return build(
+            conn.execute("SELECT stop_id, stop_name, stop_lat, stop_lon FROM stops"),
+            conn.execute("SELECT trip_id, route_id, trip_headsign, service_id, variant_id, brigade_id FROM trips"),
+            conn.execute("""
+                SELECT trip_id, stop_id, arrival_time, departure_time
+                FROM stop_times
+                ORDER BY trip_id, CAST(stop_sequence AS INTEGER)
+            """),
+            snapshot_path,
+        )
+    finally:
+        conn.close()
+
+
+def build(stop_rows_in, trip_rows_in, stop_time_rows, snapshot_path):
+    """
+    Builds the snapshot from row iterables; returns row counts per table.
+
+    Rows are (stop_id, stop_name, stop_lat, stop_lon), (trip_id, route_id, trip_headsign, service_id,
+    variant_id, brigade_id) and (trip_id, stop_id, arrival_time, departure_time), the latter ordered by
+    trip_id and stop sequence. Times may be GTFS text or seconds; stop_times rows with neither time are
+    left out and counted as untimed_stop_times.
+    """
+    stops = sort_stops(stop_rows_in)
+    stop_rows = {stop[2]: i for i, stop in enumerate(stops)}
+
+    trips = sorted(tuple(trip) for trip in trip_rows_in)
+    trip_rows = {trip[0]: i for i, trip in enumerate(trips)}
+
+    # Stop sequences, streamed in trip order
+    trip_stop_offsets = array("I", [0] * (len(trips) + 1))
+    st_trip = array("I")
+    st_stop = array("I")
+    st_arrival = array("i")
+    st_departure = array("i")
+    untimed = 0
+    for trip_id, stop_id, arrival_time, departure_time in stop_time_rows:
+        trip_row = trip_rows.get(trip_id)
+        stop_row = stop_rows.get(str(stop_id))
+        if trip_row is None or stop_row is None:
+            continue
+        arrival = _seconds(arrival_time)
+        departure = _seconds(departure_time)
+        if arrival is None and departure is None:
+            # An untimed stop the import did not fill in; it has no place in int32 time columns
+            untimed += 1
+            continue
+        departure = arrival if departure is None else departure
+        st_trip.append(trip_row)
+        st_stop.append(stop_row)
+        st_arrival.append(departure if arrival is None else arrival)
+        st_departure.append(departure)
+        trip_stop_offsets[trip_row + 1] += 1
+
+    # stop_times arrive sorted by trip_id text, which is also the trip row order
+    for i in range(len(trips)):
+        trip_stop_offsets[i + 1] += trip_stop_offsets[i]
+
+    # Per-stop departure arrays: the same rows ordered by (stop, departure)
+    order = sorted(range(len(st_stop)), key=lambda k: (st_stop[k], st_departure[k]))
+    stop_dep_offsets = array("I", [0] * (len(stops) + 1))
+    for k in order:
+        stop_dep_offsets[st_stop[k] + 1] += 1
+    for i in range(len(stops)):
+        stop_dep_offsets[i + 1] += stop_dep_offsets[i]
+
+    writer = ColumnWriter()
+    add_stops(writer, stops)
+    for column, name in enumerate(("trip_id", "route_id", "trip_headsign", "service_id", "variant_id", "brigade_id")):
+        writer.add_strings(name, (str(trip[column]) if trip[column] is not None else "" for trip in trips))
+    writer.add("trip_stop_offsets", "I", trip_stop_offsets)
+    writer.add("st_stop", "I", st_stop)
+    writer.add("st_arrival", "i", st_arrival)
+    writer.add("st_departure", "i", st_departure)
+    writer.add("stop_dep_offsets", "I", stop_dep_offsets)
+    writer.add("sd_trip", "I", (st_trip[k] for k in order))
+    writer.add("sd_position", "I", (k - trip_stop_offsets[st_trip[k]] for k in order))
+    writer.add("sd_departure", "i", (st_departure[k] for k in order))
+    writer.write(snapshot_path)
+    return {"stops": len(stops), "trips": len(trips), "stop_times": len(st_stop), "untimed_stop_times": untimed}
+
+
+class StringColumn:
+    """A string table read lazily from the mapped file; supports len, indexing and bisect."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+
+def _unmap(columns, view, mapping):
+    for column in columns.values():
+        column.release()
+    columns.clear()
+    view.release()
+    mapping.close()
+
+
+class ColumnFile:
+    """
+    Read-only mapping of a container file; columns are zero-copy memoryviews over the mapping.
+
+    ``close`` unmaps the file at once. A file that is never closed is unmapped when the last reference
+    to it goes, so a replaced file stays readable for the requests that still hold it.
+    """
+
+    def __init__(self, path, magic=MAGIC, version=VERSION, kind="timetable snapshot"):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {version} {kind}")
+        file_magic, file_version, count, _ = _HEADER.unpack_from(self._mmap, 0)
+        if file_magic != magic or file_version != version:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {version} {kind}")
+
+        self._directory = {}
+        for i in range(count):
+            name, type_code, offset, length = _ENTRY.unpack_from(self._mmap, _HEADER.size + i * _ENTRY.size)
+            self._directory[name.rstrip(b"\0").decode("ascii")] = (type_code.decode("ascii"), offset, length)
+
+        self._view = memoryview(self._mmap)
+        self._columns = {}
+        self._finalizer = weakref.finalize(self, _unmap, self._columns, self._view, self._mmap)
+
+    def names(self):
+        return list(self._directory)
+
+    def has(self, name):
+        return name in self._directory
+
+    def column(self, name):
+        """A column as a memoryview over the mapping."""
+        if name not in self._columns:
+            type_code, offset, length = self._directory[name]
+            size = 1 if type_code == "B" else struct.calcsize(type_code)
+            self._columns[name] = self._view[offset:offset + size * length].cast(type_code)
+        return self._columns[name]
+
+    def numpy_column(self, name):
+        """A column as a NumPy array sharing the mapped pages; requires NumPy."""
+        import numpy
+
+        type_code, offset, length = self._directory[name]
+        return numpy.frombuffer(self._mmap, dtype=numpy.dtype(type_code).newbyteorder("<"), count=length,
+                                offset=offset)
+
+    def strings(self, name):
+        return StringColumn(self.column(name + ".offsets"), self.column(name + ".blob"))
+
+    def close(self):
+        self._finalizer()
+
+
+class TimetableSnapshot(ColumnFile):
+    """Read-only, zero-copy view of a snapshot file."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        if not self.has("trip_stop_offsets"):
+            self.close()
+            raise ValueError(f"{path} holds only stop columns, not a timetable snapshot")
+        self.stop_id = self.strings("stop_id")
+        self.stop_name = self.strings("stop_name")
+        self.stop_lat = self.column("stop_lat")
+        self.stop_lon = self.column("stop_lon")
+        self.trip_id = self.strings("trip_id")
+        self.route_id = self.strings("route_id")
+        self.trip_headsign = self.strings("trip_headsign")
+        self.service_id = self.strings("service_id")
+        self.variant_id = self.strings("variant_id")
+        self.brigade_id = self.strings("brigade_id")
+        self.trip_stop_offsets = self.column("trip_stop_offsets")
+        self.st_stop = self.column("st_stop")
+        self.st_arrival = self.column("st_arrival")
+        self.st_departure = self.column("st_departure")
+        self.stop_dep_offsets = self.column("stop_dep_offsets")
+        self.sd_trip = self.column("sd_trip")
+        self.sd_position = self.column("sd_position")
+        self.sd_departure = self.column("sd_departure")
+        self._stop_rows = None
+
+    def stop_row(self, stop_id):
+        if self._stop_rows is None:
+            self._stop_rows = {self.stop_id[i]: i for i in range(len(self.stop_id))}
+        return self._stop_rows.get(str(stop_id))
+
+    def trip_row(self, trip_id):
+        i = bisect.bisect_left(self.trip_id, trip_id)
+        return i if i < len(self.trip_id) and self.trip_id[i] == trip_id else None
+
+    def trip_stops(self, trip_row):
+        """Stops of a trip in sequence order as dicts shaped like the stop_times/stops query rows."""
+        start, end = self.trip_stop_offsets[trip_row], self.trip_stop_offsets[trip_row + 1]
+        return [{
+            "stop_id": self.stop_id[self.st_stop[k]],
+            "stop_name": self.stop_name[self.st_stop[k]],
+            "stop_lat": self.stop_lat[self.st_stop[k]],
+            "stop_lon": self.stop_lon[self.st_stop[k]],
+            "arrival_time": format_time(self.st_arrival[k]),
+            "departure_time": format_time(self.st_departure[k]),
+        } for k in range(start, end)]
+
+    def departures(self, stop_row, from_seconds, to_seconds=None, limit=None):
+        """Departures from a stop in [from_seconds, to_seconds], sorted, shaped like the SQL query rows."""
+        start, end = self.stop_dep_offsets[stop_row], self.stop_dep_offsets[stop_row + 1]
+        k = bisect.bisect_left(self.sd_departure, from_seconds, start, end)
+        if to_seconds is not None:
+            end = bisect.bisect_right(self.sd_departure, to_seconds, k, end)
+        if limit is not None:
+            end = min(end, k + limit)
+        rows = []
+        for k in range(k, end):
+            trip_row = self.sd_trip[k]
+            position = self.trip_stop_offsets[trip_row] + self.sd_position[k]
+            rows.append({
+                "trip_id": self.trip_id[trip_row],
+                "route_id": self.route_id[trip_row],
+                "trip_headsign": self.trip_headsign[trip_row],
+                "variant_id": self.variant_id[trip_row],
+                "arrival_time": format_time(self.st_arrival[position]),
+                "departure_time": format_time(self.sd_departure[k]),
+            })
+        return rows
+
+
+def load(path):
+    """
+    Opens a snapshot and makes it the one the services read from.
+
+    As with stop_index.load, the snapshot it replaces is unmapped once the last request using it
+    lets go of it (see ColumnFile), not here.
+    """
+    global _loaded
+    _loaded = TimetableSnapshot(path)
+    return _loaded
+
+
+def current():
+    """The loaded snapshot, or None when the services should query SQLite."""
+    return _loaded
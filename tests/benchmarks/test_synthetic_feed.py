@@ -0,0 +1,63 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.run_benchmarks import DEFAULT_BASELINE, compare
+from benchmarks.synthetic_feed import generate_feed
+
+
+def _read(gtfs_dir, filename):
+    with open(os.path.join(gtfs_dir, filename), encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class TestSyntheticFeed(unittest.TestCase):
+    def test_feed_is_referentially_consistent(self):
+        with tempfile.TemporaryDirectory() as gtfs_dir:
+            counts = generate_feed(gtfs_dir, scale=0.02)
+            stop_ids = {row['stop_id'] for row in _read(gtfs_dir, 'stops.txt')}
+            trips = _read(gtfs_dir, 'trips.txt')
+            stop_times = _read(gtfs_dir, 'stop_times.txt')
+
+            self.assertEqual(len(trips), counts['trips'])
+            self.assertEqual(len(stop_times), counts['stop_times'])
+            self.assertTrue({row['stop_id'] for row in stop_times} <= stop_ids)
+            self.assertTrue({row['trip_id'] for row in stop_times} <= {row['trip_id'] for row in trips})
+
+    def test_compare_flags_slowdowns_and_throughput_drops(self):
+        baseline = {'1x': {'calibration_s': 0.5, 'closest_departures': {'median_s': 0.1},
+                           'endpoints': {'throughput_rps': 100.0}}}
+        current = {'1x': {'calibration_s': 0.5, 'closest_departures': {'median_s': 0.2},
+                          'endpoints': {'throughput_rps': 50.0}}}
+        regressed = [metric for metric, *_ in compare(current, baseline, tolerance=0.2)]
+        self.assertEqual(regressed, ['1x/closest_departures.median_s', '1x/endpoints.throughput_rps'])
+        self.assertEqual(compare(baseline, baseline, tolerance=0.2), [])
+
+    def test_compare_scales_baselines_to_the_host(self):
+        baseline = {'1x': {'calibration_s': 0.5, 'closest_departures': {'median_s': 0.1},
+                           'endpoints': {'throughput_rps': 100.0}}}
+        # A host half as fast: twice the calibration time, twice the latency, half the throughput
+        slower_host = {'1x': {'calibration_s': 1.0, 'closest_departures': {'median_s': 0.2},
+                              'endpoints': {'throughput_rps': 50.0}}}
+        self.assertEqual(compare(slower_host, baseline, tolerance=0.2), [])
+        faster_host = {'1x': {'calibration_s': 0.25, 'closest_departures': {'median_s': 0.1},
+                              'endpoints': {'throughput_rps': 100.0}}}
+        regressed = [metric for metric, *_ in compare(faster_host, baseline, tolerance=0.2)]
+        self.assertEqual(regressed, ['1x/closest_departures.median_s', '1x/endpoints.throughput_rps'])
+
+    def test_compare_skips_uncalibrated_baselines(self):
+        baseline = {'1x': {'closest_departures': {'median_s': 0.1}}}
+        current = {'1x': {'calibration_s': 0.5, 'closest_departures': {'median_s': 1.0}}}
+        self.assertEqual(compare(current, baseline, tolerance=0.2), [])
+
+    def test_stored_baseline_covers_scale_1(self):
+        with open(DEFAULT_BASELINE, encoding='utf-8') as f:
+            baseline = json.load(f)['1x']
+        for metric in ('calibration_s', 'import_s', 'closest_departures', 'trip_details', 'engines', 'endpoints'):
+            self.assertIn(metric, baseline)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+// Runs frontend/timetable.js in Node against the fixture bundle and compares every query with the
+// API's answer recorded in fixtures/golden.json (see test_timetable_js.py, which also runs this).
+//
+//     node tests/frontend/check_timetable.js
+'use strict';
+
+const assert = require('assert');
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const FIXTURES = path.join(__dirname, 'fixtures');
+const golden = JSON.parse(fs.readFileSync(path.join(FIXTURES, 'golden.json'), 'utf8'));
+
+// The services stamp today's date on every time; pin it to the date the golden answers were made on
+const RealDate = Date;
+class ServiceDate extends RealDate {
+    constructor(...args) {
+        super(...(args.length ? args : [`${golden.service_date}T12:00:00Z`]));
+    }
+}
+
+const context = { self: {}, TextDecoder, Date: ServiceDate };
+vm.createContext(context);
+vm.runInContext(fs.readFileSync(path.join(__dirname, '..', '..', 'frontend', 'timetable.js'), 'utf8'), context);
+
+const data = fs.readFileSync(path.join(FIXTURES, 'timetable.bin'));
+const buffer = data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength);
+const bundle = new context.self.TimetableBundle(buffer, { feed_version: 'fixture' });
+
+let failures = 0;
+for (const { method, args, expected } of golden.queries) {
+    // Results are built in the vm's realm; compare them as plain JSON
+    const actual = JSON.parse(JSON.stringify(bundle[method](args)));
+    try {
+        assert.deepStrictEqual(actual, expected);
+        console.log(`ok ${method} ${JSON.stringify(args)}`);
+    } catch (error) {
+        failures += 1;
+        console.log(`FAIL ${method} ${JSON.stringify(args)}\n${error.message}`);
+    }
+}
+process.exit(failures ? 1 : 0);
@@ -0,0 +1,101 @@
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from public_transport_api import query_engine, static_bundle, timetable_snapshot
+from public_transport_api.services.departures_service import get_closest_departures
+from public_transport_api.services.trips_service import get_trip_details
+from tests.public_transport_api.test_timetable_snapshot import SCHEMA
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+CHECK_SCRIPT = os.path.join(os.path.dirname(__file__), 'check_timetable.js')
+SERVICE_DATE = datetime.date(2025, 4, 2)
+
+# (start coordinates, end coordinates, start time, limit) for closestDepartures
+DEPARTURE_QUERIES = [
+    ('51.1000,17.0300', '51.1200,17.0300', '2025-04-02T08:00:00Z', 5),
+    ('51.1000,17.0300', '51.1200,17.0300', '2025-04-02T08:04:00Z', 5),
+    ('51.1050,17.0300', '51.1200,17.0300', '2025-04-02T08:00:00Z', 1),
+    ('51.1200,17.0300', '51.1000,17.0300', '2025-04-02T08:00:00Z', 5),
+]
+TRIP_QUERIES = ['t1', 't4', 'missing']
+
+
+class _ServiceDate(datetime.date):
+    @classmethod
+    def today(cls):
+        return SERVICE_DATE
+
+
+def _coordinates(value):
+    lat, lon = map(float, value.split(','))
+    return lat, lon
+
+
+def build_fixtures(output_dir):
+    """Writes timetable.bin and golden.json: the bundle of the SCHEMA feed and the API's answers on it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'trips.sqlite')
+        conn = sqlite3.connect(db_path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        snapshot_path = os.path.join(tmp, 'trips.timetable')
+        timetable_snapshot.export(db_path, snapshot_path)
+        manifest = static_bundle.build(snapshot_path, os.path.join(tmp, 'bundle'))
+        shutil.copyfile(os.path.join(tmp, 'bundle', manifest['file']), os.path.join(output_dir, 'timetable.bin'))
+
+        queries = []
+        query_engine.configure(query_engine.SQLiteEngine(db_path))
+        try:
+            with patch('datetime.date', _ServiceDate):
+                for start, end, start_time, limit in DEPARTURE_QUERIES:
+                    (start_lat, start_lon), (end_lat, end_lon) = _coordinates(start), _coordinates(end)
+                    queries.append({
+                        'method': 'closestDepartures',
+                        'args': {'startLat': start_lat, 'startLon': start_lon, 'endLat': end_lat, 'endLon': end_lon,
+                                 'startTime': start_time, 'limit': limit},
+                        'expected': get_closest_departures(start, end, start_time, limit),
+                    })
+                for trip_id in TRIP_QUERIES:
+                    queries.append({'method': 'tripDetails', 'args': trip_id, 'expected': get_trip_details(trip_id)})
+        finally:
+            query_engine.configure(None)
+
+    with open(os.path.join(output_dir, 'golden.json'), 'w', encoding='utf-8') as f:
+        json.dump({'service_date': SERVICE_DATE.isoformat(), 'queries': queries}, f, indent=2)
+        f.write('\n')
+
+
+class TestTimetableJs(unittest.TestCase):
+    def test_fixtures_are_current(self):
+        # Rebuild with: python -m tests.frontend.test_timetable_js --update
+        with tempfile.TemporaryDirectory() as tmp:
+            build_fixtures(tmp)
+            for name in ('timetable.bin', 'golden.json'):
+                with open(os.path.join(tmp, name), 'rb') as built, open(os.path.join(FIXTURES, name), 'rb') as stored:
+                    self.assertEqual(built.read(), stored.read(), f'{name} is out of date')
+
+    def test_golden_answers_are_not_empty(self):
+        with open(os.path.join(FIXTURES, 'golden.json'), encoding='utf-8') as f:
+            queries = json.load(f)['queries']
+        self.assertTrue(queries[0]['expected'])
+        self.assertIsNone(queries[-1]['expected'])
+
+    @unittest.skipIf(shutil.which('node') is None, 'Node.js is not installed')
+    def test_timetable_js_answers_like_the_api(self):
+        result = subprocess.run(['node', CHECK_SCRIPT], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--update']:
+        build_fixtures(FIXTURES)
+    else:
+        unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from public_transport_api.controllers.departures_controller import departures_bp
+
+URL = '/public_transport/city/wroclaw/closest_departures?start_coordinates=51.1,17.03&end_coordinates=51.12,17.03'
+
+
+class TestDeparturesController(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(departures_bp)
+        self.client = app.test_client()
+
+    @patch('public_transport_api.controllers.departures_controller.get_departures_in_window')
+    @patch('public_transport_api.controllers.departures_controller.get_closest_departures', return_value=[])
+    def test_timestamps_without_a_time_are_rejected(self, closest, window):
+        for query in ('&start_time=2025-04-02', '&start_time=08:00', '&start_time=',
+                      '&start_time=2025-04-02T08:00:00Z&end_time=2025-04-02'):
+            with self.subTest(query=query):
+                response = self.client.get(URL + query)
+                self.assertEqual(response.status_code, 400)
+        closest.assert_not_called()
+        window.assert_not_called()
+
+    @patch('public_transport_api.controllers.departures_controller.get_closest_departures', return_value=[])
+    def test_timestamps_reach_the_service_as_full_utc_times(self, closest):
+        response = self.client.get(URL + '&start_time=2025-04-02T08:30')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(closest.call_args.args[2][:19], '2025-04-02T08:30:00')
+
+    @patch('public_transport_api.controllers.departures_controller.get_departures_in_window')
+    @patch('public_transport_api.controllers.departures_controller.get_closest_departures', return_value=[])
+    def test_limits_below_one_are_rejected(self, closest, window):
+        for query in ('&limit=0', '&limit=-3', '&limit=0&start_time=2025-04-02T08:00:00Z&end_time=2025-04-02T09:00:00Z'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(URL + query).status_code, 400)
+        closest.assert_not_called()
+        window.assert_not_called()
+
+    @patch('public_transport_api.controllers.departures_controller.get_departures_in_window',
+           return_value={'departures': [], 'next_cursor': None})
+    def test_window_must_end_after_it_starts_and_within_a_day(self, window):
+        for end_time in ('2025-04-02T07:00:00Z', '2025-04-02T08:00:00Z', '2025-04-01T09:00:00Z',
+                         '2025-04-03T08:00:01Z', '2025-04-05T07:00:00Z'):
+            with self.subTest(end_time=end_time):
+                response = self.client.get(URL + '&start_time=2025-04-02T08:00:00Z&end_time=' + end_time)
+                self.assertEqual(response.status_code, 400)
+        window.assert_not_called()
+
+        # Past midnight on the next day is a valid window
+        response = self.client.get(URL + '&start_time=2025-04-02T23:00:00Z&end_time=2025-04-03T01:00:00Z')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(window.call_args.args[2:4], ('2025-04-02T23:00:00Z', '2025-04-03T01:00:00Z'))
+
+    @patch('public_transport_api.controllers.departures_controller.get_closest_departures', return_value=[])
+    def test_services_get_the_callers_coordinates(self, closest):
+        url = ('/public_transport/city/wroclaw/closest_departures?start_coordinates=51.107912,17.038541'
+               '&end_coordinates=51.120049,17.030001&start_time=2025-04-02T08:30:00Z')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Rounding is only for the coalescing key; the nearest stops are found from the exact point
+        self.assertEqual(closest.call_args.args[:2], ('51.107912,17.038541', '51.120049,17.030001'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from public_transport_api import compression
+from public_transport_api.controllers.trips_controller import trips_bp
+
+URL = '/public_transport/city/wroclaw/trip/'
+
+
+class TestTripsController(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        compression.init_app(app)
+        app.register_blueprint(trips_bp)
+        self.client = app.test_client()
+
+    @patch('public_transport_api.controllers.trips_controller.get_trip_details', return_value=None)
+    def test_unknown_trip_is_not_found(self, trip_details):
+        response = self.client.get(URL + 'missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {'error': 'Trip not found'})
+        trip_details.assert_called_once_with('missing')
+
+    @patch('public_transport_api.controllers.trips_controller.get_trip_details',
+           return_value={'trip_id': 't1', 'route_id': 'A', 'trip_headsign': 'North', 'stops': []})
+    def test_known_trip_is_returned(self, trip_details):
+        response = self.client.get(URL + 't1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['trip_id'], 't1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import contextlib
+import datetime
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+import setup_database
+from benchmarks.synthetic_feed import generate_feed
+from public_transport_api.controllers.blocks_controller import blocks_bp
+from public_transport_api.query_engine import DataUnavailable
+from public_transport_api.services.blocks_service import get_block
+
+_connect = sqlite3.connect
+
+
+def _blocks_database(*args, **kwargs):
+    conn = _connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE calendar (service_id TEXT, monday TEXT, tuesday TEXT, wednesday TEXT, thursday TEXT,
+                               friday TEXT, saturday TEXT, sunday TEXT, start_date TEXT, end_date TEXT);
+        CREATE TABLE calendar_dates (service_id TEXT, date TEXT, exception_type TEXT);
+        CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT, direction_id TEXT,
+                            brigade_id TEXT, vehicle_id TEXT);
+        CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT,
+                                 stop_sequence TEXT);
+        INSERT INTO calendar VALUES ('3', '0', '0', '0', '0', '0', '1', '0', '20250322', '20250406'),
+                                    ('6', '1', '1', '1', '1', '0', '0', '0', '20250322', '20250406');
+        INSERT INTO calendar_dates VALUES ('6', '20250329', '1');
+        INSERT INTO trips VALUES ('A', '3', '3_2', 'KOSZAROWA (Szpital)', '1', '21', '1'),
+                                 ('A', '3', '3_1', 'KRZYKI', '0', '21', '1'),
+                                 ('A', '6', '6_1', 'KRZYKI', '0', '21', '2'),
+                                 ('A', '3', '3_3', 'KRZYKI', '0', '22', '3');
+        INSERT INTO stop_times VALUES ('3_1', '8:00:00', '8:00:00', '1', '1'), ('3_1', '08:40:00', '08:40:00', '2', '2'),
+                                      ('3_2', '08:50:00', '08:50:00', '2', '1'), ('3_2', '24:10:00', '24:10:00', '1', '2'),
+                                      ('6_1', '12:00:00', '12:00:00', '1', '1'), ('6_1', '12:30:00', '12:30:00', '2', '2'),
+                                      ('3_3', '09:00:00', '09:00:00', '1', '1');
+    """)
+    setup_database.build_block_index(conn.cursor())
+    return conn
+
+
+class TestGetBlock(unittest.TestCase):
+    def test_reimporting_a_feed_keeps_one_row_per_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gtfs_dir = os.path.join(tmp, 'feed')
+            generate_feed(gtfs_dir, scale=0.02, seed=3)
+            db_path = os.path.join(tmp, 'trips.sqlite')
+            blocks = []
+            for _ in range(2):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    setup_database.main(db_path, gtfs_dir, validate=False)
+                conn = _connect(db_path)
+                try:
+                    blocks.append(conn.execute("""
+                        SELECT route_id, brigade_id, service_id, block_seq, trip_id FROM blocks
+                        ORDER BY route_id, brigade_id, service_id, block_seq
+                    """).fetchall())
+                    trips = conn.execute("SELECT COUNT(*) FROM trips WHERE brigade_id != ''").fetchone()[0]
+                finally:
+                    conn.close()
+        self.assertEqual(blocks[1], blocks[0])
+        self.assertEqual(len(blocks[1]), trips)
+        self.assertEqual(len({row[4] for row in blocks[1]}), trips)
+
+    def test_a_repeated_trips_row_is_indexed_once(self):
+        with patch('builtins.print'):
+            conn = _blocks_database()
+            conn.execute("INSERT INTO trips VALUES ('A', '3', '3_1', 'KRZYKI', '0', '21', '1')")
+            setup_database.build_block_index(conn.cursor())
+        rows = conn.execute("""
+            SELECT trip_id FROM blocks WHERE route_id = 'A' AND brigade_id = '21' AND service_id = '3'
+            ORDER BY block_seq
+        """).fetchall()
+        self.assertEqual(rows, [('3_1',), ('3_2',)])
+
+    def test_block_index_orders_trips_by_first_departure(self):
+        with patch('builtins.print'):
+            conn = _blocks_database()
+        rows = conn.execute("""
+            SELECT trip_id, first_departure, last_arrival FROM blocks
+            WHERE route_id = 'A' AND brigade_id = '21' AND service_id = '3' ORDER BY block_seq
+        """).fetchall()
+        self.assertEqual(rows, [('3_1', 8 * 3600, 8 * 3600 + 40 * 60), ('3_2', 8 * 3600 + 50 * 60, 24 * 3600 + 600)])
+
+    @patch('builtins.print')
+    @patch('public_transport_api.services.blocks_service.sqlite3.connect', side_effect=_blocks_database)
+    def test_get_block_returns_the_vehicle_day(self, mock_connect, mock_print):
+        block = get_block('A', '21', datetime.date(2025, 3, 22))
+        self.assertEqual([trip['trip_id'] for trip in block['trips']], ['3_1', '3_2'])
+        self.assertEqual(block['service_ids'], ['3'])
+        self.assertEqual(block['first_departure'], '2025-03-22T08:00:00Z')
+        # Past-midnight arrivals roll over into the next calendar day
+        self.assertEqual(block['last_arrival'], '2025-03-23T00:10:00Z')
+
+    @patch('builtins.print')
+    @patch('public_transport_api.services.blocks_service.sqlite3.connect', side_effect=_blocks_database)
+    def test_get_block_applies_calendar_exceptions(self, mock_connect, mock_print):
+        block = get_block('A', '21', datetime.date(2025, 3, 29))
+        self.assertEqual([trip['trip_id'] for trip in block['trips']], ['3_1', '3_2', '6_1'])
+        self.assertEqual(block['service_ids'], ['3', '6'])
+
+    @patch('builtins.print')
+    @patch('public_transport_api.services.blocks_service.sqlite3.connect', side_effect=_blocks_database)
+    def test_get_block_not_running(self, mock_connect, mock_print):
+        self.assertIsNone(get_block('A', '21', datetime.date(2025, 3, 23)))
+        self.assertIsNone(get_block('A', '99', datetime.date(2025, 3, 22)))
+
+    @patch('public_transport_api.services.blocks_service.sqlite3.connect',
+           side_effect=lambda *args, **kwargs: _connect(':memory:'))
+    def test_missing_block_index_is_unavailable(self, mock_connect):
+        with self.assertLogs('public_transport_api.services.blocks_service', 'WARNING'):
+            with self.assertRaises(DataUnavailable):
+                get_block('A', '21', datetime.date(2025, 3, 22))
+
+        app = Flask(__name__)
+        app.register_blueprint(blocks_bp)
+        with self.assertLogs('public_transport_api.services.blocks_service', 'WARNING'):
+            response = app.test_client().get('/public_transport/city/wroclaw/blocks/A/21?date=2025-03-22')
+        self.assertEqual(response.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,58 +1,50 @@
+import sqlite3
 import unittest
 from unittest.mock import patch, MagicMock
-from public_transport_api.services.departures_service import get_closest_departures
+from public_transport_api.instrumentation import SERVICE_ERRORS
+from public_transport_api.services.departures_service import (_pareto_front, get_closest_departures,
+                                                              get_departures_in_window)
 
 
-class TestDeparturesService(unittest.TestCase):
-    @patch('public_transport_api.services.departures_service.sqlite3.connect')
-    def test_get_closest_departures_success(self, mock_connect):
-        # Mock connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_connect.return_value = mock_conn
-        mock_conn.cursor.return_value = mock_cursor
-        mock_conn.row_factory = None
+_connect = sqlite3.connect
 
-        # Mock stops within 1km
-        mock_cursor.fetchall.side_effect = [
-            [
-                {'stop_id': 'stop1', 'stop_name': 'Stop 1', 'stop_lat': 51.1, 'stop_lon': 17.03},
-                {'stop_id': 'stop2', 'stop_name': 'Stop 2', 'stop_lat': 51.11, 'stop_lon': 17.04}
-            ],
-            # Mock departures for stop1
-            [
-                {'trip_id': 'tripA', 'departure_time': '08:30:00', 'route_id': 'A', 'trip_headsign': 'HeadA'}
-            ],
-            # Mock departures for stop2
-            [
-                {'trip_id': 'tripB', 'departure_time': '08:35:00', 'route_id': 'B', 'trip_headsign': 'HeadB'}
-            ],
-            # Mock trip stops for tripA
-            [
-                {'stop_id': 'stop1', 'stop_lat': 51.1, 'stop_lon': 17.03},
-                {'stop_id': 'stop2', 'stop_lat': 51.11, 'stop_lon': 17.04}
-            ],
-            # Mock trip stops for tripB
-            [
-                {'stop_id': 'stop2', 'stop_lat': 51.11, 'stop_lon': 17.04},
-                {'stop_id': 'stop1', 'stop_lat': 51.1, 'stop_lon': 17.03}
-            ]
-        ]
 
-        # Call the function
-        result = get_closest_departures('51.1000,17.0300', '51.1100,17.0400', '2025-04-02T08:30:00Z', limit=2)
-        # Check result format and content
-        self.assertIsInstance(result, list)
-        self.assertGreaterEqual(len(result), 1)
+def _window_database(*args, **kwargs):
+    conn = _connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat TEXT, stop_lon TEXT);
+        CREATE TABLE trips (route_id TEXT, trip_id TEXT, trip_headsign TEXT, variant_id TEXT);
+        CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence TEXT);
+        INSERT INTO stops VALUES ('near', 'Near', '51.1000', '17.0300'), ('far', 'Far', '51.1050', '17.0300'),
+                                 ('dest', 'Dest', '51.1200', '17.0300');
+        INSERT INTO trips VALUES ('A', 't1', 'North', 'v1'), ('A', 't2', 'North', 'v1'),
+                                 ('A', 't3', 'North', 'v1'), ('B', 't4', 'South', 'v2');
+        INSERT INTO stop_times VALUES
+            ('t1', '08:00:00', '08:00:00', 'far', '1'), ('t1', '08:03:00', '08:03:00', 'near', '2'),
+            ('t1', '08:10:00', '08:10:00', 'dest', '3'),
+            ('t2', '08:20:00', '08:20:00', 'far', '1'), ('t2', '08:23:00', '08:23:00', 'near', '2'),
+            ('t2', '08:30:00', '08:30:00', 'dest', '3'),
+            ('t3', '09:30:00', '09:30:00', 'far', '1'), ('t3', '09:33:00', '09:33:00', 'near', '2'),
+            ('t3', '09:40:00', '09:40:00', 'dest', '3'),
+            ('t4', '08:05:00', '08:05:00', 'dest', '1'), ('t4', '08:15:00', '08:15:00', 'near', '2');
+    """)
+    return conn
+
+
+class TestDeparturesService(unittest.TestCase):
+    @patch('public_transport_api.services.departures_service.sqlite3.connect', side_effect=_window_database)
+    def test_get_closest_departures_success(self, mock_connect):
+        result = get_closest_departures('51.1000,17.0300', '51.1200,17.0300', '2025-04-02T08:00:00Z', limit=2)
+        # t4 heads away from the destination; results are ordered by walking distance, so the limit keeps the
+        # boardings at Near and cuts t1 and t2 at Far (nothing is dropped as dominated here)
+        self.assertEqual([(dep['trip_id'], dep['stop']['name']) for dep in result], [('t1', 'Near'), ('t2', 'Near')])
         for dep in result:
-            self.assertIn('trip_id', dep)
             self.assertIn('route_id', dep)
             self.assertIn('trip_headsign', dep)
-            self.assertIn('stop', dep)
-            self.assertIn('name', dep['stop'])
             self.assertIn('coordinates', dep['stop'])
-            self.assertIn('departure_time', dep['stop'])
             self.assertTrue(dep['stop']['departure_time'].endswith('Z'))
+        # Closest departures are stamped with today's date
+        self.assertTrue(result[0]['stop']['departure_time'].endswith('T08:03:00Z'))
 
     @patch('public_transport_api.services.departures_service.sqlite3.connect')
     def test_get_closest_departures_no_stops(self, mock_connect):
@@ -74,8 +66,63 @@ class TestDeparturesService(unittest.TestCase):
     @patch('public_transport_api.services.departures_service.sqlite3.connect')
     def test_get_closest_departures_db_error(self, mock_connect):
         mock_connect.side_effect = Exception('DB error')
-        result = get_closest_departures('51.1000,17.0300', '51.1100,17.0400', '2025-04-02T08:30:00Z', limit=2)
+        errors = SERVICE_ERRORS.value('closest_departures', 'unexpected')
+        with self.assertLogs('public_transport_api.services.departures_service', 'ERROR') as logs:
+            result = get_closest_departures('51.1000,17.0300', '51.1100,17.0400', '2025-04-02T08:30:00Z', limit=2)
         self.assertEqual(result, [])
+        self.assertIn('DB error', logs.output[0])
+        self.assertEqual(SERVICE_ERRORS.value('closest_departures', 'unexpected'), errors + 1)
+
+
+class TestDeparturesInWindow(unittest.TestCase):
+    @patch('public_transport_api.services.departures_service.sqlite3.connect', side_effect=_window_database)
+    def test_window_returns_pareto_set_in_direction(self, mock_connect):
+        result = get_departures_in_window('51.1000,17.0300', '51.1200,17.0300',
+                                          '2025-04-02T08:00:00Z', '2025-04-02T09:00:00Z', limit=10)
+        trips = [(dep['trip_id'], dep['stop']['name']) for dep in result['departures']]
+        # Boarding earlier at the farther stop is dominated; t3 is outside the window; t4 heads away
+        self.assertEqual(trips, [('t1', 'Near'), ('t2', 'Near')])
+        self.assertEqual(result['departures'][0]['stop']['departure_time'], '2025-04-02T08:03:00Z')
+        self.assertIsNone(result['next_cursor'])
+
+    @patch('public_transport_api.services.departures_service.sqlite3.connect', side_effect=_window_database)
+    def test_window_pagination_with_cursor(self, mock_connect):
+        first = get_departures_in_window('51.1000,17.0300', '51.1200,17.0300',
+                                         '2025-04-02T08:00:00Z', '2025-04-02T10:00:00Z', limit=2)
+        self.assertEqual([dep['trip_id'] for dep in first['departures']], ['t1', 't2'])
+        self.assertIsNotNone(first['next_cursor'])
+        second = get_departures_in_window('51.1000,17.0300', '51.1200,17.0300',
+                                          '2025-04-02T08:00:00Z', '2025-04-02T10:00:00Z', limit=2,
+                                          page_cursor=first['next_cursor'])
+        self.assertEqual([dep['trip_id'] for dep in second['departures']], ['t3'])
+        self.assertIsNone(second['next_cursor'])
+
+    @patch('public_transport_api.services.departures_service.sqlite3.connect', side_effect=_window_database)
+    def test_window_invalid_cursor(self, mock_connect):
+        result = get_departures_in_window('51.1000,17.0300', '51.1200,17.0300',
+                                          '2025-04-02T08:00:00Z', '2025-04-02T09:00:00Z', page_cursor='???')
+        self.assertEqual(result, {'departures': [], 'next_cursor': None})
+
+    @patch('public_transport_api.services.departures_service.sqlite3.connect', side_effect=_window_database)
+    def test_window_ending_on_the_next_day_runs_past_midnight(self, mock_connect):
+        result = get_departures_in_window('51.1000,17.0300', '51.1200,17.0300',
+                                          '2025-04-02T09:00:00Z', '2025-04-03T00:30:00Z', limit=10)
+        self.assertEqual([dep['trip_id'] for dep in result['departures']], ['t3'])
+        # The same clock times on one date are an empty window, not a past-midnight one
+        result = get_departures_in_window('51.1000,17.0300', '51.1200,17.0300',
+                                          '2025-04-02T09:00:00Z', '2025-04-02T00:30:00Z', limit=10)
+        self.assertEqual(result['departures'], [])
+
+    def test_pareto_front_is_per_trip(self):
+        options = [
+            {'trip_id': 't1', 'departure_time': '08:00:00', 'distance': 500.0},
+            {'trip_id': 't1', 'departure_time': '08:03:00', 'distance': 100.0},
+            {'trip_id': 't1', 'departure_time': '08:01:00', 'distance': 50.0},
+            {'trip_id': 't2', 'departure_time': '07:50:00', 'distance': 900.0},
+        ]
+        front = sorted((o['trip_id'], o['departure_time']) for o in _pareto_front(options))
+        # t1 at 08:00 is dominated by its own later, closer boardings; t2 is another vehicle and stays
+        self.assertEqual(front, [('t1', '08:01:00'), ('t1', '08:03:00'), ('t2', '07:50:00')])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from public_transport_api import analytics
+from public_transport_api.controllers.stats_controller import stats_bp
+from public_transport_api.query_engine import DataUnavailable
+from public_transport_api.services.stats_service import get_line_stats, get_lines_summary, get_stop_stats
+from tests.public_transport_api.test_analytics import FEED
+
+_connect = sqlite3.connect
+
+
+def _stats_database(*args, **kwargs):
+    conn = _connect(':memory:')
+    conn.executescript(FEED)
+    analytics.refresh(conn)
+    return conn
+
+
+@patch('public_transport_api.services.stats_service.sqlite3.connect', side_effect=_stats_database)
+class TestStatsService(unittest.TestCase):
+    def test_lines_summary(self, mock_connect):
+        lines = get_lines_summary()
+        self.assertEqual([(line['route_id'], line['direction_id']) for line in lines], [('A', '0'), ('A', '1'), ('D', '0')])
+        self.assertEqual(lines[0]['first_departure'], '08:00:00')
+        self.assertEqual(lines[0]['mean_headway_minutes'], 52.5)
+        self.assertEqual(get_lines_summary('4'), [])
+
+    def test_line_stats(self, mock_connect):
+        stats = get_line_stats('A', '3')
+        self.assertEqual(stats['directions'][0]['trips_per_hour'], {'08': 2, '09': 1})
+        self.assertEqual(stats['directions'][1]['first_departure'], '25:00:00')
+        self.assertIsNone(get_line_stats('X'))
+
+    def test_stop_stats(self, mock_connect):
+        stats = get_stop_stats('1')
+        self.assertEqual([line['route_id'] for line in stats['lines']], ['A', 'D'])
+        self.assertEqual(stats['lines'][0]['max_gap_minutes'], 90.0)
+        self.assertIsNone(get_stop_stats('missing'))
+
+    def test_missing_statistics_are_unavailable(self, mock_connect):
+        mock_connect.side_effect = lambda *args, **kwargs: _connect(':memory:')
+        with self.assertLogs('public_transport_api.services.stats_service', 'WARNING'):
+            with self.assertRaises(DataUnavailable):
+                get_lines_summary()
+
+        app = Flask(__name__)
+        app.register_blueprint(stats_bp)
+        client = app.test_client()
+        for url in ('/stats', '/stats/lines/A', '/stats/stops/1'):
+            with self.subTest(url=url), self.assertLogs('public_transport_api.services.stats_service', 'WARNING'):
+                response = client.get('/public_transport/city/wroclaw' + url)
+                self.assertEqual(response.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,39 @@
+import sqlite3
 import unittest
 from unittest.mock import patch
 
+from public_transport_api.services.trips_service import get_trip_details
 
+_connect = sqlite3.connect
+
+
+def _trips_database(*args, **kwargs):
+    conn = _connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat TEXT, stop_lon TEXT);
+        CREATE TABLE trips (route_id TEXT, trip_id TEXT, trip_headsign TEXT);
+        CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence TEXT);
+        INSERT INTO stops VALUES ('1', 'Plac Grunwaldzki', '51.1092', '17.0415'), ('2', 'Renoma', '51.1040', '17.0280');
+        INSERT INTO trips VALUES ('A', '3_14613060', 'KRZYKI');
+        INSERT INTO stop_times VALUES ('3_14613060', '08:39:00', '08:40:00', '2', '10'),
+                                      ('3_14613060', '08:34:00', '08:35:00', '1', '9');
+    """)
+    return conn
 
 
 class TestGetTripDetails(unittest.TestCase):
-    # TODO replace with actual tests implementation
-    @patch('public_transport_api.services.trips_service.sqlite3.connect')
+    @patch('public_transport_api.query_engine.sqlite3.connect', side_effect=_trips_database)
     def test_get_trip_details_success(self, mock_connect):
-        pass
+        result = get_trip_details('3_14613060')
+        self.assertEqual(result['route_id'], 'A')
+        self.assertEqual(result['trip_headsign'], 'KRZYKI')
+        self.assertEqual([stop['name'] for stop in result['stops']], ['Plac Grunwaldzki', 'Renoma'])
+        self.assertEqual(result['stops'][0]['coordinates'], {'latitude': 51.1092, 'longitude': 17.0415})
+        self.assertTrue(result['stops'][0]['departure_time'].endswith('T08:35:00Z'))
+
+    @patch('public_transport_api.query_engine.sqlite3.connect', side_effect=_trips_database)
+    def test_get_trip_details_not_found(self, mock_connect):
+        self.assertIsNone(get_trip_details('missing'))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from unittest.mock import patch
+
+from flask import Flask
+
+from public_transport_api import admission
+from public_transport_api.controllers.departures_controller import departures_bp
+from public_transport_api.admission import AdmissionController, Overloaded, SingleFlight
+
+
+class TestAdmission(unittest.TestCase):
+    def test_single_flight_shares_one_computation(self):
+        flights = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return ['departure']
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flights.do, 'key', compute) for _ in range(5)]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result == ['departure'] for result, _ in results))
+        self.assertEqual(sum(shared for _, shared in results), 4)
+
+    def test_single_flight_propagates_errors(self):
+        def fail():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            SingleFlight().do('key', fail)
+
+    def test_controller_sheds_when_slots_and_queue_are_full(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        busy = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            busy.set()
+            release.wait(2)
+
+        worker = threading.Thread(target=controller.run, args=(slow,))
+        worker.start()
+        busy.wait(2)
+        with self.assertRaises(Overloaded):
+            controller.run(lambda: None)
+        release.set()
+        worker.join()
+        self.assertEqual(controller.shed, 1)
+        self.assertEqual(controller.run(lambda: 'ok'), 'ok')
+
+    def test_controller_stops_queueing_when_slo_is_breached(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, latency_slo=0.01)
+        controller._latencies.extend([0.5] * 50)
+        self.assertTrue(controller.slo_breached())
+        busy = threading.Event()
+        release = threading.Event()
+        worker = threading.Thread(target=controller.run, args=(lambda: (busy.set(), release.wait(2)),))
+        worker.start()
+        busy.wait(2)
+        with self.assertRaises(Overloaded):
+            controller.run(lambda: None)
+        release.set()
+        worker.join()
+
+    def test_overloaded_becomes_503_with_retry_after(self):
+        app = Flask(__name__)
+        app.config['ADMISSION_RETRY_AFTER'] = 3
+        admission.init_app(app)
+
+        @app.route('/shed')
+        def shed():
+            raise Overloaded(3)
+
+        response = app.test_client().get('/shed')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '3')
+
+    def test_normalization(self):
+        self.assertEqual(admission.normalize_coordinates('51.107912,17.038541'), '51.1079,17.0385')
+        self.assertEqual(admission.normalize_coordinates('invalid'), 'invalid')
+
+    def test_identical_concurrent_requests_take_one_admission_slot(self):
+        app = Flask(__name__)
+        app.config.update(ADMISSION_MAX_CONCURRENT=1, ADMISSION_MAX_QUEUE=0)
+        controller = admission.init_app(app)
+        app.register_blueprint(departures_bp)
+        calls = []
+        entered = threading.Event()
+        release = threading.Event()
+
+        def closest_departures(*args):
+            calls.append(args)
+            entered.set()
+            release.wait(2)
+            return [{'trip_id': 't1'}]
+
+        url = ('/public_transport/city/wroclaw/closest_departures?start_coordinates=51.1,17.03'
+               '&end_coordinates=51.12,17.03&start_time=2025-04-02T08:30:45Z')
+        with patch('public_transport_api.controllers.departures_controller.get_closest_departures',
+                   side_effect=closest_departures):
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                futures = [pool.submit(lambda: app.test_client().get(url)) for _ in range(6)]
+                entered.wait(2)
+                time.sleep(0.2)
+                release.set()
+                responses = [future.result() for future in futures]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 6)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(controller.shed, 0)
+        # The exact start time reaches the service, seconds included
+        self.assertEqual(calls[0][2], '2025-04-02T08:30:45Z')
+
+    def test_a_shed_leader_sheds_its_followers(self):
+        app = Flask(__name__)
+        controller = admission.init_app(app)
+
+        def shed():
+            raise Overloaded(1)
+
+        with app.app_context(), patch.object(controller, 'run', side_effect=lambda fn: shed()):
+            with self.assertRaises(Overloaded):
+                admission.coalesce('key', lambda: 'never')
+
+
+if __name__ == '__main__':
+    unittest.main()
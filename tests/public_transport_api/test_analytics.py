@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import setup_database
+from benchmarks.synthetic_feed import generate_feed
+from public_transport_api import analytics
+
+FEED = """
+    CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, direction_id TEXT);
+    CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence TEXT);
+    INSERT INTO trips VALUES ('A', '3', 'A1', '0'), ('A', '3', 'A2', '0'), ('A', '3', 'A3', '0'), ('A', '3', 'A4', '1'),
+                             ('D', '3', 'D1', '0');
+    INSERT INTO stop_times VALUES
+        ('A1', '08:00:00', '08:00:00', '1', '1'), ('A1', '08:10:00', '08:10:00', '2', '2'),
+        ('A2', '08:15:00', '08:15:00', '1', '1'), ('A2', '08:25:00', '08:25:00', '2', '2'),
+        ('A3', '09:45:00', '09:45:00', '1', '1'), ('A3', '09:55:00', '09:55:00', '2', '2'),
+        ('A4', '25:00:00', '25:00:00', '2', '1'),
+        ('D1', '10:00:00', '10:00:00', '1', '1');
+"""
+
+
+def _database():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(FEED)
+    return conn
+
+
+class TestAnalytics(unittest.TestCase):
+    def test_line_statistics(self):
+        conn = _database()
+        analytics.refresh(conn)
+        line = conn.execute("SELECT * FROM stats_lines WHERE route_id = 'A' AND direction_id = '0'").fetchone()
+        # 3 trips leaving the first stop at 08:00, 08:15 and 09:45
+        self.assertEqual(line, ('A', '3', '0', 3, 8 * 3600, 9 * 3600 + 45 * 60, 52.5 * 60, 90 * 60, 2))
+        hours = conn.execute("""
+            SELECT hour, trips FROM stats_line_hours WHERE route_id = 'A' AND direction_id = '0' ORDER BY hour
+        """).fetchall()
+        self.assertEqual(hours, [(8, 2), (9, 1)])
+        single = conn.execute("SELECT mean_headway, max_headway FROM stats_lines WHERE route_id = 'D'").fetchone()
+        self.assertEqual(single, (None, None))
+
+    def test_stop_statistics(self):
+        conn = _database()
+        analytics.refresh(conn)
+        stop = conn.execute("SELECT * FROM stats_stops WHERE stop_id = '1' AND route_id = 'A'").fetchone()
+        self.assertEqual(stop, ('1', 'A', '3', 3, 8 * 3600, 9 * 3600 + 45 * 60, 90 * 60, 2))
+        # Trips A1-A3 end at stop 2, so only A4, which has no other stop, departs from it
+        stop = conn.execute("SELECT * FROM stats_stops WHERE stop_id = '2' AND route_id = 'A'").fetchone()
+        self.assertEqual(stop, ('2', 'A', '3', 1, 25 * 3600, 25 * 3600, None, 1))
+
+    def test_last_stop_is_ordered_by_stop_sequence(self):
+        conn = _database()
+        conn.execute("INSERT INTO trips VALUES ('E', '3', 'E1', '0')")
+        conn.executemany("INSERT INTO stop_times VALUES ('E1', ?, ?, ?, ?)", [
+            ('11:20:00', '11:20:00', '3', '10'), ('11:00:00', '11:00:00', '1', '2'), ('11:10:00', '11:10:00', '2', '9')])
+        analytics.refresh(conn)
+        stops = conn.execute("SELECT stop_id FROM stats_stops WHERE route_id = 'E' ORDER BY stop_id").fetchall()
+        self.assertEqual(stops, [('1',), ('2',)])
+
+    def test_python_and_numpy_aggregations_agree(self):
+        np = analytics._load_numpy()
+        if np is None:
+            self.skipTest("NumPy is not installed")
+        keys = [2, 0, 1, 0, 2, 2, 0]
+        times = [30000, 100, 7300, 3700, 90000, 200000, 50]
+        self.assertEqual(analytics.group_stats(keys, times, 3, hourly=True, np=np),
+                         analytics.group_stats(keys, times, 3, hourly=True))
+
+    def test_refresh_only_recomputes_changed_routes(self):
+        conn = _database()
+        self.assertEqual(analytics.refresh(conn), {'changed': 2, 'removed': 0, 'unchanged': 0})
+        self.assertEqual(analytics.refresh(conn), {'changed': 0, 'removed': 0, 'unchanged': 2})
+
+        conn.execute("UPDATE stop_times SET departure_time = '10:30:00' WHERE trip_id = 'D1'")
+        conn.execute("DELETE FROM trips WHERE route_id = 'A'")
+        self.assertEqual(analytics.refresh(conn, use_numpy=False), {'changed': 1, 'removed': 1, 'unchanged': 0})
+        self.assertEqual(conn.execute("SELECT first_departure FROM stats_lines WHERE route_id = 'D'").fetchone(),
+                         (10 * 3600 + 30 * 60,))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM stats_stops WHERE route_id = 'A'").fetchone(), (0,))
+
+
+_refresh = analytics.refresh
+
+
+class TestStatsOnReimport(unittest.TestCase):
+    def test_importing_the_same_feed_again_keeps_every_route(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gtfs_dir = os.path.join(tmp, 'feed')
+            generate_feed(gtfs_dir, scale=0.02, seed=3)
+            db_path = os.path.join(tmp, 'trips.sqlite')
+
+            def import_feed():
+                refreshes = []
+
+                def refresh(conn):
+                    refreshes.append(_refresh(conn))
+                    return refreshes[-1]
+
+                with contextlib.redirect_stdout(io.StringIO()), \
+                        patch('setup_database.analytics.refresh', side_effect=refresh):
+                    setup_database.main(db_path, gtfs_dir, validate=False)
+                conn = sqlite3.connect(db_path)
+                try:
+                    return ([conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                             for table in ('trips', 'stop_times') + analytics.STATS_TABLES],
+                            conn.execute("SELECT SUM(departures) FROM stats_stops").fetchone()[0],
+                            refreshes[0])
+                finally:
+                    conn.close()
+
+            counts, departures, first = import_feed()
+            counts_again, departures_again, second = import_feed()
+            self.assertEqual(counts_again, counts)
+            self.assertEqual(departures_again, departures)
+            self.assertEqual(second, {'changed': 0, 'removed': 0, 'unchanged': first['changed']})
+
+if __name__ == '__main__':
+    unittest.main()
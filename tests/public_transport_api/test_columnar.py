@@ -0,0 +1,96 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from public_transport_api import columnar, timetable_snapshot
+from tests.public_transport_api.test_timetable_snapshot import SCHEMA
+
+CALENDAR = """
+    CREATE TABLE calendar (service_id TEXT, monday TEXT, tuesday TEXT, wednesday TEXT, thursday TEXT, friday TEXT,
+                           saturday TEXT, sunday TEXT, start_date TEXT, end_date TEXT);
+    CREATE TABLE calendar_dates (service_id TEXT, date TEXT, exception_type TEXT);
+    INSERT INTO calendar VALUES ('3', '0', '0', '0', '0', '0', '1', '0', '20250322', '20250406');
+    INSERT INTO trips VALUES ('C', '4', 't5', 'East', '3', 'v3');
+    INSERT INTO stop_times VALUES ('t5', '24:30:00', '24:30:00', 'near', '1'), ('t5', '', '', 'bad', 'x');
+"""
+
+
+@unittest.skipIf(columnar._load_pyarrow() is None, "pyarrow is not installed")
+class TestColumnarExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'trips.sqlite')
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SCHEMA + CALENDAR)
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _export(self, fmt):
+        output = os.path.join(self.tmp.name, fmt)
+        counts = columnar.export(self.db_path, output, fmt, batch_rows=2)
+        return output, counts
+
+    def test_columns_are_typed_and_ids_dictionary_encoded(self):
+        import pyarrow.parquet as pq
+
+        output, counts = self._export('parquet')
+        self.assertEqual(counts['stop_times'], 10)
+        stops = pq.read_table(os.path.join(output, 'stops.parquet'))
+        self.assertEqual(str(stops.schema.field('stop_lat').type), 'double')
+        self.assertEqual(str(stops.schema.field('stop_id').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        calendar = pq.read_table(os.path.join(output, 'calendar.parquet')).to_pylist()
+        self.assertEqual(calendar[0]['start_date'], datetime.date(2025, 3, 22))
+        self.assertTrue(calendar[0]['saturday'])
+        # Empty tables are still written, with their schema
+        self.assertEqual(pq.read_table(os.path.join(output, 'calendar_dates.parquet')).num_rows, 0)
+
+    def test_stop_times_are_partitioned_by_service(self):
+        import pyarrow.dataset as ds
+
+        output, _ = self._export('arrow')
+        self.assertEqual(sorted(os.listdir(os.path.join(output, 'stop_times'))), ['service_id=3', 'service_id=4'])
+        table = ds.dataset(os.path.join(output, 'stop_times'), format='arrow', partitioning='hive').to_table()
+        rows = {(row['trip_id'], row['stop_sequence']): row for row in table.to_pylist()}
+        self.assertEqual(rows[('t1', 2)]['departure_time'], 8 * 3600 + 3 * 60 + 30)
+        self.assertEqual(rows[('t5', 1)]['arrival_time'], 24 * 3600 + 30 * 60)
+        self.assertIsNone(rows[('t5', None)]['arrival_time'])
+
+    def test_unconvertible_values_are_counted(self):
+        with self.assertLogs('public_transport_api.columnar', 'WARNING') as logs:
+            self._export('parquet')
+        self.assertEqual(logs.output, ['WARNING:public_transport_api.columnar:stop_times.stop_sequence: 1 value(s) '
+                                       'of type int32 could not be converted and were written as null'])
+
+    def test_routes_dates_in_both_formats(self):
+        import pyarrow.parquet as pq
+
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE routes (route_id TEXT, route_short_name TEXT, valid_from TEXT, valid_until TEXT);
+            INSERT INTO routes VALUES ('A', 'A', '2025-03-22', '2025-12-31'), ('D', 'D', '20250322', '');
+        """)
+        conn.close()
+        with self.assertLogs('public_transport_api.columnar', 'WARNING') as logs:
+            output, _ = self._export('parquet')
+        self.assertFalse([line for line in logs.output if 'routes.' in line])
+        routes = pq.read_table(os.path.join(output, 'routes.parquet')).to_pylist()
+        self.assertEqual([(route['valid_from'], route['valid_until']) for route in routes],
+                         [(datetime.date(2025, 3, 22), datetime.date(2025, 12, 31)), (datetime.date(2025, 3, 22), None)])
+
+    def test_export_can_replace_the_database_as_snapshot_input(self):
+        for fmt in columnar.FORMATS:
+            output, _ = self._export(fmt)
+            from_db = os.path.join(self.tmp.name, 'db.timetable')
+            from_columnar = os.path.join(self.tmp.name, f'{fmt}.timetable')
+            timetable_snapshot.export(self.db_path, from_db)
+            timetable_snapshot.build(*columnar.timetable_rows(output, batch_rows=3), from_columnar)
+            with open(from_db, 'rb') as a, open(from_columnar, 'rb') as b:
+                self.assertEqual(a.read(), b.read(), fmt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import gzip
+import json
+import tempfile
+import unittest
+
+from flask import Flask, jsonify
+
+from public_transport_api import compression, instrumentation
+
+
+def _create_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    instrumentation.init_app(app)
+    compression.init_app(app)
+    payload = {'stops': [{'name': 'Plac Grunwaldzki', 'arrival_time': f'2025-04-02T08:{i:02d}:00Z'} for i in range(60)]}
+
+    @app.route('/dynamic')
+    def dynamic():
+        return jsonify(payload)
+
+    @app.route('/immutable')
+    @compression.precompressed
+    def immutable():
+        return jsonify(payload)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    return app
+
+
+class TestCompression(unittest.TestCase):
+    def test_gzip_is_negotiated(self):
+        client = _create_app().test_client()
+        response = client.get('/dynamic', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn('compress;dur=', response.headers['Server-Timing'])
+        body = json.loads(gzip.decompress(response.get_data()))
+        self.assertEqual(len(body['stops']), 60)
+
+    def test_identity_without_accept_encoding(self):
+        client = _create_app().test_client()
+        response = client.get('/dynamic', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(len(response.get_json()['stops']), 60)
+
+    def test_small_responses_are_not_compressed(self):
+        client = _create_app().test_client()
+        response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_negotiate_respects_quality_values(self):
+        from werkzeug.datastructures import Accept
+
+        self.assertEqual(compression.negotiate(Accept([('gzip', 1), ('br', 0.5)]), ['br', 'gzip']), 'gzip')
+        self.assertEqual(compression.negotiate(Accept([('br', 1), ('gzip', 1)]), ['br', 'gzip']), 'br')
+        self.assertIsNone(compression.negotiate(Accept([('deflate', 1)]), ['br', 'gzip']))
+
+    def test_precompressed_bodies_are_compressed_once(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            app = _create_app(COMPRESSION_CACHE_DIR=cache_dir)
+            client = app.test_client()
+            original = compression.compress
+            calls = []
+
+            def counting_compress(data, encoding, high=False):
+                calls.append(high)
+                return original(data, encoding, high)
+
+            compression.compress = counting_compress
+            hits = compression.PRECOMPRESSED_LOOKUPS.value('gzip', 'hit')
+            misses = compression.PRECOMPRESSED_LOOKUPS.value('gzip', 'miss')
+            try:
+                first = client.get('/immutable', headers={'Accept-Encoding': 'gzip'}).get_data()
+                second = client.get('/immutable', headers={'Accept-Encoding': 'gzip'}).get_data()
+                # A fresh worker with an empty memory tier reads the body back from disk
+                third = _create_app(COMPRESSION_CACHE_DIR=cache_dir).test_client().get(
+                    '/immutable', headers={'Accept-Encoding': 'gzip'}).get_data()
+            finally:
+                compression.compress = original
+
+            self.assertEqual(calls, [True])
+            self.assertEqual(first, second)
+            self.assertEqual(first, third)
+            self.assertEqual(compression.PRECOMPRESSED_LOOKUPS.value('gzip', 'hit'), hits + 2)
+            self.assertEqual(compression.PRECOMPRESSED_LOOKUPS.value('gzip', 'miss'), misses + 1)
+            self.assertIn('pt_precompressed_lookups_total{encoding="gzip",result="hit"}',
+                          instrumentation.render_metrics())
+
+    def test_matching_etag_is_answered_with_not_modified(self):
+        client = _create_app().test_client()
+        first = client.get('/dynamic', headers={'Accept-Encoding': 'gzip'})
+        etag = first.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        # The ETag names the content, so it is the same whatever the encoding
+        self.assertEqual(client.get('/dynamic', headers={'Accept-Encoding': 'identity'}).headers['ETag'], etag)
+        revalidated = client.get('/dynamic', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.get_data(), b'')
+        self.assertEqual(client.get('/dynamic', headers={'If-None-Match': 'W/"stale"'}).status_code, 200)
+
+    def test_etags_can_be_disabled(self):
+        client = _create_app(COMPRESSION_ETAGS=False).test_client()
+        self.assertNotIn('ETag', client.get('/dynamic').headers)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = compression.PrecompressedCache(max_bytes=10)
+        cache.put('a', 'gzip', b'12345')
+        cache.put('b', 'gzip', b'12345')
+        cache.get('a', 'gzip')
+        cache.put('c', 'gzip', b'12345')
+        self.assertIsNotNone(cache.get('a', 'gzip'))
+        self.assertIsNone(cache.get('b', 'gzip'))
+
+
+if __name__ == '__main__':
+    unittest.main()
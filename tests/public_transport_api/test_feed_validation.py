@@ -0,0 +1,151 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import setup_database
+from benchmarks.synthetic_feed import generate_feed
+from public_transport_api import feed_validation
+
+
+def _append(gtfs_dir, filename, *rows):
+    with open(os.path.join(gtfs_dir, filename), 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(','.join(row) + '\n')
+
+
+class TestFeedValidation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.clean_dir = os.path.join(cls.tmp.name, 'clean')
+        generate_feed(cls.clean_dir, scale=0.02, seed=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.gtfs_dir = shutil.copytree(self.clean_dir, os.path.join(self.tmp.name, self._testMethodName))
+
+    def _checks(self, report):
+        return {(issue['check'], issue['file'], issue.get('column')) for issue in report['errors']}
+
+    def test_clean_feed_is_valid(self):
+        report = feed_validation.validate(self.gtfs_dir)
+        self.assertTrue(report['valid'])
+        self.assertEqual(report['errors'], [])
+        self.assertGreater(report['files']['stop_times.txt']['rows'], 0)
+        json.dumps(report)
+
+    def test_broken_references_are_reported(self):
+        _append(self.gtfs_dir, 'trips.txt', ['R1', '3', 'orphan', 'X', '0', '1', '1', '1', '999999'])
+        _append(self.gtfs_dir, 'control_stops.txt', ['800001', 'no-such-stop'])
+        _append(self.gtfs_dir, 'stop_times.txt', ['orphan', '08:00:00', '08:00:00', 'no-such-stop', '1', '0', '0'])
+        report = feed_validation.validate(self.gtfs_dir)
+        self.assertFalse(report['valid'])
+        self.assertEqual(self._checks(report), {
+            ('foreign_key', 'trips.txt', 'variant_id'),
+            ('foreign_key', 'control_stops.txt', 'stop_id'),
+            ('foreign_key', 'stop_times.txt', 'stop_id'),
+        })
+        variant = next(issue for issue in report['errors'] if issue['column'] == 'variant_id')
+        self.assertEqual(variant['examples'], ['999999'])
+        self.assertEqual(variant['rows'], 1)
+        self.assertEqual(variant['references'], 'variants.txt:variant_id')
+
+    def test_local_checks(self):
+        _append(self.gtfs_dir, 'stops.txt', ['1', '1', 'Duplicate', '51.1', '17.0'], ['bad', '2', 'Bad', 'x', '17.0'])
+        trip_id = 'broken'
+        _append(self.gtfs_dir, 'trips.txt', ['R1', '3', trip_id, 'X', '0', '800001', '1', '1', '800001'])
+        _append(self.gtfs_dir, 'stop_times.txt',
+                [trip_id, '08:00:00', '08:00:00', '1', '1', '0', '0'],
+                [trip_id, '08:05:00', '08:05:00', '2', '1', '0', '0'],
+                [trip_id, '07:55:00', '07:55:00', '3', '2', '0', '0'],
+                [trip_id, '8:61:00', '08:61:00', '3', '3', '0', '0'])
+        report = feed_validation.validate(self.gtfs_dir)
+        self.assertEqual(self._checks(report), {
+            ('primary_key', 'stops.txt', 'stop_id'),
+            ('coordinates', 'stops.txt', 'stop_lat'),
+            ('stop_sequence', 'stop_times.txt', 'stop_sequence'),
+            ('times', 'stop_times.txt', 'arrival_time'),
+        })
+        messages = {issue['message'] for issue in report['errors'] if issue['check'] == 'stop_sequence'}
+        self.assertEqual(messages, {'stop_sequence repeats within a trip', 'times go backwards in stop_sequence order'})
+
+    def test_untimed_stops_are_errors_only_at_the_ends_of_a_trip(self):
+        _append(self.gtfs_dir, 'trips.txt', ['R1', '3', 'untimed', 'X', '0', '800001', '1', '1', '800001'],
+                ['R1', '3', 'open-ended', 'X', '0', '800001', '1', '1', '800001'])
+        _append(self.gtfs_dir, 'stop_times.txt',
+                ['untimed', '08:00:00', '08:00:00', '1', '1', '0', '0'],
+                ['untimed', '', '', '2', '2', '0', '0'],
+                ['untimed', '', '', '3', '3', '0', '0'],
+                ['untimed', '08:09:00', '08:09:00', '1', '4', '0', '0'])
+        report = feed_validation.validate(self.gtfs_dir)
+        self.assertTrue(report['valid'])
+        warning = next(issue for issue in report['warnings'] if issue['check'] == 'times')
+        self.assertEqual((warning['rows'], warning['examples']), (2, ['untimed']))
+
+        # The first and last stop of a trip must have times
+        _append(self.gtfs_dir, 'stop_times.txt',
+                ['open-ended', '', '', '1', '1', '0', '0'],
+                ['open-ended', '08:05:00', '08:05:00', '2', '2', '0', '0'],
+                ['open-ended', '', '', '3', '3', '0', '0'])
+        report = feed_validation.validate(self.gtfs_dir)
+        self.assertEqual(self._checks(report), {('times', 'stop_times.txt', 'arrival_time')})
+        error = report['errors'][0]
+        self.assertEqual((error['rows'], error['examples']), (2, ['open-ended']))
+
+    def test_missing_files_and_columns(self):
+        os.remove(os.path.join(self.gtfs_dir, 'stop_times.txt'))
+        os.remove(os.path.join(self.gtfs_dir, 'agency.txt'))
+        with open(os.path.join(self.gtfs_dir, 'variants.txt'), 'w', encoding='utf-8') as f:
+            f.write('is_main\n1\n')
+        report = feed_validation.validate(self.gtfs_dir)
+        self.assertEqual(self._checks(report), {
+            ('missing_file', 'agency.txt', None),
+            ('columns', 'variants.txt', 'variant_id'),
+        })
+        self.assertEqual([issue['file'] for issue in report['warnings']], ['stop_times.txt'])
+
+    def test_numpy_python_and_parallel_runs_agree(self):
+        _append(self.gtfs_dir, 'trips.txt', ['R1', '3', 'orphan', 'X', '0', '1', '1', '1', '999999'])
+        _append(self.gtfs_dir, 'stop_times.txt', ['orphan', '08:00:00', '07:00:00', '1', '1', '0', '0'],
+                ['orphan', '06:00:00', '06:00:00', '2', '2', '0', '0'])
+        reports = [feed_validation.validate(self.gtfs_dir, workers=workers, use_numpy=use_numpy)
+                   for workers, use_numpy in ((1, True), (1, False), (2, True))]
+        for report in reports:
+            report.pop('elapsed_s')
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(reports[0], reports[2])
+        self.assertFalse(reports[0]['valid'])
+
+    def test_setup_fails_fast_on_an_invalid_feed(self):
+        _append(self.gtfs_dir, 'stop_times.txt', ['missing-trip', '08:00:00', '08:00:00', '1', '1', '0', '0'])
+        db_path = os.path.join(self.gtfs_dir, 'trips.sqlite')
+        with contextlib.redirect_stdout(io.StringIO()), \
+                self.assertRaises(feed_validation.FeedValidationError) as raised:
+            setup_database.main(db_path, self.gtfs_dir)
+        self.assertFalse(os.path.exists(db_path))
+        with open(os.path.join(self.gtfs_dir, 'trips.validation.json'), encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(report, raised.exception.report)
+        self.assertEqual(report['errors'][0]['column'], 'trip_id')
+
+    def test_setup_runs_from_a_checkout_without_the_package_installed(self):
+        # -S leaves site-packages, and with it any installed copy of the package, off the path
+        db_path = os.path.join(self.gtfs_dir, 'trips.sqlite')
+        result = subprocess.run([sys.executable, '-S', os.path.abspath(setup_database.__file__),
+                                 '--database', db_path, '--gtfs-dir', self.gtfs_dir],
+                                cwd=self.gtfs_dir, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('Database setup completed successfully!', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
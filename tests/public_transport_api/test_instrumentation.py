@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from flask import Flask
+
+from public_transport_api import instrumentation
+from public_transport_api.instrumentation import Histogram, RequestTimings, TracedConnection, span
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test.', 'stage', buckets=(0.1, 1.0))
+        histogram.observe('scan', 0.05)
+        histogram.observe('scan', 0.5)
+        histogram.observe('scan', 5.0)
+        rendered = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="scan",le="0.1"} 1', rendered)
+        self.assertIn('test_seconds_bucket{stage="scan",le="1.0"} 2', rendered)
+        self.assertIn('test_seconds_bucket{stage="scan",le="+Inf"} 3', rendered)
+        self.assertIn('test_seconds_count{stage="scan"} 3', rendered)
+
+    def test_span_and_sql_are_recorded_per_request(self):
+        timings = RequestTimings()
+        token = instrumentation._current.set(timings)
+        try:
+            conn = sqlite3.connect(':memory:', factory=TracedConnection)
+            with span('stage'):
+                conn.execute('CREATE TABLE t (x)')
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM t')
+                cursor.fetchall()
+            conn.close()
+        finally:
+            instrumentation._current.reset(token)
+        self.assertIn('stage', timings.spans)
+        self.assertEqual(timings.sql_queries, 2)
+        self.assertIn('desc="2 queries"', timings.server_timing())
+
+    def test_each_statement_is_observed_once_with_its_fetches(self):
+        def count(kind):
+            series = instrumentation.SQL_DURATION._series.get(kind)
+            return 0 if series is None else series['count']
+
+        timings = RequestTimings()
+        token = instrumentation._current.set(timings)
+        try:
+            conn = sqlite3.connect(':memory:', factory=TracedConnection)
+            conn.execute('CREATE TABLE t (x)')
+            conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(5)])
+            before = count('SELECT')
+            cursor = conn.cursor()
+            cursor.execute('SELECT x FROM t')
+            cursor.fetchone()
+            cursor.fetchmany(2)
+            cursor.fetchall()
+            self.assertEqual(count('SELECT'), before + 1)
+            # A statement that is not read to the end is observed when the cursor moves on
+            cursor.execute('SELECT x FROM t')
+            cursor.fetchone()
+            self.assertEqual(count('SELECT'), before + 1)
+            cursor.execute('SELECT x FROM t WHERE x > 2')
+            self.assertEqual(count('SELECT'), before + 2)
+            self.assertEqual(list(cursor), [(3,), (4,)])
+            self.assertEqual(count('SELECT'), before + 3)
+            conn.close()
+        finally:
+            instrumentation._current.reset(token)
+        self.assertGreater(timings.sql_seconds, 0)
+
+    def test_counter_renders_labelled_values(self):
+        counter = instrumentation.Counter('test_total', 'Test.', ('kind', 'result'))
+        counter.inc('a', 'hit')
+        counter.inc('a', 'hit')
+        counter.inc('a', 'miss')
+        self.assertEqual(counter.value('a', 'hit'), 2)
+        rendered = counter.render()
+        self.assertIn('# TYPE test_total counter', rendered)
+        self.assertIn('test_total{kind="a",result="hit"} 2', rendered)
+        self.assertIn('test_total{kind="a",result="miss"} 1', rendered)
+
+    def test_init_app_adds_server_timing_and_metrics(self):
+        app = Flask(__name__)
+        instrumentation.init_app(app)
+
+        @app.route('/work')
+        def work():
+            with span('work.stage'):
+                return 'ok'
+
+        client = app.test_client()
+        response = client.get('/work')
+        self.assertIn('work.stage;dur=', response.headers['Server-Timing'])
+        metrics = client.get('/metrics').get_data(as_text=True)
+        self.assertIn('pt_request_duration_seconds_count{endpoint="work"}', metrics)
+        self.assertIn('pt_span_duration_seconds_count{span="work.stage"}', metrics)
+
+    def test_each_profiled_request_gets_its_own_dump(self):
+        app = Flask(__name__)
+        with tempfile.TemporaryDirectory() as tmp:
+            app.config.update(PROFILING_ENABLED=True, PROFILE_DIR=tmp)
+            instrumentation.init_app(app)
+            app.add_url_rule('/work', 'work', lambda: 'ok')
+
+            client = app.test_client()
+            dumps = [client.get('/work?profile=1').headers['X-Profile-Dump'] for _ in range(3)]
+            # Only the file name reaches the client, never the server's directory
+            self.assertTrue(all(os.path.basename(dump) == dump for dump in dumps))
+            self.assertEqual(sorted(dumps), sorted(os.listdir(tmp)))
+            self.assertEqual(len(set(dumps)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import setup_database
+from benchmarks.synthetic_feed import MAX_LAT, MAX_LON, MIN_LAT, MIN_LON, generate_feed
+from public_transport_api import query_engine, stop_index, timetable_snapshot
+from public_transport_api.services.departures_service import get_closest_departures, get_departures_in_window
+from public_transport_api.services.trips_service import get_trip_details
+from tests.public_transport_api.test_timetable_snapshot import SCHEMA
+
+_connect = sqlite3.connect
+
+# Times as feeds write them: unpadded hours, an empty arrival, an empty departure at the last stop and
+# an untimed intermediate stop
+UNNORMALIZED_ROWS = """
+    INSERT INTO trips VALUES ('B', '3', 't5', 'North', '2', 'v3'), ('B', '3', 't6', 'North', '2', 'v3'),
+                             ('B', '3', 't7', 'North', '2', 'v3');
+    INSERT INTO stop_times VALUES
+        ('t5', '8:40:00', '8:40:00', 'far', '1'), ('t5', '', '8:45:00', 'near', '2'),
+        ('t5', '8:52:00', '', 'dest', '3'),
+        ('t6', '9:55:00', '9:55:00', 'far', '1'), ('t6', '10:00:00', '10:00:00', 'near', '2'),
+        ('t6', '10:07:00', '10:07:00', 'dest', '3'),
+        ('t7', '07:00:00', '07:00:00', 'far', '1'), ('t7', '', '', 'near', '2'),
+        ('t7', '07:10:00', '07:10:00', 'dest', '3');
+"""
+
+
+class _Conformance:
+    """Runs the same queries on every engine; subclasses provide the database in setUpClass."""
+
+    db_path = None
+
+    @classmethod
+    def open_engines(cls, tmp):
+        snapshot_path = os.path.join(tmp, 'trips.timetable')
+        timetable_snapshot.export(cls.db_path, snapshot_path)
+        cls.snapshot = timetable_snapshot.TimetableSnapshot(snapshot_path)
+        cls.engines = [
+            query_engine.SQLiteEngine(cls.db_path),
+            query_engine.MemoryEngine(cls.db_path),
+            query_engine.SnapshotEngine(cls.snapshot),
+        ]
+        conn = _connect(cls.db_path)
+        cls.stop_ids = sorted(row[0] for row in conn.execute("SELECT stop_id FROM stops"))
+        cls.trip_ids = sorted(row[0] for row in conn.execute("SELECT trip_id FROM trips"))
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.snapshot.close()
+        cls.tmp.cleanup()
+
+    def tearDown(self):
+        query_engine.configure(None)
+
+    def assertSameResults(self, query):
+        expected = query(self.engines[0])
+        for engine in self.engines[1:]:
+            with self.subTest(engine=engine.name):
+                self.assertEqual(query(engine), expected)
+        return expected
+
+    def points(self):
+        return [(51.1000, 17.0300), (51.1050, 17.0300), (51.1200, 17.0310)]
+
+    def journey(self):
+        return (51.1000, 17.0300), (51.1200, 17.0310)
+
+    def test_nearby_stops(self):
+        for lat, lon in self.points():
+            for radius in (100, 1000, 5000):
+                self.assertSameResults(lambda engine: engine.nearby_stops(lat, lon, radius))
+
+    def test_nearby_stops_from_the_stop_index(self):
+        index_path = os.path.join(self.tmp.name, 'trips.stops.idx')
+        stop_index.build_snapshot(self.db_path, index_path)
+        index = stop_index.load(index_path)
+        try:
+            lat, lon = self.points()[0]
+            expected = self.engines[1].nearby_stops(lat, lon, 1000)
+            self.assertEqual(index.within(lat, lon, 1000), expected)
+        finally:
+            index.close()
+            stop_index._loaded = None
+
+    def test_stop_departures(self):
+        for stop_id in self.stop_ids + ['missing']:
+            self.assertSameResults(lambda engine: engine.stop_departures(stop_id, '08:00:00'))
+            self.assertSameResults(lambda engine: engine.stop_departures(stop_id, '08:10:00', '09:00:00', limit=3))
+
+    def test_trips(self):
+        for trip_id in self.trip_ids + ['missing']:
+            self.assertSameResults(lambda engine: (engine.trip(trip_id), engine.trip_stops(trip_id)))
+
+    def test_services_return_the_same_results_on_every_engine(self):
+        start, end = self.journey()
+        coordinates = (f"{start[0]},{start[1]}", f"{end[0]},{end[1]}")
+        window = coordinates + ('2025-04-02T08:00:00Z', '2025-04-02T10:00:00Z', 10)
+
+        def services(engine):
+            query_engine.configure(engine)
+            return (get_closest_departures(*coordinates, '2025-04-02T08:00:00Z', 5),
+                    get_departures_in_window(*window),
+                    [get_trip_details(trip_id) for trip_id in self.trip_ids[:20]])
+
+        closest, in_window, trips = self.assertSameResults(services)
+        self.assertTrue(in_window['departures'])
+        self.assertTrue(all(trips))
+
+
+class TestQueryEnginesOnFixture(_Conformance, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, 'trips.sqlite')
+        conn = _connect(cls.db_path)
+        conn.executescript(SCHEMA + UNNORMALIZED_ROWS)
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup_database.normalize_stop_times(conn.cursor())
+        conn.commit()
+        conn.close()
+        cls.open_engines(cls.tmp.name)
+
+    def test_departures_are_ordered_by_time_then_trip(self):
+        rows = self.assertSameResults(lambda engine: engine.stop_departures('near', '08:00:00'))
+        self.assertEqual([row['trip_id'] for row in rows], ['t1', 't4', 't2', 't5', 't6'])
+        self.assertEqual(rows[0]['arrival_time'], '08:03:00')
+        self.assertEqual(rows[0]['departure_time'], '08:03:30')
+
+    def test_times_are_normalized_at_import(self):
+        # "8:45:00" falls inside 08:00-09:00 and "10:00:00" outside, as their seconds say
+        rows = self.assertSameResults(lambda engine: engine.stop_departures('near', '08:40:00', '09:00:00'))
+        self.assertEqual(rows, [{'trip_id': 't5', 'route_id': 'B', 'trip_headsign': 'North', 'variant_id': 'v3',
+                                 'arrival_time': '08:45:00', 'departure_time': '08:45:00'}])
+        stops = self.assertSameResults(lambda engine: engine.trip_stops('t5'))
+        self.assertEqual([(stop['arrival_time'], stop['departure_time']) for stop in stops],
+                         [('08:40:00', '08:40:00'), ('08:45:00', '08:45:00'), ('08:52:00', '08:52:00')])
+        # The untimed stop is placed halfway between the timed stops around it
+        stops = self.assertSameResults(lambda engine: engine.trip_stops('t7'))
+        self.assertEqual([stop['arrival_time'] for stop in stops], ['07:00:00', '07:05:00', '07:10:00'])
+
+    def test_empty_arrival_is_missing_on_every_engine(self):
+        # A database imported before times were normalized still has empty arrivals
+        db_path = os.path.join(self.tmp.name, 'empty_arrival.sqlite')
+        snapshot_path = os.path.join(self.tmp.name, 'empty_arrival.timetable')
+        conn = _connect(db_path)
+        conn.executescript(SCHEMA)
+        conn.execute("UPDATE stop_times SET arrival_time = '' WHERE trip_id = 't2' AND stop_id = 'near'")
+        conn.commit()
+        conn.close()
+        timetable_snapshot.export(db_path, snapshot_path)
+        snapshot = timetable_snapshot.TimetableSnapshot(snapshot_path)
+        try:
+            for engine in (query_engine.SQLiteEngine(db_path), query_engine.MemoryEngine(db_path),
+                           query_engine.SnapshotEngine(snapshot)):
+                with self.subTest(engine=engine.name):
+                    rows = engine.stop_departures('near', '08:20:00', '08:30:00')
+                    self.assertEqual([(row['arrival_time'], row['departure_time']) for row in rows],
+                                     [('08:23:00', '08:23:00')])
+        finally:
+            snapshot.close()
+
+
+class TestQueryEnginesOnSyntheticFeed(_Conformance, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, 'trips.sqlite')
+        gtfs_dir = os.path.join(cls.tmp.name, 'feed')
+        generate_feed(gtfs_dir, scale=0.05, seed=7)
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup_database.main(cls.db_path, gtfs_dir)
+        cls.open_engines(cls.tmp.name)
+        rng = random.Random(7)
+        cls.random_points = [(rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON)) for _ in range(10)]
+        cls.stop_ids = rng.sample(cls.stop_ids, 20)
+        cls.trip_ids = rng.sample(cls.trip_ids, 50)
+
+        # A trip leaving its second stop between 08:00 and 09:00, ridden to its tenth
+        conn = _connect(cls.db_path)
+        cls.random_journey = conn.execute("""
+            SELECT CAST(board.stop_lat AS REAL), CAST(board.stop_lon AS REAL),
+                   CAST(alight.stop_lat AS REAL), CAST(alight.stop_lon AS REAL)
+            FROM stop_times first
+            JOIN stop_times last ON last.trip_id = first.trip_id AND CAST(last.stop_sequence AS INTEGER) = 10
+            JOIN stops board ON board.stop_id = first.stop_id
+            JOIN stops alight ON alight.stop_id = last.stop_id
+            WHERE first.stop_sequence = '2' AND first.departure_time BETWEEN '08:00:00' AND '09:00:00'
+            ORDER BY first.trip_id LIMIT 1
+        """).fetchone()
+        conn.close()
+
+    def points(self):
+        return self.random_points
+
+    def journey(self):
+        return self.random_journey[:2], self.random_journey[2:]
+
+
+class TestEngineSelection(unittest.TestCase):
+    def tearDown(self):
+        query_engine.configure(None)
+        timetable_snapshot._loaded = None
+
+    def test_auto_uses_the_loaded_snapshot(self):
+        self.assertIsInstance(query_engine.current(), query_engine.SQLiteEngine)
+        timetable_snapshot._loaded = object()
+        self.assertIsInstance(query_engine.current(), query_engine.SnapshotEngine)
+
+    def test_configured_engine_wins(self):
+        engine = query_engine.configure(query_engine.create('sqlite', 'other.sqlite'))
+        timetable_snapshot._loaded = object()
+        self.assertIs(query_engine.current(), engine)
+
+    def test_services_open_the_configured_database(self):
+        previous = query_engine.configure_database('/data/feed.sqlite')
+        try:
+            self.assertEqual(query_engine.database_path(), '/data/feed.sqlite')
+            self.assertEqual(query_engine.current().db_path, '/data/feed.sqlite')
+        finally:
+            query_engine.configure_database(previous)
+
+    def test_create_rejects_unknown_and_unavailable_engines(self):
+        self.assertIsNone(query_engine.create('auto'))
+        with self.assertRaises(ValueError):
+            query_engine.create('postgres')
+        with self.assertRaises(ValueError):
+            query_engine.create('snapshot', snapshot=None)
+
+    def test_sqlite_engine_opens_one_connection_per_session(self):
+        with patch('public_transport_api.query_engine.sqlite3.connect', wraps=_connect) as mock_connect:
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, 'trips.sqlite')
+                conn = _connect(db_path)
+                conn.executescript(SCHEMA)
+                conn.close()
+                with query_engine.SQLiteEngine(db_path).session() as engine:
+                    engine.trip('t1')
+                    engine.trip_stops('t1')
+                    engine.stop_departures('near', '08:00:00')
+        self.assertEqual(mock_connect.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
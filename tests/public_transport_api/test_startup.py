@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+
+from flask import Flask
+
+from public_transport_api import admission, instrumentation, query_engine, startup, stop_index, timetable_snapshot
+
+
+def _create_database(tmp):
+    db_path = os.path.join(tmp, 'trips.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat TEXT, stop_lon TEXT)')
+    conn.execute("INSERT INTO stops VALUES ('1', 'Rynek', '51.1100', '17.0320')")
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+class TestStartup(unittest.TestCase):
+    def tearDown(self):
+        query_engine.configure(None)
+        query_engine.configure_database('trips.sqlite')
+
+    def test_warm_up_loads_index_and_flips_readiness(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = _create_database(tmp)
+
+            app = Flask(__name__)
+            app.config.update(DATABASE=db_path, WARM_UP_URL='/ping')
+
+            @app.route('/ping')
+            def ping():
+                return 'pong'
+
+            state = startup.init_app(app, time.perf_counter())
+            self.assertFalse(state.started)
+            self.assertFalse(os.path.exists(os.path.join(tmp, 'trips.stops.idx')))
+            startup.start(app, background=False)
+            try:
+                self.assertTrue(os.path.exists(os.path.join(tmp, 'trips.stops.idx')))
+                self.assertIsNotNone(stop_index.current())
+                response = app.test_client().get('/ready')
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNotNone(response.get_json()['time_to_first_response_ms'])
+                self.assertIn('stop_index', state.steps)
+            finally:
+                stop_index.current().close()
+                stop_index._loaded = None
+
+    def test_stop_index_reads_the_timetable_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = _create_database(tmp)
+            conn = sqlite3.connect(db_path)
+            conn.executescript("""
+                CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT,
+                                    brigade_id TEXT, variant_id TEXT);
+                CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT,
+                                         stop_sequence TEXT);
+            """)
+            conn.close()
+            timetable_snapshot.export(db_path, os.path.join(tmp, 'trips.timetable'))
+
+            app = Flask(__name__)
+            app.config.update(DATABASE=db_path, WARM_UP_URL='/ready')
+            startup.init_app(app, time.perf_counter())
+            try:
+                startup.start(app, background=False)
+                self.assertFalse(os.path.exists(os.path.join(tmp, 'trips.stops.idx')))
+                index = stop_index.current()
+                self.assertIs(index._columns, timetable_snapshot.current())
+                self.assertEqual([stop['stop_name'] for stop, _ in index.within(51.11, 17.032, 100)], ['Rynek'])
+            finally:
+                stop_index._loaded = None
+                timetable_snapshot.current().close()
+                timetable_snapshot._loaded = None
+
+    def test_warm_up_request_is_kept_out_of_the_metrics(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = Flask(__name__)
+            app.config.update(DATABASE=_create_database(tmp), WARM_UP_URL='/warm-up-probe')
+            instrumentation.init_app(app)
+            controller = admission.init_app(app)
+
+            @app.route('/warm-up-probe')
+            @admission.admission_controlled
+            def probe():
+                return 'ok'
+
+            startup.init_app(app, time.perf_counter())
+            # Routes can still be added after init_app; nothing has been served yet
+            app.add_url_rule('/late', 'late', lambda: 'late')
+            try:
+                startup.start(app, background=False)
+                self.assertIsNone(app.extensions['startup'].error)
+                self.assertIsNotNone(app.extensions['startup'].time_to_first_response)
+                self.assertNotIn('probe', instrumentation.REQUEST_DURATION._series)
+                self.assertEqual(len(controller._latencies), 0)
+                app.test_client().get('/warm-up-probe')
+                self.assertIn('probe', instrumentation.REQUEST_DURATION._series)
+                self.assertEqual(len(controller._latencies), 1)
+            finally:
+                stop_index.current().close()
+                stop_index._loaded = None
+
+    def test_first_request_starts_the_warm_up(self):
+        app = Flask(__name__)
+        state = startup.init_app(app, time.perf_counter())
+        with unittest.mock.patch.object(startup, 'warm_up') as warm_up:
+            app.test_client().get('/ready')
+            app.test_client().get('/ready')
+            for thread in threading.enumerate():
+                if thread.name == 'warm-up':
+                    thread.join(2)
+        self.assertTrue(state.started)
+        self.assertEqual(warm_up.call_count, 1)
+
+    def test_a_replaced_index_stays_open_until_its_readers_let_go(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, 'trips.stops.idx')
+            stop_index.build_snapshot(_create_database(tmp), index_path)
+            first = stop_index.load(index_path)
+            mapping = first._columns._mmap
+            try:
+                # A request that read the index before the reload is still using it
+                second = stop_index.load(index_path)
+                self.assertIs(stop_index.current(), second)
+                self.assertFalse(mapping.closed)
+                self.assertEqual(first.within(51.11, 17.032, 100)[0][0]['stop_name'], 'Rynek')
+                del first
+                self.assertTrue(mapping.closed)
+                self.assertFalse(second._columns._mmap.closed)
+            finally:
+                stop_index._loaded = None
+
+    def test_serving_entry_point_does_not_import_offline_modules(self):
+        # pyarrow, NumPy and the import, export and validation code are for offline tools only
+        src = os.path.join(os.path.dirname(__file__), '..', '..', 'src')
+        script = ('import sys, main; print(sorted(name for name in sys.modules if name.split(".")[0] in '
+                  '("pyarrow", "numpy") or name.split(".")[-1] in ("analytics", "columnar", "feed_validation")))')
+        result = subprocess.run([sys.executable, '-c', script], cwd=os.path.join(src, 'public_transport_api'),
+                                env={**os.environ, 'PYTHONPATH': os.path.abspath(src)},
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from public_transport_api import static_bundle, timetable_snapshot
+from tests.public_transport_api.test_timetable_snapshot import SCHEMA
+
+_connect = sqlite3.connect
+
+
+class TestStaticBundle(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp.name, 'trips.sqlite')
+        conn = _connect(db_path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.snapshot_path = os.path.join(self.tmp.name, 'trips.timetable')
+        timetable_snapshot.export(db_path, self.snapshot_path)
+        self.output_dir = os.path.join(self.tmp.name, 'bundle')
+        self.manifest = static_bundle.build(self.snapshot_path, self.output_dir)
+        self.bundle = static_bundle.read(os.path.join(self.output_dir, self.manifest['file']))
+        self.snapshot = timetable_snapshot.TimetableSnapshot(self.snapshot_path)
+
+    def tearDown(self):
+        self.snapshot.close()
+        self.tmp.cleanup()
+
+    def _trip_times(self, trip_row):
+        profile = self.bundle['trip_profile'][trip_row]
+        start, end = self.bundle['profile_offsets'][profile], self.bundle['profile_offsets'][profile + 1]
+        pattern = self.bundle['profile_pattern'][profile]
+        stops = self.bundle['pattern_stops'][self.bundle['pattern_offsets'][pattern]:self.bundle['pattern_offsets'][pattern + 1]]
+        first = self.bundle['trip_start'][trip_row]
+        return list(zip(stops, (first + t for t in self.bundle['profile_arrival'][start:end]),
+                        (first + t for t in self.bundle['profile_departure'][start:end])))
+
+    def test_manifest_points_to_the_bundle(self):
+        with open(os.path.join(self.output_dir, static_bundle.MANIFEST)) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['file'], f"timetable-{manifest['feed_version']}.bin")
+        self.assertEqual(manifest['counts']['trips'], 3)
+        self.assertEqual(os.path.getsize(os.path.join(self.output_dir, manifest['file'])), manifest['bytes'])
+
+    def test_trips_with_the_same_running_times_share_a_profile(self):
+        # t1 and t2 run the same stops, but t1 dwells 30 seconds longer at "near"
+        self.assertEqual(self.manifest['counts']['patterns'], 2)
+        self.assertEqual(self.manifest['counts']['profiles'], 3)
+
+    def test_trip_times_match_the_snapshot(self):
+        for trip_row in range(len(self.snapshot.trip_id)):
+            start, end = self.snapshot.trip_stop_offsets[trip_row], self.snapshot.trip_stop_offsets[trip_row + 1]
+            expected = list(zip(self.snapshot.st_stop[start:end], self.snapshot.st_arrival[start:end],
+                                self.snapshot.st_departure[start:end]))
+            self.assertEqual(self._trip_times(trip_row), expected)
+
+    def test_stop_departures_can_be_derived(self):
+        departures = []
+        for k, trip_row in enumerate(self.bundle['sd_trip']):
+            departures.append(self._trip_times(trip_row)[self.bundle['sd_position'][k]][2])
+        self.assertEqual(departures, list(self.snapshot.sd_departure))
+        self.assertEqual(self.bundle['stop_lat'][0], round(self.snapshot.stop_lat[0] * 1_000_000))
+
+    def test_read_rejects_other_container_files(self):
+        with self.assertRaisesRegex(ValueError, 'not a version 1 timetable bundle'):
+            static_bundle.read(self.snapshot_path)
+
+    def test_rebuilding_a_new_feed_replaces_the_old_bundle(self):
+        db_path = os.path.join(self.tmp.name, 'trips.sqlite')
+        conn = _connect(db_path)
+        conn.execute("UPDATE stop_times SET departure_time = '08:21:00' WHERE trip_id = 't2' AND stop_id = 'far'")
+        conn.commit()
+        conn.close()
+        timetable_snapshot.export(db_path, self.snapshot_path)
+        manifest = static_bundle.build(self.snapshot_path, self.output_dir)
+        self.assertNotEqual(manifest['feed_version'], self.manifest['feed_version'])
+        self.assertEqual(sorted(os.listdir(self.output_dir)), sorted([static_bundle.MANIFEST, manifest['file']]))
+
+
+if __name__ == '__main__':
+    unittest.main()
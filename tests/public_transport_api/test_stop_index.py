@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from public_transport_api import stop_index, timetable_snapshot
+from public_transport_api.services.departures_service import haversine_distance
+
+STOPS = [
+    ('1', 'Rynek', '51.1100', '17.0320'),
+    ('2', 'Renoma', '51.1040', '17.0280'),
+    ('3', 'Plac Grunwaldzki', '51.1092', '17.0415'),
+    ('4', 'Leśnica', '51.1450', '16.8660'),
+]
+
+
+class TestStopIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'trips.sqlite')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat TEXT, stop_lon TEXT)')
+        conn.executemany('INSERT INTO stops VALUES (?, ?, ?, ?)', STOPS)
+        conn.commit()
+        conn.close()
+        self.snapshot_path = os.path.join(self.tmp.name, 'trips.stops.idx')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_within_matches_full_scan(self):
+        self.assertEqual(stop_index.build_snapshot(self.db_path, self.snapshot_path), len(STOPS))
+        index = stop_index.StopIndex(self.snapshot_path)
+        try:
+            found = index.within(51.1079, 17.0385, 1000)
+            expected = sorted(
+                (haversine_distance(51.1079, 17.0385, float(lat), float(lon)), stop_id)
+                for stop_id, _, lat, lon in STOPS
+                if haversine_distance(51.1079, 17.0385, float(lat), float(lon)) <= 1000
+            )
+            self.assertEqual([stop['stop_id'] for stop, _ in found], [stop_id for _, stop_id in expected])
+            for (stop, dist), (expected_dist, _) in zip(found, expected):
+                self.assertAlmostEqual(dist, expected_dist, places=6)
+            self.assertEqual(found[0][0]['stop_name'], 'Plac Grunwaldzki')
+        finally:
+            index.close()
+
+    def test_index_over_a_timetable_snapshot_matches_the_stops_only_file(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT, brigade_id TEXT,
+                                variant_id TEXT);
+            CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT,
+                                     stop_sequence TEXT);
+        """)
+        conn.close()
+        timetable_path = os.path.join(self.tmp.name, 'trips.timetable')
+        timetable_snapshot.export(self.db_path, timetable_path)
+        stop_index.build_snapshot(self.db_path, self.snapshot_path)
+        snapshot = timetable_snapshot.TimetableSnapshot(timetable_path)
+        stops_only = stop_index.StopIndex(self.snapshot_path)
+        try:
+            on_snapshot = stop_index.StopIndex(snapshot)
+            self.assertIs(on_snapshot.lat, snapshot.stop_lat)
+            self.assertEqual(on_snapshot.within(51.1079, 17.0385, 5000), stops_only.within(51.1079, 17.0385, 5000))
+            # The index borrows the snapshot's columns; closing it leaves the snapshot open
+            on_snapshot.close()
+            self.assertEqual(snapshot.stop_name[0], 'Renoma')
+        finally:
+            stops_only.close()
+            snapshot.close()
+        # A stops-only file is not a timetable snapshot
+        with self.assertRaises(ValueError):
+            timetable_snapshot.TimetableSnapshot(self.snapshot_path)
+
+    def test_rejects_foreign_files(self):
+        with open(self.snapshot_path, 'wb') as f:
+            f.write(b'not a snapshot at all')
+        with self.assertRaises(ValueError):
+            stop_index.StopIndex(self.snapshot_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from public_transport_api import timetable_snapshot
+from public_transport_api.services.departures_service import get_departures_in_window
+from public_transport_api.services.trips_service import get_trip_details
+
+SCHEMA = """
+    CREATE TABLE stops (stop_id TEXT, stop_name TEXT, stop_lat TEXT, stop_lon TEXT);
+    CREATE TABLE trips (route_id TEXT, service_id TEXT, trip_id TEXT, trip_headsign TEXT, brigade_id TEXT,
+                        variant_id TEXT);
+    CREATE TABLE stop_times (trip_id TEXT, arrival_time TEXT, departure_time TEXT, stop_id TEXT, stop_sequence TEXT);
+    INSERT INTO stops VALUES ('near', 'Near', '51.1000', '17.0300'), ('far', 'Far', '51.1050', '17.0300'),
+                             ('dest', 'Dest', '51.1200', '17.0300');
+    INSERT INTO trips VALUES ('A', '3', 't1', 'North', '1', 'v1'), ('A', '3', 't2', 'North', '1', 'v1'),
+                             ('B', '3', 't4', 'South', '2', 'v2');
+    INSERT INTO stop_times VALUES
+        ('t1', '08:00:00', '08:00:00', 'far', '1'), ('t1', '08:03:00', '08:03:30', 'near', '2'),
+        ('t1', '08:10:00', '08:10:00', 'dest', '10'),
+        ('t2', '08:20:00', '08:20:00', 'far', '1'), ('t2', '08:23:00', '08:23:00', 'near', '2'),
+        ('t2', '08:30:00', '08:30:00', 'dest', '10'),
+        ('t4', '08:05:00', '08:05:00', 'dest', '1'), ('t4', '08:15:00', '08:15:00', 'near', '2');
+"""
+
+_connect = sqlite3.connect
+
+
+class TestTimetableSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'trips.sqlite')
+        conn = _connect(self.db_path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.snapshot_path = os.path.join(self.tmp.name, 'trips.timetable')
+        timetable_snapshot.export(self.db_path, self.snapshot_path)
+        self.snapshot = timetable_snapshot.TimetableSnapshot(self.snapshot_path)
+
+    def tearDown(self):
+        self.snapshot.close()
+        timetable_snapshot._loaded = None
+        self.tmp.cleanup()
+
+    def test_trip_stops_follow_numeric_stop_sequence(self):
+        stops = self.snapshot.trip_stops(self.snapshot.trip_row('t1'))
+        self.assertEqual([stop['stop_id'] for stop in stops], ['far', 'near', 'dest'])
+        self.assertEqual(stops[1]['arrival_time'], '08:03:00')
+        self.assertEqual(stops[1]['departure_time'], '08:03:30')
+        self.assertIsNone(self.snapshot.trip_row('missing'))
+
+    def test_departures_are_sorted_and_bounded(self):
+        near = self.snapshot.stop_row('near')
+        rows = self.snapshot.departures(near, timetable_snapshot.parse_time('08:10:00'))
+        self.assertEqual([row['trip_id'] for row in rows], ['t4', 't2'])
+        rows = self.snapshot.departures(near, 0, timetable_snapshot.parse_time('08:15:00'), limit=1)
+        self.assertEqual([row['trip_id'] for row in rows], ['t1'])
+
+    def _database(self, *args, **kwargs):
+        return _connect(self.db_path, factory=kwargs.get('factory', sqlite3.Connection))
+
+    def test_services_return_the_same_results_from_snapshot_and_sqlite(self):
+        with patch('public_transport_api.services.departures_service.sqlite3.connect', side_effect=self._database), \
+                patch('public_transport_api.query_engine.sqlite3.connect', side_effect=self._database):
+            args = ('51.1000,17.0300', '51.1200,17.0300', '2025-04-02T08:00:00Z', '2025-04-02T09:00:00Z', 10)
+            from_sqlite = (get_departures_in_window(*args), get_trip_details('t1'))
+            timetable_snapshot._loaded = self.snapshot
+            from_snapshot = (get_departures_in_window(*args), get_trip_details('t1'))
+        self.assertEqual(len(from_sqlite[0]['departures']), 2)
+        self.assertEqual(from_sqlite, from_snapshot)
+
+    def test_stop_times_without_any_time_are_skipped(self):
+        path = os.path.join(self.tmp.name, 'untimed.timetable')
+        counts = timetable_snapshot.build(
+            [('near', 'Near', '51.1000', '17.0300'), ('far', 'Far', '51.1050', '17.0300')],
+            [('t1', 'A', 'North', '3', 'v1', '1')],
+            [('t1', 'far', '08:00:00', '08:00:00'), ('t1', 'near', '', ''), ('t1', 'far', None, '08:09:00')],
+            path)
+        self.assertEqual((counts['stop_times'], counts['untimed_stop_times']), (2, 1))
+        snapshot = timetable_snapshot.TimetableSnapshot(path)
+        try:
+            stops = snapshot.trip_stops(snapshot.trip_row('t1'))
+            self.assertEqual([stop['departure_time'] for stop in stops], ['08:00:00', '08:09:00'])
+        finally:
+            snapshot.close()
+
+    def test_a_replaced_snapshot_is_unmapped_once_unused(self):
+        first = timetable_snapshot.load(self.snapshot_path)
+        mapping = first._mmap
+        timetable_snapshot.load(self.snapshot_path)
+        # Still held by this test, like a request that read it before the reload
+        self.assertFalse(mapping.closed)
+        self.assertEqual(first.trip_row('t1'), self.snapshot.trip_row('t1'))
+        del first
+        self.assertTrue(mapping.closed)
+        self.assertFalse(timetable_snapshot.current()._mmap.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
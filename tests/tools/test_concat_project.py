@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'tools')
+sys.path.insert(0, os.path.abspath(TOOLS_DIR))
+
+import concat_project  # noqa: E402
+from concat_project import GitIgnore, concatenate, list_files  # noqa: E402
+
+
+def _write(root, path, content):
+    full_path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'wb') as f:
+        f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+    return full_path
+
+
+def _gitignore(*lines, base=''):
+    with tempfile.TemporaryDirectory() as tmp:
+        gitignore = GitIgnore()
+        gitignore.add_file(base, _write(tmp, '.gitignore', '\n'.join(lines)))
+    return gitignore
+
+
+class TestGitIgnore(unittest.TestCase):
+    def test_unanchored_patterns_match_the_name_at_any_depth(self):
+        gitignore = _gitignore('# comment', '*.log', '', 'secrets.py')
+        self.assertTrue(gitignore.ignored('debug.log', False))
+        self.assertTrue(gitignore.ignored('a/b/debug.log', False))
+        self.assertTrue(gitignore.ignored('pkg/secrets.py', False))
+        self.assertFalse(gitignore.ignored('pkg/app.py', False))
+
+    def test_anchored_patterns_match_from_their_base(self):
+        gitignore = _gitignore('/generated.py', 'docs/*.py')
+        self.assertTrue(gitignore.ignored('generated.py', False))
+        self.assertFalse(gitignore.ignored('pkg/generated.py', False))
+        self.assertTrue(gitignore.ignored('docs/conf.py', False))
+        # "*" does not cross a directory boundary
+        self.assertFalse(gitignore.ignored('docs/api/conf.py', False))
+
+    def test_double_star_matches_zero_or_more_directories(self):
+        gitignore = _gitignore('src/**/fixtures.py')
+        self.assertTrue(gitignore.ignored('src/fixtures.py', False))
+        self.assertTrue(gitignore.ignored('src/a/b/fixtures.py', False))
+        self.assertFalse(gitignore.ignored('tests/fixtures.py', False))
+
+    def test_directory_only_and_negation(self):
+        gitignore = _gitignore('cache/', '*.py', '!keep.py')
+        self.assertTrue(gitignore.ignored('cache', True))
+        self.assertFalse(gitignore.ignored('cache', False))
+        self.assertTrue(gitignore.ignored('app.py', False))
+        # The last matching rule wins
+        self.assertFalse(gitignore.ignored('keep.py', False))
+
+    def test_nested_gitignore_only_applies_below_its_directory(self):
+        gitignore = _gitignore('local.py', base='pkg')
+        self.assertTrue(gitignore.ignored('pkg/local.py', False))
+        self.assertTrue(gitignore.ignored('pkg/sub/local.py', False))
+        self.assertFalse(gitignore.ignored('local.py', False))
+
+
+class TestConcatProject(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'project')
+        self.output = os.path.join(self.tmp.name, 'backend.txt')
+        _write(self.root, 'a.py', 'print("a")\n')
+        _write(self.root, 'pkg/b.py', 'print("b")\n')
+        _write(self.root, 'pkg/c.py', 'print("c")\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _concatenate(self, **kwargs):
+        return concatenate(self.root, 'python', self.output, use_git=False, workers=2, **kwargs)
+
+    def _read_output(self):
+        with open(self.output, encoding='utf-8') as f:
+            return f.read()
+
+    def test_walk_honours_gitignore_and_always_skipped_directories(self):
+        _write(self.root, '.gitignore', 'generated/\n')
+        _write(self.root, 'pkg/.gitignore', 'local_*.py\n')
+        _write(self.root, 'generated/out.py', '')
+        _write(self.root, 'pkg/local_settings.py', '')
+        _write(self.root, 'venv/lib.py', '')
+        _write(self.root, '.hidden/x.py', '')
+        _write(self.root, 'build/y.py', '')
+        _write(self.root, 'data.sqlite', '')
+        _write(self.root, 'pyproject.toml', '')
+        self.assertEqual(list(list_files(self.root, ('.py', '.toml', '.sqlite'), use_git=False)),
+                         ['a.py', 'pkg/b.py', 'pkg/c.py', 'pyproject.toml'])
+
+    def test_output_keeps_the_shell_script_format(self):
+        summary = self._concatenate()
+        self.assertEqual(summary['files'], 3)
+        self.assertEqual(self._read_output(),
+                         ''.join(f'--- START FILE: {path} ---\n{content}\n--- END FILE: {path} ---\n\n\n'
+                                 for path, content in (('a.py', 'print("a")\n'), ('pkg/b.py', 'print("b")\n'),
+                                                       ('pkg/c.py', 'print("c")\n'))))
+
+    def test_manifest_reuses_unchanged_files_after_a_change(self):
+        self._concatenate()
+        self.assertTrue(self._concatenate()['up_to_date'])
+
+        changed = _write(self.root, 'pkg/b.py', 'print("b, longer now")\n')
+        stat = os.stat(changed)
+        os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        summary = self._concatenate()
+        self.assertFalse(summary['up_to_date'])
+        self.assertEqual((summary['files'], summary['read'], summary['reused']), (3, 1, 2))
+        output = self._read_output()
+        self.assertIn('print("b, longer now")', output)
+        # c.py moved in the output; the manifest records where it is now
+        with open(self.output + '.manifest.json', encoding='utf-8') as f:
+            entry = json.load(f)['files']['pkg/c.py']
+        self.assertEqual(output.encode('utf-8')[entry['offset']:entry['offset'] + entry['length']], b'print("c")\n')
+
+    def test_manifest_is_ignored_when_options_change(self):
+        self._concatenate()
+        summary = self._concatenate(max_file_size=1024)
+        self.assertEqual((summary['read'], summary['reused']), (3, 0))
+
+    def test_budget_skips_files_that_do_not_fit(self):
+        one_file = len(concat_project._header('a.py')) + len('print("a")\n') + len(concat_project._footer('a.py'))
+        summary = self._concatenate(budget=one_file + 10)
+        self.assertEqual(summary['files'], 1)
+        self.assertEqual(summary['skipped'], [('pkg/b.py', 'over budget'), ('pkg/c.py', 'over budget')])
+        self.assertLessEqual(os.path.getsize(self.output), one_file + 10)
+        # A rerun with nothing changed recognises the skipped files as unchanged
+        self.assertTrue(self._concatenate(budget=one_file + 10)['up_to_date'])
+
+    def test_binary_and_large_files_are_skipped(self):
+        _write(self.root, 'pkg/blob.py', b'\x00\x01binary')
+        _write(self.root, 'pkg/big.py', 'x = 1\n' * 100)
+        summary = self._concatenate(max_file_size=200)
+        self.assertEqual(sorted(summary['skipped']),
+                         [('pkg/big.py', 'larger than 200 bytes'), ('pkg/blob.py', 'binary')])
+        self.assertNotIn('blob.py', self._read_output())
+        # After another file changes, the unchanged binary file stays skipped without being read again
+        _write(self.root, 'a.py', 'print("a2")\n')
+        summary = self._concatenate(max_file_size=200)
+        self.assertFalse(summary['up_to_date'])
+        self.assertIn(('pkg/blob.py', 'binary'), summary['skipped'])
+        self.assertEqual(summary['files'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'tools')
+sys.path.insert(0, os.path.abspath(TOOLS_DIR))
+
+import mock_llm  # noqa: E402
+
+try:
+    import score_submissions
+except ImportError:  # scoring.py needs the packages in tools/requirements.txt
+    score_submissions = None
+
+
+def _write_submission(root, name, frontend='<div id="map"></div>'):
+    from PIL import Image
+
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    with open(os.path.join(path, 'backend.txt'), 'w', encoding='utf-8') as f:
+        f.write('def departures(): return []')
+    with open(os.path.join(path, 'frontend.txt'), 'w', encoding='utf-8') as f:
+        f.write(frontend)
+    Image.new('RGB', (4, 4), 'white').save(os.path.join(path, 'frontend.png'))
+    return path
+
+
+class FailingImagePrompts:
+    """Passes evaluations through to the model and fails the image prompt calls that follow them."""
+
+    def __init__(self, llm):
+        self._llm = llm
+
+    def invoke(self, messages):
+        content = messages[0].content
+        text = content if isinstance(content, str) else content[0]['text']
+        if mock_llm.answer(text) == mock_llm.IMAGE_PROMPT_RESPONSE:
+            raise RuntimeError('quota exceeded')
+        return self._llm.invoke(messages)
+
+
+@unittest.skipIf(score_submissions is None, 'the scoring dependencies are not installed')
+class TestScoreSubmissions(unittest.TestCase):
+    def setUp(self):
+        mock_llm.MockGeminiHandler.requests = 0
+        mock_llm.MockGeminiHandler.delay = 0.0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), mock_llm.MockGeminiHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.tmp = tempfile.TemporaryDirectory()
+        self.submissions = os.path.join(self.tmp.name, 'submissions')
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _llm(self, per_minute=6000, burst=10):
+        return score_submissions.RateLimitedLLM(score_submissions.make_llm('mock', self.endpoint),
+                                                score_submissions.RateLimiter(per_minute, burst))
+
+    def _score(self, llm, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return score_submissions.score_all(self.submissions, llm, self.cache_dir, **kwargs)
+
+    def test_results_are_parsed_and_cached_by_content(self):
+        _write_submission(self.submissions, 'alpha')
+        beta = _write_submission(self.submissions, 'beta')
+
+        llm = self._llm()
+        results = self._score(llm)
+        # Per submission: two evaluations plus three image prompts
+        self.assertEqual(llm.calls, 10)
+        self.assertEqual(mock_llm.MockGeminiHandler.requests, 10)
+        self.assertEqual([result['errors'] for result in results], [[], []])
+        self.assertEqual(results[0]['code_quality']['overall_average_score'], 3.5)
+        self.assertEqual(results[0]['aesthetics']['score'], 4)
+
+        rerun = self._llm()
+        results = self._score(rerun)
+        self.assertEqual(rerun.calls, 0)
+        self.assertTrue(all(all(result['cached'].values()) for result in results))
+
+        # Changing the frontend invalidates both evaluations of that submission only
+        with open(os.path.join(beta, 'frontend.txt'), 'w', encoding='utf-8') as f:
+            f.write('<div id="list"></div>')
+        changed = self._llm()
+        results = self._score(changed)
+        self.assertEqual(changed.calls, 5)
+        self.assertEqual([result['cached'] for result in results],
+                         [{'code_quality': True, 'aesthetics': True}, {'code_quality': False, 'aesthetics': False}])
+
+    def test_failed_image_prompts_are_reported_and_not_cached(self):
+        _write_submission(self.submissions, 'alpha')
+
+        results = self._score(FailingImagePrompts(self._llm()))
+        self.assertEqual(len(results[0]['errors']), 2)
+        # The evaluations themselves succeeded, so their scores are still reported
+        self.assertEqual(results[0]['aesthetics']['score'], 4)
+
+        retry = self._llm()
+        results = self._score(retry)
+        self.assertEqual(retry.calls, 5)
+        self.assertEqual(results[0]['errors'], [])
+
+    def test_rate_limit_spaces_calls_across_workers(self):
+        for name in ('alpha', 'beta', 'gamma'):
+            _write_submission(self.submissions, name)
+
+        # 15 calls at 300 per minute after a burst of 5: at least 10 intervals of 0.2 s
+        started = time.perf_counter()
+        llm = self._llm(per_minute=300, burst=5)
+        self._score(llm, workers=3)
+        self.assertEqual(llm.calls, 15)
+        self.assertGreaterEqual(time.perf_counter() - started, 1.9)
+
+    def test_evaluations_of_a_submission_run_side_by_side(self):
+        _write_submission(self.submissions, 'alpha')
+        mock_llm.MockGeminiHandler.delay = 0.3
+
+        started = time.perf_counter()
+        results = self._score(self._llm(), workers=1)
+        # Sequential: 5 calls of 0.3 s; side by side the aesthetics calls overlap the code quality ones
+        self.assertLess(time.perf_counter() - started, 1.4)
+        self.assertEqual(results[0]['errors'], [])
+
+    def test_is_error(self):
+        self.assertTrue(score_submissions.is_error('Error during LLM invocation for code quality text: boom'))
+        self.assertTrue(score_submissions.is_error('{"score": "4"}\n\nFrontend Code Quality Image Prompt: '
+                                                   'Error generating image prompt: boom'))
+        self.assertFalse(score_submissions.is_error('{"score": "4"}\n\nImage Prompt: A tram on a bridge.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
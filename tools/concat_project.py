@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Concatenate project files into a single text file, preserving relative paths.
+
+Replaces concat-project.sh and produces the same output format:
+
+    python tools/concat_project.py python backend.txt
+    python tools/concat_project.py frontend frontend.txt
+
+What it does beyond the shell script:
+* Traversal honours .gitignore. It uses `git ls-files` inside a work tree and its own .gitignore
+  matcher elsewhere. Hidden paths, virtual environments and build directories are always skipped,
+  as before.
+* Binary files (a NUL byte in the first 8 KiB), known data formats and files larger than
+  --max-file-size are skipped. --budget caps the total size of the output; the files that do not fit
+  are listed.
+* Files are read on a thread pool, and the output is streamed in path order through a bounded
+  window of reads, so memory does not grow with the project.
+* A manifest next to the output (<output>.manifest.json) records every file's mtime, size, hash and
+  position in the output. On a re-run, unchanged files are copied from the previous output instead
+  of being re-read, and when nothing changed the output is left untouched.
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_TYPES = {
+    "python": (".py", ".toml"),
+    "frontend": (".html", ".css", ".js"),
+}
+VENV_NAMES = {"venv", ".venv", "env", ".env", "env.bak", "venv.bak"}
+IGNORE_DIRS = {"build", "node_modules", "__pycache__"}
+DATA_EXTENSIONS = {".sqlite", ".db", ".csv", ".parquet", ".arrow", ".timetable", ".idx", ".zip", ".gz", ".png",
+                   ".jpg", ".jpeg", ".gif", ".pdf", ".min.js", ".map"}
+BINARY_SNIFF_BYTES = 8192
+MANIFEST_VERSION = 1
+
+
+def _header(path):
+    return f"--- START FILE: {path} ---\n".encode("utf-8")
+
+
+def _footer(path):
+    return f"\n--- END FILE: {path} ---\n\n\n".encode("utf-8")
+
+
+# --- .gitignore matching ---
+
+class GitIgnore:
+    """The subset of .gitignore semantics projects use: globs, **, anchoring, directory-only and negation."""
+
+    def __init__(self):
+        self._rules = []  # (base dir, pattern, negated, directory only, anchored)
+
+    def add_file(self, base, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            self._rules.append((base, line.lstrip("/"), negated, directory_only, anchored))
+
+    @staticmethod
+    def _match(pattern, path, anchored):
+        if not anchored:
+            return fnmatch.fnmatchcase(path.rsplit("/", 1)[-1], pattern)
+        if "**" in pattern:
+            # "a/**/b" also matches "a/b"; fnmatch's "*" already crosses "/"
+            return fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(path, pattern.replace("**/", ""))
+        return fnmatch.fnmatchcase(path, pattern) and pattern.count("/") == path.count("/")
+
+    def ignored(self, path, is_dir):
+        ignored = False
+        for base, pattern, negated, directory_only, anchored in self._rules:
+            if directory_only and not is_dir:
+                continue
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                relative = path[len(base) + 1:]
+            else:
+                relative = path
+            if self._match(pattern, relative, anchored):
+                ignored = not negated
+        return ignored
+
+
+def _always_skipped(name):
+    return name.startswith(".") or name in VENV_NAMES or name in IGNORE_DIRS
+
+
+def _walk(root):
+    """Yields project-relative paths of files not excluded by .gitignore files, in sorted order."""
+    gitignore = GitIgnore()
+
+    def visit(relative_dir):
+        directory = os.path.join(root, relative_dir)
+        gitignore.add_file(relative_dir, os.path.join(directory, ".gitignore"))
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            return
+        for entry in entries:
+            if _always_skipped(entry.name):
+                continue
+            path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if gitignore.ignored(path, is_dir):
+                continue
+            if is_dir:
+                yield from visit(path)
+            elif entry.is_file():
+                yield path
+
+    yield from visit("")
+
+
+def _git_files(root):
+    """Tracked and untracked-but-not-ignored files according to git, or None outside a work tree."""
+    try:
+        output = subprocess.run(
+            ["git", "ls-files", "--cached", "--others", "--exclude-standard", "-z"],
+            cwd=root, capture_output=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    paths = {path for path in output.decode("utf-8", "surrogateescape").split("\0") if path}
+    return sorted(path for path in paths
+                  if not any(_always_skipped(part) for part in path.split("/")) and os.path.isfile(os.path.join(root, path)))
+
+
+def list_files(root, extensions, use_git=True):
+    files = _git_files(root) if use_git else None
+    if files is None:
+        files = _walk(root)
+    for path in files:
+        if path.endswith(extensions) and not any(path.endswith(ext) for ext in DATA_EXTENSIONS):
+            yield path
+
+
+# --- Reading ---
+
+def _read(root, path, stat, previous, previous_output_path, max_file_size):
+    """Returns (manifest entry or None when skipped, content bytes or None, skip reason)."""
+    if stat.st_size > max_file_size:
+        return None, None, f"larger than {max_file_size} bytes"
+    entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    unchanged = previous is not None and previous["mtime_ns"] == stat.st_mtime_ns and previous["size"] == stat.st_size
+    if unchanged and previous.get("skipped") == "binary":
+        return None, None, "binary"
+
+    if unchanged and "offset" in previous:
+        # Unchanged since the last run: take the bytes from the previous output
+        with open(previous_output_path, "rb") as f:
+            f.seek(previous["offset"])
+            content = f.read(previous["length"])
+        if hashlib.sha256(content).hexdigest() == previous["sha256"]:
+            entry["sha256"] = previous["sha256"]
+            entry["reused"] = True
+            return entry, content, None
+
+    with open(os.path.join(root, path), "rb") as f:
+        content = f.read()
+    if b"\0" in content[:BINARY_SNIFF_BYTES]:
+        return None, None, "binary"
+    entry["sha256"] = hashlib.sha256(content).hexdigest()
+    return entry, content, None
+
+
+def _load_manifest(manifest_path, output_path, options):
+    """The previous run's file entries, or {} when they cannot be trusted for this run."""
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("options") != options
+            or not os.path.exists(output_path) or os.path.getsize(output_path) != manifest.get("output_size")):
+        return {}
+    return manifest.get("files", {})
+
+
+def concatenate(root, project_type, output_path, budget=None, max_file_size=256 * 1024, workers=8, use_git=True,
+                extensions=None):
+    """Writes the concatenation and its manifest; returns a summary dict."""
+    extensions = tuple(extensions or PROJECT_TYPES[project_type])
+    output_abs = os.path.abspath(output_path)
+    manifest_path = output_path + ".manifest.json"
+    # Entries are only comparable between runs that select and budget files the same way
+    options = {"extensions": list(extensions), "budget": budget, "max_file_size": max_file_size}
+    previous_files = _load_manifest(manifest_path, output_path, options)
+
+    candidates = []
+    for path in list_files(root, extensions, use_git):
+        full_path = os.path.abspath(os.path.join(root, path))
+        if full_path in (output_abs, os.path.abspath(manifest_path)):
+            continue
+        try:
+            candidates.append((path, os.stat(full_path)))
+        except OSError:
+            continue
+
+    unchanged = (
+        set(previous_files) == {path for path, _ in candidates}
+        and all(previous_files[path]["mtime_ns"] == stat.st_mtime_ns and previous_files[path]["size"] == stat.st_size
+                for path, stat in candidates)
+    )
+    if unchanged and previous_files:
+        skipped = [(path, entry["skipped"]) for path, entry in previous_files.items() if "skipped" in entry]
+        return {"files": len(candidates) - len(skipped), "reused": len(candidates) - len(skipped), "read": 0,
+                "skipped": skipped, "up_to_date": True, "bytes": os.path.getsize(output_path)}
+
+    tmp_path = output_path + ".tmp"
+    files, skipped = {}, []
+    written = 0
+    with open(tmp_path, "wb") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        # A sliding window of reads keeps the pool busy without holding every file in memory
+        pending = deque()
+        queue = iter(candidates)
+
+        def submit_next():
+            for path, stat in queue:
+                pending.append((path, stat, pool.submit(_read, root, path, stat, previous_files.get(path),
+                                                        output_path, max_file_size)))
+                return
+
+        for _ in range(workers * 4):
+            submit_next()
+        while pending:
+            path, stat, future = pending.popleft()
+            submit_next()
+            entry, content, reason = future.result()
+            header, footer = _header(path), _footer(path)
+            if entry is not None and budget is not None and written + len(header) + len(content) + len(footer) > budget:
+                reason = "over budget"
+            if reason is not None:
+                # Skipped files are recorded too, so that an unchanged project is recognised as such
+                skipped.append((path, reason))
+                files[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "skipped": reason}
+                continue
+            out.write(header)
+            entry["offset"], entry["length"] = written + len(header), len(content)
+            out.write(content)
+            out.write(footer)
+            written += len(header) + len(content) + len(footer)
+            files[path] = entry
+    os.replace(tmp_path, output_path)
+
+    reused = sum(1 for entry in files.values() if entry.pop("reused", False))
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "options": options, "output_size": written, "files": files}, f,
+                  indent=1)
+    included = len(files) - len(skipped)
+    return {"files": included, "reused": reused, "read": included - reused, "skipped": skipped, "up_to_date": False,
+            "bytes": written}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concatenate project files into a single text file.")
+    parser.add_argument("project_type", choices=sorted(PROJECT_TYPES), help="Which files to include")
+    parser.add_argument("output_filename", help="The file to create")
+    parser.add_argument("--root", default=".", help="Project directory (default: current directory)")
+    parser.add_argument("--budget", type=int, help="Maximum output size in bytes; files that do not fit are skipped")
+    parser.add_argument("--max-file-size", type=int, default=256 * 1024, help="Skip files larger than this (bytes)")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel file reads")
+    parser.add_argument("--extensions", nargs="+", help="Override the file extensions of the project type")
+    parser.add_argument("--no-git", action="store_true", help="Do not ask git for the file list; parse .gitignore files")
+    args = parser.parse_args()
+
+    print("Starting project concatenation...")
+    print(f"Output will be saved to: {args.output_filename}")
+    print(f"Project type: {args.project_type}")
+    summary = concatenate(args.root, args.project_type, args.output_filename, args.budget, args.max_file_size,
+                          args.workers, not args.no_git, args.extensions)
+    print("----------------------------------------")
+    for path, reason in summary["skipped"]:
+        print(f"Skipped: {path} ({reason})")
+    if summary["up_to_date"]:
+        print(f"Nothing changed; {args.output_filename} is up to date ({summary['files']} file(s)).")
+    else:
+        print("Concatenation complete.")
+        print(f"Processed {summary['files']} file(s): {summary['read']} read, {summary['reused']} reused "
+              f"from the previous run, {summary['bytes']} bytes.")
+    print(f"Result saved to: {args.output_filename}")
+    sys.exit(0)
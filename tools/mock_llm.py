@@ -0,0 +1,81 @@
+"""
+Local stand-in for the Gemini REST API, for exercising scoring.py and score_submissions.py offline.
+
+Answers ``POST /v1beta/models/<model>:generateContent`` with canned evaluations in the formats the
+scoring prompts ask for. It picks the answer from the prompt text. --delay simulates model latency,
+and the request count is printed on exit.
+
+    python tools/mock_llm.py --port 8765
+    python tools/scoring.py --llm-endpoint http://127.0.0.1:8765
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CODE_QUALITY_RESPONSE = {
+    "frontend_evaluation": {"score": "4", "rationale": "Przejrzysty kod, odpowiedź testowa."},
+    "backend_evaluation": {"score": "3", "rationale": "Działa, odpowiedź testowa."},
+    "overall": {"title": "Testowy Sprint Kodu", "average_score": "3.5"},
+}
+AESTHETICS_RESPONSE = {"score": "4", "rationale": "Czytelny układ, odpowiedź testowa.", "title": "Testowa Estetyka"}
+IMAGE_PROMPT_RESPONSE = "Image Prompt: A tram made of code blocks crossing a bridge of curly braces, digital art."
+
+
+def answer(prompt: str) -> str:
+    if "frontend_evaluation" in prompt:
+        return "```json\n" + json.dumps(CODE_QUALITY_RESPONSE, ensure_ascii=False) + "\n```"
+    if "screenshot" in prompt:
+        return "```json\n" + json.dumps(AESTHETICS_RESPONSE, ensure_ascii=False) + "\n```"
+    return IMAGE_PROMPT_RESPONSE
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.split("?")[0].endswith(":generateContent"):
+            self.send_error(404, "Only generateContent is mocked")
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "\n".join(part.get("text", "") for content in body.get("contents", [])
+                           for part in content.get("parts", []))
+        with MockGeminiHandler.lock:
+            MockGeminiHandler.requests += 1
+        time.sleep(self.delay)
+
+        payload = json.dumps({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": answer(prompt)}]},
+                            "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 50,
+                              "totalTokenCount": len(prompt) // 4 + 50},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve canned Gemini responses for offline scoring runs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds to wait before answering, like a real model")
+    args = parser.parse_args()
+
+    MockGeminiHandler.delay = args.delay
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockGeminiHandler)
+    print(f"Mock LLM listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {MockGeminiHandler.requests} request(s)")
@@ -0,0 +1,254 @@
+"""
+Batch scoring of many submissions with scoring.py's evaluations.
+
+Every subdirectory of SUBMISSIONS_DIR is one submission holding backend.txt, frontend.txt and
+frontend.png (the file names scoring.py uses by default). Submissions are scored concurrently on a
+bounded thread pool, the two evaluations of a submission run side by side, and every LLM call goes
+through one shared rate limiter.
+
+Results are cached in --cache-dir by a content hash. Code quality is keyed on the model, the prompt
+and both code files; aesthetics on the model, the prompt, the frontend code and the screenshot bytes.
+A rerun only calls the LLM for evaluations whose inputs changed or whose last run had a failed call,
+including a failed image prompt. Each submission gets its feedback.txt (the same format as a single
+scoring.py run), and --summary collects the parsed scores of all submissions in one JSON file.
+
+Try it without an API key against the mock server:
+    python tools/mock_llm.py --port 8765 &
+    python tools/score_submissions.py submissions/ --llm-endpoint http://127.0.0.1:8765
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scoring import (
+    CODE_QUALITY_PROMPT_TEMPLATE,
+    FEEDBACK_MODEL,
+    FRONTEND_AESTHETICS_PROMPT_TEMPLATE,
+    encode_image_bytes,
+    evaluate_aesthetics,
+    evaluate_code_quality,
+    make_llm,
+    parse_aesthetics_output,
+    parse_code_quality_output,
+)
+
+BACKEND_FILE = "backend.txt"
+FRONTEND_FILE = "frontend.txt"
+SCREENSHOT_FILE = "frontend.png"
+FEEDBACK_FILE = "feedback.txt"
+
+
+class RateLimiter:
+    """Token bucket shared by all workers: at most `per_minute` calls per minute, bursts up to `burst`."""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.interval = 60.0 / per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
+
+
+class RateLimitedLLM:
+    """Wraps a chat model so that every invoke waits for the rate limiter."""
+
+    def __init__(self, llm, limiter: RateLimiter):
+        self._llm = llm
+        self._limiter = limiter
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def invoke(self, messages):
+        self._limiter.acquire()
+        with self._lock:
+            self.calls += 1
+        return self._llm.invoke(messages)
+
+
+class ResultCache:
+    """Evaluation results stored as one JSON file per content hash."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, result: str):
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"result": result}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+
+
+def content_key(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else part.encode("utf-8")
+        # Length-prefixed so that moving text between parts changes the key
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+# scoring.py reports a failed image prompt inside an otherwise successful evaluation
+IMAGE_PROMPT_ERRORS = ("Error generating image prompt", "Error: Insufficient data to generate image prompt")
+
+
+def is_error(result: str) -> bool:
+    """True when any LLM call of an evaluation failed; such results are reported but never cached."""
+    return result.startswith("Error") or any(error in result for error in IMAGE_PROMPT_ERRORS)
+
+
+def _parse(result: str, parse):
+    # Scores survive a failed image prompt, which comes after the evaluation's JSON
+    return None if result.startswith("Error") else parse(result.split("\n\n--- ")[0])
+
+
+class Submission:
+    """One submission's inputs, each read from disk exactly once."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path.rstrip(os.sep))
+        with open(os.path.join(path, BACKEND_FILE), "r", encoding="utf-8") as f:
+            self.backend_code = f.read()
+        with open(os.path.join(path, FRONTEND_FILE), "r", encoding="utf-8") as f:
+            self.frontend_code = f.read()
+        with open(os.path.join(path, SCREENSHOT_FILE), "rb") as f:
+            self.screenshot = f.read()
+
+    def code_quality_key(self) -> str:
+        return content_key("code_quality", FEEDBACK_MODEL, CODE_QUALITY_PROMPT_TEMPLATE, self.backend_code,
+                           self.frontend_code)
+
+    def aesthetics_key(self) -> str:
+        return content_key("aesthetics", FEEDBACK_MODEL, FRONTEND_AESTHETICS_PROMPT_TEMPLATE, self.frontend_code,
+                           self.screenshot)
+
+
+def find_submissions(submissions_dir: str):
+    submissions, skipped = [], []
+    for name in sorted(os.listdir(submissions_dir)):
+        path = os.path.join(submissions_dir, name)
+        if not os.path.isdir(path):
+            continue
+        if all(os.path.exists(os.path.join(path, f)) for f in (BACKEND_FILE, FRONTEND_FILE, SCREENSHOT_FILE)):
+            submissions.append(path)
+        else:
+            skipped.append(name)
+    return submissions, skipped
+
+
+def _evaluate(cache: ResultCache, key: str, evaluate, force: bool):
+    """Returns (result, cached)."""
+    if not force:
+        result = cache.get(key)
+        if result is not None:
+            return result, True
+    result = evaluate()
+    if not is_error(result):  # failures are retried on the next run
+        cache.put(key, result)
+    return result, False
+
+
+def score_submission(path: str, llm, cache: ResultCache, force: bool = False) -> dict:
+    submission = Submission(path)
+    # The two evaluations are independent; run them side by side, the rate limiter still bounds the calls
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        quality_future = pool.submit(
+            _evaluate, cache, submission.code_quality_key(),
+            lambda: evaluate_code_quality(llm, submission.backend_code, submission.frontend_code), force)
+        aesthetics_future = pool.submit(
+            _evaluate, cache, submission.aesthetics_key(),
+            lambda: evaluate_aesthetics(llm, submission.frontend_code, encode_image_bytes(submission.screenshot)),
+            force)
+        quality, quality_cached = quality_future.result()
+        aesthetics, aesthetics_cached = aesthetics_future.result()
+
+    with open(os.path.join(path, FEEDBACK_FILE), "w", encoding="utf-8") as f:
+        f.write("\n\n".join(["--- Code Quality Evaluation Result ---", quality,
+                             "--- Frontend Aesthetics Evaluation Result ---", aesthetics]))
+
+    return {
+        "submission": submission.name,
+        "cached": {"code_quality": quality_cached, "aesthetics": aesthetics_cached},
+        "errors": [result for result in (quality, aesthetics) if is_error(result)],
+        "code_quality": _parse(quality, parse_code_quality_output),
+        "aesthetics": _parse(aesthetics, parse_aesthetics_output),
+    }
+
+
+def score_all(submissions_dir: str, llm, cache_dir: str, workers: int = 4, force: bool = False):
+    submissions, skipped = find_submissions(submissions_dir)
+    for name in skipped:
+        print(f"Skipping {name}: needs {BACKEND_FILE}, {FRONTEND_FILE} and {SCREENSHOT_FILE}")
+    cache = ResultCache(cache_dir)
+
+    def run(path):
+        started = time.perf_counter()
+        try:
+            summary = score_submission(path, llm, cache, force)
+        except Exception as e:
+            summary = {"submission": os.path.basename(path), "errors": [f"Error scoring submission: {e}"]}
+        summary["seconds"] = round(time.perf_counter() - started, 2)
+        cached = summary.get("cached", {})
+        print(f"  {summary['submission']}: {summary['seconds']}s "
+              f"({'cached' if cached and all(cached.values()) else 'scored'}"
+              f"{', errors' if summary['errors'] else ''})")
+        return summary
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, submissions))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every submission in a directory concurrently, with caching.")
+    parser.add_argument("submissions_dir", help=f"Directory of submissions, each with {BACKEND_FILE}, {FRONTEND_FILE} and {SCREENSHOT_FILE}")
+    parser.add_argument("--workers", type=int, default=4, help="Submissions scored at the same time")
+    parser.add_argument("--rate-limit", type=float, default=60, help="LLM calls per minute across all workers")
+    parser.add_argument("--burst", type=int, default=4, help="LLM calls allowed back to back before the rate limit applies")
+    parser.add_argument("--cache-dir", default=".scoring_cache", help="Where evaluation results are cached")
+    parser.add_argument("--force", action="store_true", help="Ignore cached results")
+    parser.add_argument("--summary", default="scores.json", help="Path to write the parsed scores of all submissions")
+    parser.add_argument("--llm-endpoint", help="Gemini-compatible REST endpoint to use instead of Google's, e.g. tools/mock_llm.py")
+    args = parser.parse_args()
+
+    google_api_key = os.getenv("GOOGLE_API_KEY") or ("mock" if args.llm_endpoint else None)
+    if not google_api_key:
+        print("Error: GOOGLE_API_KEY environment variable not set.")
+        exit(1)
+
+    llm = RateLimitedLLM(make_llm(google_api_key, args.llm_endpoint), RateLimiter(args.rate_limit, args.burst))
+    print(f"Scoring submissions in {args.submissions_dir} with {args.workers} workers...")
+    started = time.perf_counter()
+    results = score_all(args.submissions_dir, llm, args.cache_dir, args.workers, args.force)
+
+    with open(args.summary, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Scored {len(results)} submission(s) in {time.perf_counter() - started:.1f}s with {llm.calls} LLM call(s); "
+          f"summary written to {args.summary}")
@@ -5,7 +5,7 @@ from PIL import Image
 from io import BytesIO
 import re
 import requests # For downloading image from URL if needed
-from typing import Type
+from typing import Optional, Type
 import argparse # Import argparse
 
 # Langchain and Google specific imports
@@ -140,17 +140,31 @@ def read_file_content(file_path: str) -> str:
         # Consider re-raising with more context or logging
         raise Exception(f"Error reading file {file_path}: {e}")
 
+IMAGE_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"\xff\xd8\xff": "jpeg",
+    b"GIF87a": "gif",
+    b"GIF89a": "gif",
+}
+
+def encode_image_bytes(img_bytes: bytes) -> str:
+    """Returns a data URL for the image; PNG/JPEG/GIF/WebP are passed through without decoding."""
+    img_format = next((fmt for signature, fmt in IMAGE_SIGNATURES.items() if img_bytes.startswith(signature)), None)
+    if img_format is None and img_bytes[:4] == b"RIFF" and img_bytes[8:12] == b"WEBP":
+        img_format = "webp"
+    if img_format is None:
+        # Anything else is re-encoded to PNG, which every vision model accepts
+        with Image.open(BytesIO(img_bytes)) as img:
+            buffered = BytesIO()
+            img.save(buffered, format="PNG")
+            img_bytes, img_format = buffered.getvalue(), "png"
+    encoded_string = base64.b64encode(img_bytes).decode('utf-8')
+    return f"data:image/{img_format};base64,{encoded_string}"
+
 def encode_image_to_base64(image_path: str):
     try:
-        with Image.open(image_path) as img:
-            img_format = img.format or "PNG"
-            if img.mode == 'RGBA' and img_format.lower() == 'jpeg':
-                img = img.convert('RGB')
-            buffered = BytesIO()
-            img.save(buffered, format=img_format)
-            img_byte = buffered.getvalue()
-            encoded_string = base64.b64encode(img_byte).decode('utf-8')
-            return f"data:image/{img_format.lower()};base64,{encoded_string}", None
+        with open(image_path, 'rb') as f:
+            return encode_image_bytes(f.read()), None
     except FileNotFoundError:
         return None, f"Error: Image file not found at {image_path}"
     except Exception as e:
@@ -296,6 +310,72 @@ def save_image_from_url(image_url: str, filename: str):
         print(f"[ImageSave] Error saving image from URL {image_url}: {e}")
 
 
+# --- Evaluation Functions ---
+def make_llm(google_api_key: str, llm_endpoint: Optional[str] = None) -> ChatGoogleGenerativeAI:
+    """Creates the feedback model; llm_endpoint (e.g. http://127.0.0.1:8765) points it at another Gemini-compatible REST server."""
+    if llm_endpoint:
+        return ChatGoogleGenerativeAI(model=FEEDBACK_MODEL, google_api_key=google_api_key, convert_system_message_to_human=True,
+                                      transport="rest", client_options={"api_endpoint": llm_endpoint})
+    return ChatGoogleGenerativeAI(model=FEEDBACK_MODEL, google_api_key=google_api_key, convert_system_message_to_human=True)
+
+
+def evaluate_code_quality(llm_text_model, backend_code: str, frontend_code: str) -> str:
+    prompt = CODE_QUALITY_PROMPT_TEMPLATE.format(backend_code=backend_code, frontend_code=frontend_code)
+
+    text_evaluation_result = "Failed to get text evaluation."
+    try:
+        response = llm_text_model.invoke([HumanMessage(content=prompt)])
+        text_evaluation_result = response.content
+    except Exception as e:
+        return f"Error during LLM invocation for code quality text: {e}"
+
+    parsed_output = parse_code_quality_output(text_evaluation_result)
+
+    fe_image_prompt_text = "N/A"
+    be_image_prompt_text = "N/A"
+
+    if parsed_output["frontend_score"] is not None:
+        fe_image_prompt_text = generate_image_prompt_from_feedback(
+            "Frontend Code Quality", parsed_output["frontend_score"], parsed_output["frontend_rationale"], llm_text_model
+        )
+
+    if parsed_output["backend_score"] is not None:
+        be_image_prompt_text = generate_image_prompt_from_feedback(
+            "Backend Code Quality", parsed_output["backend_score"], parsed_output["backend_rationale"], llm_text_model
+        )
+
+    # Return the raw JSON string and the image prompts
+    return (f"{text_evaluation_result}\n\n"
+            f"--- Illustrative Image Prompts Generated (Code Quality) ---\n"
+            f"Frontend Code Quality Image Prompt: {fe_image_prompt_text}\n"
+            f"Backend Code Quality Image Prompt: {be_image_prompt_text}\n\n")
+
+
+def evaluate_aesthetics(llm_model, frontend_code: str, image_data_url: str) -> str:
+    prompt_text = FRONTEND_AESTHETICS_PROMPT_TEMPLATE.format(frontend_code=frontend_code)
+    messages = [HumanMessage(content=[ {"type": "text", "text": prompt_text}, {"type": "image_url", "image_url": {"url": image_data_url}} ])] # Corrected image_url format
+
+    text_evaluation_result = "Failed to get text evaluation for aesthetics."
+    try:
+        response = llm_model.invoke(messages)
+        text_evaluation_result = response.content
+    except Exception as e:
+        return f"Error during LLM invocation for aesthetics text: {e}"
+
+    parsed_output = parse_aesthetics_output(text_evaluation_result)
+    aesthetic_image_prompt_text = "N/A"
+
+    if parsed_output["score"] is not None:
+        aesthetic_image_prompt_text = generate_image_prompt_from_feedback(
+            "Frontend Aesthetics & UX", parsed_output["score"], parsed_output["rationale"], llm_model
+        )
+
+    # Return the raw JSON string and the image prompt
+    return (f"{text_evaluation_result}\n\n"
+            f"--- Illustrative Image Prompt Generated (Aesthetics) ---\n"
+            f"Aesthetics Image Prompt: {aesthetic_image_prompt_text}\n\n")
+
+
 # --- Langchain Tool Definitions  ---
 
 class CodeQualityInput(BaseModel):
@@ -307,13 +387,12 @@ class CodeQualityTool(BaseTool):
     description: str = "Evaluates code quality and generates illustrative images. Input: paths to backend and frontend code files."
     args_schema: Type[CodeQualityInput] = CodeQualityInput
     google_api_key: str
+    llm_endpoint: Optional[str] = None
 
     def _run(self, backend_code_path: str, frontend_code_path: str) -> str:
         if not self.google_api_key:
             return "Error: GOOGLE_API_KEY not configured."
 
-        llm_text_model = ChatGoogleGenerativeAI(model=FEEDBACK_MODEL, google_api_key=self.google_api_key, convert_system_message_to_human=True)
-
         try:
             backend_code = read_file_content(backend_code_path)
             frontend_code = read_file_content(frontend_code_path)
@@ -322,36 +401,7 @@ class CodeQualityTool(BaseTool):
         except Exception as e:
             return f"Error reading input files: {e}"
 
-
-        prompt = CODE_QUALITY_PROMPT_TEMPLATE.format(backend_code=backend_code, frontend_code=frontend_code)
-
-        text_evaluation_result = "Failed to get text evaluation."
-        try:
-            response = llm_text_model.invoke([HumanMessage(content=prompt)])
-            text_evaluation_result = response.content
-        except Exception as e:
-            return f"Error during LLM invocation for code quality text: {e}"
-
-        parsed_output = parse_code_quality_output(text_evaluation_result)
-
-        fe_image_prompt_text = "N/A"
-        be_image_prompt_text = "N/A"
-
-        if parsed_output["frontend_score"] is not None:
-            fe_image_prompt_text = generate_image_prompt_from_feedback(
-                "Frontend Code Quality", parsed_output["frontend_score"], parsed_output["frontend_rationale"], llm_text_model
-            )
-
-        if parsed_output["backend_score"] is not None:
-            be_image_prompt_text = generate_image_prompt_from_feedback(
-                "Backend Code Quality", parsed_output["backend_score"], parsed_output["backend_rationale"], llm_text_model
-            )
-
-        # Return the raw JSON string and the image prompts
-        return (f"{text_evaluation_result}\n\n"
-                f"--- Illustrative Image Prompts Generated (Code Quality) ---\n"
-                f"Frontend Code Quality Image Prompt: {fe_image_prompt_text}\n"
-                f"Backend Code Quality Image Prompt: {be_image_prompt_text}\n\n")
+        return evaluate_code_quality(make_llm(self.google_api_key, self.llm_endpoint), backend_code, frontend_code)
 
 
 class AestheticsInput(BaseModel):
@@ -363,16 +413,12 @@ class AestheticsTool(BaseTool):
     description: str = "Evaluates frontend aesthetics from code and screenshot, and generates an illustrative image. Input: paths to files."
     args_schema: Type[AestheticsInput] = AestheticsInput
     google_api_key: str
+    llm_endpoint: Optional[str] = None
 
     def _run(self, frontend_code_path: str, screenshot_path: str) -> str:
         if not self.google_api_key:
             return "Error: GOOGLE_API_KEY not configured."
 
-        # Use the globally defined FEEDBACK_MODEL that should support vision
-        llm_vision_model = ChatGoogleGenerativeAI(model=FEEDBACK_MODEL, google_api_key=self.google_api_key, convert_system_message_to_human=True)
-        # Text model for image prompt generation if needed (though generate_image_prompt_from_feedback takes one)
-        llm_text_model = ChatGoogleGenerativeAI(model=FEEDBACK_MODEL, google_api_key=self.google_api_key, convert_system_message_to_human=True)
-
         try:
             frontend_code = read_file_content(frontend_code_path)
         except FileNotFoundError as e:
@@ -380,33 +426,12 @@ class AestheticsTool(BaseTool):
         except Exception as e:
             return f"Error reading frontend code file: {e}"
 
-
         image_data_url, error = encode_image_to_base64(screenshot_path)
         if error:
             return error # Error message from encode_image_to_base64
 
-        prompt_text = FRONTEND_AESTHETICS_PROMPT_TEMPLATE.format(frontend_code=frontend_code)
-        messages = [HumanMessage(content=[ {"type": "text", "text": prompt_text}, {"type": "image_url", "image_url": {"url": image_data_url}} ])] # Corrected image_url format
-
-        text_evaluation_result = "Failed to get text evaluation for aesthetics."
-        try:
-            response = llm_vision_model.invoke(messages)
-            text_evaluation_result = response.content
-        except Exception as e:
-            return f"Error during LLM invocation for aesthetics text: {e}"
-
-        parsed_output = parse_aesthetics_output(text_evaluation_result)
-        aesthetic_image_prompt_text = "N/A"
-
-        if parsed_output["score"] is not None:
-            aesthetic_image_prompt_text = generate_image_prompt_from_feedback(
-                "Frontend Aesthetics & UX", parsed_output["score"], parsed_output["rationale"], llm_text_model
-            )
-
-        # Return the raw JSON string and the image prompt
-        return (f"{text_evaluation_result}\n\n"
-                f"--- Illustrative Image Prompt Generated (Aesthetics) ---\n"
-                f"Aesthetics Image Prompt: {aesthetic_image_prompt_text}\n\n")
+        # FEEDBACK_MODEL supports vision, so one model serves the evaluation and the image prompt
+        return evaluate_aesthetics(make_llm(self.google_api_key, self.llm_endpoint), frontend_code, image_data_url)
 
 # --- Main script execution ---
 if __name__ == "__main__":
@@ -415,9 +440,10 @@ if __name__ == "__main__":
     parser.add_argument("--backend-code", default="backend.txt", help="Path to the backend code file (e.g., backend.txt)")
     parser.add_argument("--screenshot", default="frontend.png", help="Path to the frontend screenshot (e.g., frontend.png)")
     parser.add_argument("--output-file", default="feedback.txt", help="Path to write the evaluation output (e.g., feedback.txt)")
+    parser.add_argument("--llm-endpoint", help="Gemini-compatible REST endpoint to use instead of Google's, e.g. tools/mock_llm.py")
     args = parser.parse_args()
 
-    google_api_key = os.getenv("GOOGLE_API_KEY")
+    google_api_key = os.getenv("GOOGLE_API_KEY") or ("mock" if args.llm_endpoint else None)
     if not google_api_key:
         print("Error: GOOGLE_API_KEY environment variable not set.")
         exit(1)
@@ -429,8 +455,8 @@ if __name__ == "__main__":
             exit(1)
 
     print("\n--- Initializing Tools ---")
-    code_quality_tool = CodeQualityTool(google_api_key=google_api_key)
-    aesthetics_tool = AestheticsTool(google_api_key=google_api_key)
+    code_quality_tool = CodeQualityTool(google_api_key=google_api_key, llm_endpoint=args.llm_endpoint)
+    aesthetics_tool = AestheticsTool(google_api_key=google_api_key, llm_endpoint=args.llm_endpoint)
 
     all_feedback_parts = []
 